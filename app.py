@@ -8,6 +8,7 @@ root_dir = Path(__file__).parent
 sys.path.insert(0, str(root_dir))
 
 import utils.ui_utils as ui_utils
+from utils import db_utils, memory_utils, metrics_utils
 from pages import test_case_gen, test_automation
 
 # Page configuration
@@ -21,14 +22,21 @@ st.set_page_config(
 # Load custom CSS
 ui_utils.load_css()
 
+# Publish model call metrics to METRICS_FILE / METRICS_PORT (once per server process)
+metrics_utils.start_exporter()
+
 # Initialize session state
+# The library and generated code are loaded from the database once per session
+if 'test_cases' not in st.session_state:
+    st.session_state.test_cases = db_utils.load_library()
+if 'automation_code' not in st.session_state:
+    st.session_state.automation_code = db_utils.load_automation_code()
+
 defaults = {
-    'test_cases': [],
-    'automation_code': {},
     'current_tc_id': "",
     'framework_generated': False,
     'framework_code': {},
-    'file_content': "",
+    'file_content': memory_utils.SpillingDict(),
     'show_toast': False,
     'toast_message': "",
     'toast_time': 0,
@@ -42,6 +50,23 @@ for k, v in defaults.items():
     if k not in st.session_state:
         st.session_state[k] = v
 
+# Pick up changes other sessions and server processes saved since the last run
+if hasattr(st.session_state.test_cases, "refresh"):
+    changed, removed = st.session_state.test_cases.refresh()
+    if "tc_index" in st.session_state and (changed or removed):
+        st.session_state.tc_index.remove(removed)
+        st.session_state.tc_index.upsert(st.session_state.test_cases.get(tc_id) for tc_id in changed
+                                         if tc_id in st.session_state.test_cases)
+if hasattr(st.session_state.automation_code, "refresh"):
+    st.session_state.automation_code.refresh()
+
+# Generation runs in background jobs; apply what they produced whichever page is showing
+test_case_gen.apply_generation_jobs()
+test_automation.apply_automation_jobs()
+
+# Measured every MEMORY_CHECK_SECONDS; rebuildable caches go when the session is over its limit
+memory_usage = memory_utils.enforce_limit(memory_utils.measure_session())
+
 # Header
 st.markdown('<div class="header"><h1>🤖 QE Test Automation Suite</h1></div>', unsafe_allow_html=True)
 
@@ -62,6 +87,21 @@ with st.sidebar:
     with col2:
         st.metric("Selected", len(st.session_state.selected_test_cases))
     
+    st.markdown("---")
+    st.markdown("### 🩺 AI Diagnostics")
+    ui_utils.display_diagnostics_panel()
+
+    st.markdown("---")
+    st.markdown("### 🧠 Memory")
+    ui_utils.display_memory_panel(memory_usage)
+
+    st.markdown("---")
+    st.markdown("### ⏳ Background Jobs")
+    ui_utils.display_jobs_panel({
+        "test_cases": test_case_gen.apply_generation_job,
+        "automation": test_automation.apply_automation_job,
+    })
+
     st.markdown("---")
     st.markdown("### ℹ️ About")
     st.info("Generate professional test cases and Selenium automation code using AI")
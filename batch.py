@@ -0,0 +1,50 @@
+# batch.py
+"""
+Generate test cases and automation code for a directory of requirement documents, without the UI
+
+Writes NDJSON test cases and code trees to the output directory; rerunning
+the same command resumes after the documents already finished:
+
+    python batch.py requirements/ --out batch_output --cases 10 --automation
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add project root to path
+root_dir = Path(__file__).parent
+sys.path.insert(0, str(root_dir))
+
+from utils import batch_utils, metrics_utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input_dir", help="Directory of TXT, PDF, DOCX, CSV or Excel documents")
+    parser.add_argument("--out", default="batch_output", help="Output directory (default batch_output)")
+    parser.add_argument("--cases", type=int, default=10, help="Test cases per document (default 10)")
+    parser.add_argument("--priority", choices=["High", "Medium", "Low"], default="Medium")
+    parser.add_argument("--automation", action="store_true", help="Also generate Java Selenium code for every case")
+    parser.add_argument("--no-validate", action="store_true", help="Skip the Java syntax check and repairs")
+    parser.add_argument("--workers", type=int, default=batch_utils.BATCH_WORKERS, help="Documents processed at once")
+    args = parser.parse_args()
+    # Written on exit too, so METRICS_FILE holds the whole run's model calls
+    metrics_utils.start_exporter()
+
+    def on_document(document, status, info):
+        detail = f"{info.get('cases', 0)} cases" + (f", {info['code_files']} code files" if "code_files" in info else "")
+        print(f"[{status}] {document}: {detail}", flush=True)
+        for level, message in info.get("messages", []):
+            print(f"    {level}: {message}", flush=True)
+
+    summary = batch_utils.run_batch(
+        args.input_dir, args.out, num_cases=args.cases, priority=args.priority, automation=args.automation,
+        validate=not args.no_validate, workers=args.workers, on_document=on_document,
+    )
+    print(f"{summary['documents']} documents ({summary['skipped']} already done, {summary['failed']} failed): "
+          f"{summary['cases']} test cases, {summary['code_files']} code files in {summary['seconds']:.1f}s -> {args.out}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
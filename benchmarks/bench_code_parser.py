@@ -0,0 +1,104 @@
+"""
+Benchmark parsing of multi-megabyte generated code responses
+
+Compares the legacy line-by-line re.match parser with
+code_utils.parse_code_files on a response with fenced files, prose between
+them and repeated file names, and reports the memory each result holds on
+top of the response text:
+
+    python benchmarks/bench_code_parser.py --files 2000 --methods 20
+"""
+import argparse
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+
+from utils.code_utils import parse_code_files
+
+
+def legacy_parse(code_text):
+    """parse_generated_code before the single-pass parser"""
+    files = {}
+    current_file = None
+    buffer = []
+
+    for line in code_text.splitlines():
+        m = re.match(r"// FILE: (.+)", line)
+        if m:
+            if current_file and buffer:
+                files[current_file] = "\n".join(buffer).strip()
+            current_file = m.group(1).strip()
+            buffer = []
+        else:
+            if current_file:
+                buffer.append(line)
+    if current_file and buffer:
+        files[current_file] = "\n".join(buffer).strip()
+    return files
+
+
+def make_response(files, methods):
+    parts = ["Here is the complete suite.\n"]
+    for i in range(files):
+        body = "\n\n".join(
+            f"    public void action{m}(String value) {{\n"
+            f"        wait.until(ExpectedConditions.elementToBeClickable(locator{m})).click();\n"
+            f"    }}"
+            for m in range(methods)
+        )
+        parts.append(
+            f"// FILE: src/main/java/com/qa/pages/Page{i}Page.java\n"
+            f"The page object for page {i}:\n"
+            f"```java\npackage com.qa.pages;\n\npublic class Page{i}Page {{\n{body}\n}}\n```\n"
+        )
+    return "".join(parts)
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def retained(fn, *args):
+    """Bytes allocated by fn's result (the input text is not counted)"""
+    tracemalloc.start()
+    result = fn(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--methods", type=int, default=20)
+    args = parser.parse_args()
+
+    text = make_response(args.files, args.methods)
+    print(f"response: {len(text) / 1e6:.1f} MB, {args.files} files")
+
+    legacy, legacy_time = timed(legacy_parse, text)
+    parsed, parse_time = timed(parse_code_files, text)
+    _, read_time = timed(lambda p: [p[path] for path in p], parsed)
+    _, legacy_bytes = retained(legacy_parse, text)
+    _, parsed_bytes = retained(parse_code_files, text)
+
+    leaked = sum("```" in content for content in legacy.values())
+    assert len(parsed) == args.files and not any("```" in parsed[path] for path in parsed)
+    print(f"legacy:      {legacy_time * 1000:7.1f} ms, {legacy_bytes / 1e6:5.1f} MB held, "
+          f"{leaked} files with fence lines leaked into the code")
+    print(f"single-pass: {parse_time * 1000:7.1f} ms, {parsed_bytes / 1e6:5.1f} MB held "
+          f"({legacy_time / parse_time:.1f}x faster); reading every file: {read_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark the cold start of the Streamlit app and profile its imports
+
+Every measurement runs in a fresh interpreter, so nothing is imported yet.
+Prints the slowest imports of app startup (python -X importtime), then the
+time to the first render of app.py, run by Streamlit's AppTest the way the
+server runs it, and the heavy libraries that render loaded. Those are
+imported on first use, so the script exits with status 1 when one of them
+loads at startup or the median first render is over the budget:
+
+    python benchmarks/bench_cold_start.py --runs 3 --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+
+# Libraries that take a noticeable part of a second to import and are only
+# needed once a document is read, a file exported or imported, the library
+# searched or a model called
+HEAVY_MODULES = ["google.generativeai", "pandas", "numpy", "faiss", "openpyxl", "PyPDF2", "docx",
+                 "sentence_transformers"]
+
+# What app.py imports before its first statement runs
+APP_IMPORTS = "import streamlit, utils.ui_utils, utils.db_utils, pages.test_case_gen, pages.test_automation"
+
+RENDER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.run()
+rendered = time.perf_counter()
+print(json.dumps({{
+    "streamlit_ms": (imported - start) * 1000,
+    "render_ms": (rendered - imported) * 1000,
+    "errors": [e.value for e in at.exception],
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def run_python(args, env):
+    return subprocess.run([sys.executable, *args], cwd=root_dir, env=env, capture_output=True, text=True, check=True)
+
+
+def import_profile(env, top):
+    """(module, self ms, cumulative ms) of the slowest imports of app startup"""
+    stderr = run_python(["-X", "importtime", "-c", APP_IMPORTS], env).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        # Package roots and the app's own modules; submodules are part of their package
+        if "." not in name or name.startswith(("utils.", "pages.")):
+            rows.append((name, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return sorted(rows, key=lambda row: row[2], reverse=True)[:top]
+
+
+def first_render(env):
+    script = RENDER_SCRIPT.format(app=str(root_dir / "app.py"), heavy=HEAVY_MODULES)
+    return json.loads(run_python(["-c", script], env).stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A throwaway library, so the render does not read or write the real one
+        env = dict(os.environ, LIBRARY_DB=str(Path(tmp) / "library.db"),
+                   ATTACHMENT_DIR=str(Path(tmp) / "attachments"), AI_CACHE_DIR=str(Path(tmp) / "responses"))
+
+        print(f"slowest imports of app startup (top {args.top}):")
+        print(f"  {'module':40} {'self ms':>9} {'total ms':>9}")
+        for name, self_ms, cumulative_ms in import_profile(env, args.top):
+            print(f"  {name:40} {self_ms:9.1f} {cumulative_ms:9.1f}")
+
+        results = [first_render(env) for _ in range(args.runs)]
+
+    streamlit_ms = statistics.median(r["streamlit_ms"] for r in results)
+    render_ms = statistics.median(r["render_ms"] for r in results)
+    loaded = sorted({m for r in results for m in r["loaded"]})
+    errors = [e for r in results for e in r["errors"]]
+    print(f"import streamlit:  {streamlit_ms:8.1f} ms (median of {args.runs})")
+    print(f"first render:      {render_ms:8.1f} ms (median of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    print(f"heavy modules loaded by the first render: {', '.join(loaded) or 'none'}")
+    for error in errors:
+        print(f"app raised: {error}")
+
+    ok = render_ms <= args.budget_ms and not loaded and not errors
+    print("within budget" if ok else "OVER BUDGET")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
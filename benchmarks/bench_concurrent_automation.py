@@ -0,0 +1,74 @@
+"""
+Benchmark sequential vs concurrent automation code generation
+
+Runs against a stubbed MODEL with injected latency, so no API key is needed:
+
+    python benchmarks/bench_concurrent_automation.py --cases 40 --latency 0.5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(root_dir / "benchmarks"))
+
+from fake_model import FakeModel
+from utils import ai_utils
+from utils.scheduler_utils import RequestScheduler
+
+SAMPLE_CODE = """// FILE: src/test/java/com/qa/tests/SampleTest.java
+public class SampleTest {}
+"""
+
+
+def make_cases(n):
+    return [
+        {
+            "id": f"TC_{i:03d}",
+            "title": f"Scenario {i}",
+            "test_steps": ["Open page", "Click button"],
+            "expected_results": ["Page is shown"],
+            "priority": "Medium",
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=ai_utils.AI_MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    cases = make_cases(args.cases)
+    ai_utils.MODEL = FakeModel(SAMPLE_CODE, latency=args.latency)
+    ai_utils.RESPONSE_CACHE = None
+    # Measure generation itself, not the AI_RPM limit
+    ai_utils.SCHEDULER = RequestScheduler()
+
+    start = time.perf_counter()
+    for tc in cases:
+        ai_utils.generate_test_case_automation_code(tc)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first = None
+    done = 0
+    for _tc, _code, error in ai_utils.generate_automation_code_concurrently(cases, max_workers=args.workers):
+        assert error is None
+        done += 1
+        if first is None:
+            first = time.perf_counter() - start
+    concurrent = time.perf_counter() - start
+    assert done == len(cases)
+
+    print(f"cases={args.cases} latency={args.latency}s workers={args.workers}")
+    print(f"sequential: {sequential:.2f}s")
+    print(f"concurrent: {concurrent:.2f}s (first result after {first:.2f}s, speedup {sequential / concurrent:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark near-duplicate detection for one generation batch against library size
+
+Uses the offline hashing embedder. First checks exact cluster membership
+on a small library of distinct cases; the timed batches hold reworded
+copies of library cases plus new ones, and the benchmark fails if a new
+case joins a cluster or a cluster has no case from the batch:
+
+    python benchmarks/bench_dedup.py --sizes 1000 10000 50000 --batch 50
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(root_dir / "benchmarks"))
+
+from bench_export import make_store
+from utils import dedup_utils
+from utils.search_utils import HashingEmbedder, TestCaseIndex
+from utils.store_utils import TestCaseStore
+
+WORDS = (
+    "account address admin alert archive basket billing browser button calendar card cart checkout comment "
+    "coupon currency dashboard date delivery device discount document download email export favourite field "
+    "filter history invoice language limit link list locale login logout message mobile notification order "
+    "password payment permission phone photo price profile purchase rating receipt refund report review role "
+    "search session setting shipping status subscription tag theme ticket token upload user voucher wishlist"
+).split()
+
+
+def reworded(tc):
+    return dict(
+        tc,
+        id=None,
+        title=tc["title"].replace("Scenario", "Case"),
+        test_steps=[step.replace("Step", "Do step") for step in tc["test_steps"]],
+    )
+
+
+def distinct_case(rng):
+    """Case made of random words, so unrelated cases share little text"""
+    return {
+        "title": " ".join(rng.sample(WORDS, 5)),
+        "test_steps": [" ".join(rng.sample(WORDS, 6)) for _ in range(4)],
+        "expected_results": [" ".join(rng.sample(WORDS, 4))],
+    }
+
+
+def check_clusters():
+    """Each copy clusters with exactly its original; two copies of one case share a cluster"""
+    rng = random.Random(3)
+    store = TestCaseStore([distinct_case(rng) for _ in range(300)])
+    index = TestCaseIndex(HashingEmbedder())
+    index.upsert(store)
+    sources = rng.sample(range(len(store)), 10)
+    copies = [dict(store[row], id=None, title="Verify " + store[row]["title"],
+                   test_steps=store[row]["test_steps"] + ["Refresh the page"]) for row in sources]
+    new_ids = store.extend(copies + [copies[0]] + [distinct_case(rng) for _ in range(10)])
+    index.upsert(store.rows(range(300, len(store))))
+
+    clusters = dedup_utils.find_duplicate_clusters(store, index, new_ids)
+    expected = [[store[row]["id"], copy_id] for row, copy_id in zip(sources, new_ids)]
+    expected[0].append(new_ids[len(copies)])
+    assert sorted(clusters) == sorted(expected), clusters
+
+    # Clusters found later that share a case with a pending one are folded into it
+    pending = expected[1:]
+    merged = dedup_utils.merge_clusters([[pending[0][1], "TC_NEW"]], pending)
+    assert len(merged) == len(pending) and sorted(pending[0] + ["TC_NEW"]) in [sorted(c) for c in merged], merged
+    print(f"checks: {len(clusters)} clusters with exactly the expected members")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--batch", type=int, default=50)
+    args = parser.parse_args()
+
+    check_clusters()
+    for n in args.sizes:
+        rng = random.Random(9)
+        store = make_store(n, rng)
+        index = TestCaseIndex(HashingEmbedder())
+        index.upsert(store)
+        batch = [reworded(store[rng.randrange(n)]) for _ in range(args.batch // 2)]
+        batch += [{"title": f"Brand new flow {i}", "test_steps": [f"Unique action {i}"]} for i in range(args.batch - len(batch))]
+        new_ids = store.extend(batch)
+        index.upsert(store.rows(range(n, len(store))))
+
+        start = time.perf_counter()
+        clusters = dedup_utils.find_duplicate_clusters(store, index, new_ids)
+        elapsed = time.perf_counter() - start
+        print(f"library {n:>7,}: {len(clusters):>3} clusters for {args.batch} new cases in {elapsed * 1000:8.1f} ms")
+        # Brand new flows never match, and every cluster holds a case of the batch, oldest first
+        members = {tc_id for cluster in clusters for tc_id in cluster}
+        assert not members & set(new_ids[args.batch // 2:]), sorted(members & set(new_ids[args.batch // 2:]))
+        assert all(set(cluster) & set(new_ids) for cluster in clusters)
+        assert all(cluster == sorted(cluster, key=store.row_of) for cluster in clusters)
+
+
+if __name__ == "__main__":
+    main()
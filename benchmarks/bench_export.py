@@ -0,0 +1,98 @@
+"""
+Benchmark peak memory and wall time of library exports against library size
+
+Compares the old in-memory pandas export (list of dicts -> DataFrame ->
+BytesIO) with the streaming XLSX, CSV and NDJSON writers spooling to disk:
+
+    python benchmarks/bench_export.py --sizes 1000 10000 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+
+from utils import export_utils
+from utils.store_utils import TestCaseStore
+
+
+def make_store(n, rng):
+    modules = ["Authentication", "Checkout", "Search", "Profile", "Admin"]
+    return TestCaseStore(
+        {
+            "id": f"TC_{i:05d}",
+            "area": rng.choice(["UI/UX", "API", "Database"]),
+            "module": rng.choice(modules),
+            "title": f"Scenario {i} for {rng.choice(modules).lower()}",
+            "preconditions": ["User is registered", "Application is running"],
+            "test_data": [f"Username: user{i}", "Password: Test@123"],
+            "test_steps": [f"Step {s} of scenario {i}" for s in range(1, rng.randint(3, 8))],
+            "expected_results": ["Dashboard is shown", "Welcome message displayed"],
+            "priority": rng.choice(["High", "Medium", "Low"]),
+        }
+        for i in range(1, n + 1)
+    )
+
+
+def legacy_export(store):
+    rows = []
+    for tc in store:
+        rows.append({
+            "ID": tc.get("id", ""),
+            "Area": tc.get("area", ""),
+            "Module": tc.get("module", ""),
+            "SubModule": tc.get("submodule", ""),
+            "Title": tc.get("title", ""),
+            "Priority": tc.get("priority", ""),
+            "Preconditions": "\n".join(tc.get("preconditions", [])),
+            "Test Data": "\n".join(tc.get("test_data", [])),
+            "Steps": "\n".join(tc.get("test_steps", [])),
+            "Expected": "\n".join(tc.get("expected_results", [])),
+        })
+    buffer = BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, index=False, sheet_name="TestCases")
+    return buffer.getbuffer().nbytes
+
+
+def measure(fn):
+    """Wall time of an untraced run and peak traced allocation of a second run"""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'cases':>7} {'export':<14} {'time s':>8} {'peak MB':>9} {'file MB':>8}")
+    for n in args.sizes:
+        store = make_store(n, random.Random(5))
+        with tempfile.TemporaryDirectory() as tmp:
+            runs = [("pandas xlsx", lambda: legacy_export(store), None)]
+            for fmt in export_utils.EXPORT_FORMATS:
+                path = os.path.join(tmp, "export" + export_utils.EXPORT_FORMATS[fmt][0])
+                runs.append((f"stream {fmt}", lambda fmt=fmt, path=path: export_utils.export_to_file(store, fmt, path), path))
+            for name, fn, path in runs:
+                elapsed, peak = measure(fn)
+                size = os.path.getsize(path) / 2**20 if path else float("nan")
+                print(f"{n:>7} {name:<14} {elapsed:>8.2f} {peak / 2**20:>9.1f} {size:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
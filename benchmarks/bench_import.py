@@ -0,0 +1,62 @@
+"""
+Benchmark bulk import of exported test case files
+
+Exports a synthetic library in each format, then times importing it into
+an empty TestCaseStore:
+
+    python benchmarks/bench_import.py --cases 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(root_dir / "benchmarks"))
+
+from bench_export import make_store
+from utils import export_utils, import_utils
+from utils.store_utils import TestCaseStore
+
+
+class ExportedFile:
+    """Binary file with the name/type attributes of a Streamlit upload"""
+
+    def __init__(self, path, content_type):
+        self._file = open(path, "rb")
+        self.name = os.path.basename(path)
+        self.type = content_type
+
+    def __getattr__(self, attr):
+        return getattr(self._file, attr)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=int, default=100000)
+    parser.add_argument("--formats", nargs="+", default=list(export_utils.EXPORT_FORMATS))
+    args = parser.parse_args()
+
+    source = make_store(args.cases, random.Random(5))
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.formats:
+            suffix, mime = export_utils.EXPORT_FORMATS[fmt]
+            path = os.path.join(tmp, "export" + suffix)
+            export_utils.export_to_file(source, fmt, path)
+            store = TestCaseStore()
+            start = time.perf_counter()
+            result = import_utils.import_test_cases(ExportedFile(path, mime), store)
+            elapsed = time.perf_counter() - start
+            print(f"{fmt:<7} {len(result.imported):>8,} cases in {elapsed:6.2f}s "
+                  f"({len(result.imported) / elapsed:,.0f} cases/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark offline Java validation and targeted repair of generated code
+
+Builds generated outputs (page objects plus a test class per case), breaks
+a fraction of them the way model output breaks (truncated tail, dropped
+brace, unterminated string, class/file name mismatch), then measures how
+fast java_utils checks them, how many breakages it catches, and the tokens
+targeted repairs use compared with regenerating every broken output:
+
+    python benchmarks/bench_java_validation.py --cases 200 --broken 0.2
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(root_dir / "benchmarks"))
+
+from fake_model import FakeModel
+from utils import ai_utils, java_utils
+from utils.scheduler_utils import RequestScheduler, estimate_tokens
+
+
+def java_class(package, name, methods, rng):
+    body = "\n\n".join(
+        f"    public void action{i}(String value) {{\n"
+        f"        // waits for \"{{element}}\" before typing\n"
+        f"        WebElement el = wait.until(ExpectedConditions.visibilityOfElementLocated(By.id(\"f{rng.randint(0, 999)}\")));\n"
+        f"        el.sendKeys(value);\n"
+        f"    }}"
+        for i in range(methods)
+    )
+    return f"package {package};\n\nimport org.openqa.selenium.*;\n\npublic class {name} {{\n{body}\n}}\n"
+
+
+def make_output(case, rng):
+    files = {f"src/main/java/com/qa/pages/Page{i}Page.java": java_class("com.qa.pages", f"Page{i}Page", 12, rng)
+             for i in range(5)}
+    files[f"src/test/java/com/qa/tests/Case{case}Test.java"] = java_class("com.qa.tests", f"Case{case}Test", 6, rng)
+    return files
+
+
+def break_file(content, rng):
+    kind = rng.choice(["truncated", "brace", "string", "name"])
+    if kind == "truncated":
+        return content[:rng.randint(len(content) // 2, len(content) - 10)], kind
+    if kind == "brace":
+        return content.replace("    }\n", "\n", 1), kind
+    if kind == "string":
+        return content.replace('By.id("', 'By.id("x);', 1).replace('")));', "", 1), kind
+    return re.sub(r"public class (\w+)", r"public class \1Impl", content, count=1), kind
+
+
+def repair_response(prompt):
+    """The fake model returns a fixed file: a freshly generated class of the right name"""
+    path = re.search(r"// FILE: (\S+)", prompt).group(1)
+    name = path.rsplit("/", 1)[-1][:-len(".java")]
+    return f"// FILE: {path}\n" + java_class("com.qa", name, 12, random.Random(0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--broken", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    outputs, injected = [], 0
+    for case in range(args.cases):
+        files = make_output(case, rng)
+        if rng.random() < args.broken:
+            path = rng.choice(list(files))
+            files[path], _kind = break_file(files[path], rng)
+            injected += 1
+        outputs.append(files)
+    total_files = sum(len(files) for files in outputs)
+    total_bytes = sum(len(c) for files in outputs for c in files.values())
+
+    start = time.perf_counter()
+    problems = [java_utils.validate_files(files) for files in outputs]
+    elapsed = time.perf_counter() - start
+    detected = sum(len(p) for p in problems)
+    checker = "javalang" if java_utils.javalang is not None else "structural scan"
+    print(f"cases={args.cases} files={total_files} ({total_bytes / 1e6:.1f} MB), checker: {checker}")
+    print(f"check: {elapsed * 1000:.0f} ms ({total_files / elapsed:,.0f} files/s)")
+    print(f"breakages injected: {injected}, files flagged: {detected}, "
+          f"first-pass rate: {1 - detected / total_files:.1%}")
+
+    ai_utils.RESPONSE_CACHE = None
+    ai_utils.SCHEDULER = RequestScheduler()
+    ai_utils.MODEL = FakeModel(repair_response)
+    total = java_utils.ValidationReport()
+    regenerate = 0
+    for files, found in zip(outputs, problems):
+        if found:
+            regenerate += estimate_tokens("".join(files.values()))
+            total.merge(ai_utils.validate_and_repair(files)[1])
+    print(f"repaired {total.repaired}/{detected} with {total.repair_requests} requests: "
+          f"~{total.repair_tokens:,} tokens (prompt + output)")
+    print(f"regenerating the broken outputs instead: ~{regenerate:,} output tokens; "
+          f"saved ~{total.saved_tokens:,} output tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark how long a Streamlit script run is blocked by a bulk generation
+
+Generating automation code for a suite used to run inside the script, so
+the page was frozen (and a rerun or page switch threw the work away) until
+the last test case came back. With job_utils the script only submits a
+job and then polls it. This compares the time the script is blocked in
+both cases, and checks that several sessions' jobs share the worker pool:
+
+    python benchmarks/bench_jobs.py --cases 40 --latency 0.2 --jobs 4
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(root_dir / "benchmarks"))
+
+from fake_model import FakeModel
+from utils import ai_utils
+from utils.job_utils import JobManager
+from utils.scheduler_utils import RequestScheduler
+
+RESPONSE = "// FILE: src/test/java/com/qa/tests/CaseTest.java\npublic class CaseTest {}\n"
+
+
+def make_cases(count, prefix="TC"):
+    return [{"id": f"{prefix}_{i:03d}", "title": f"Case {i}", "test_steps": ["Open the page"],
+             "expected_results": ["Page is shown"], "priority": "High"} for i in range(count)]
+
+
+def generate_job(job, test_cases):
+    """What the automation page's job does, minus validation"""
+    for done, (tc, code, error) in enumerate(ai_utils.generate_automation_code_concurrently(test_cases), 1):
+        job.check_cancelled()
+        job.publish({"id": tc["id"], "code": code, "error": str(error) if error else None})
+        job.set_progress(done)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jobs", type=int, default=4)
+    args = parser.parse_args()
+
+    ai_utils.RESPONSE_CACHE = None
+    ai_utils.SCHEDULER = RequestScheduler()
+    ai_utils.MODEL = FakeModel(RESPONSE, latency=args.latency)
+    cases = make_cases(args.cases)
+
+    start = time.perf_counter()
+    list(ai_utils.generate_automation_code_concurrently(cases))
+    inline = time.perf_counter() - start
+    print(f"cases={args.cases} latency={args.latency}s concurrency={ai_utils.AI_MAX_CONCURRENCY}")
+    print(f"inline generation: script blocked {inline * 1000:8.1f} ms")
+
+    manager = JobManager()
+    start = time.perf_counter()
+    job = manager.submit("automation", generate_job, cases, total=len(cases))
+    submitted = time.perf_counter() - start
+    polls, poll_time, first_result = 0, 0.0, None
+    while job.running:
+        start = time.perf_counter()
+        # One fragment poll: apply what arrived and read the progress
+        if manager.take(job) and first_result is None:
+            first_result = time.perf_counter()
+        _ = job.progress
+        poll_time += time.perf_counter() - start
+        polls += 1
+        time.sleep(0.05)
+    print(f"background job:    script blocked {submitted * 1000:8.1f} ms to submit, "
+          f"{poll_time / polls * 1000:.3f} ms per poll ({polls} polls); {len(job.items)} results, {job.status}")
+
+    ai_utils.MODEL = FakeModel(RESPONSE, latency=args.latency)
+    start = time.perf_counter()
+    jobs = [manager.submit("automation", generate_job, make_cases(args.cases // args.jobs, f"S{s}"))
+            for s in range(args.jobs)]
+    while any(job.running for job in jobs):
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    print(f"{args.jobs} sessions' jobs of {args.cases // args.jobs} cases: all done in {elapsed:.2f}s "
+          f"({ai_utils.MODEL.calls} requests)")
+
+    job = manager.submit("automation", generate_job, cases)
+    time.sleep(args.latency * 1.5)
+    job.cancel()
+    while job.running:
+        time.sleep(0.01)
+    print(f"cancelled after {len(job.items)}/{args.cases} results: {job.status}")
+
+
+if __name__ == "__main__":
+    main()
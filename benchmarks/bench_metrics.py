@@ -0,0 +1,65 @@
+"""
+Benchmark the cost of recording metrics for every model call
+
+Runs generation calls against an instant fake model from several threads,
+so the time per call is almost all bookkeeping, then times rendering the
+Prometheus text that a scrape or the metrics file gets:
+
+    python benchmarks/bench_metrics.py --calls 20000 --threads 4
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(root_dir / "benchmarks"))
+
+from fake_model import FakeModel
+from utils import ai_utils, metrics_utils
+from utils.metrics_utils import GenerationMetrics
+
+
+class NullMetrics(GenerationMetrics):
+    def record_call(self, *args, **kwargs):
+        pass
+
+
+def run_calls(calls, threads):
+    prompts = [f"prompt {i}" for i in range(calls)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda prompt: ai_utils._generate(prompt, "automation", lane="bulk"), prompts))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    # No cache, quotas or model latency: only the call path itself is timed
+    ai_utils.RESPONSE_CACHE = None
+    ai_utils.SCHEDULER = ai_utils.RequestScheduler()
+    ai_utils.MODEL = FakeModel("// FILE: src/test/java/com/qa/tests/LoginTest.java\nclass LoginTest {}\n")
+
+    ai_utils.METRICS = metrics_utils.METRICS
+    with_metrics = run_calls(args.calls, args.threads)
+    ai_utils.METRICS = NullMetrics()
+    without_metrics = run_calls(args.calls, args.threads)
+    ai_utils.METRICS = metrics_utils.METRICS
+
+    overhead = (with_metrics - without_metrics) / args.calls
+    print(f"{args.calls} calls on {args.threads} threads: {with_metrics:.2f}s with metrics, "
+          f"{without_metrics:.2f}s without ({overhead * 1e6:.1f} us per call)")
+
+    start = time.perf_counter()
+    text = metrics_utils.METRICS.render()
+    print(f"render: {(time.perf_counter() - start) * 1000:.2f} ms for {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
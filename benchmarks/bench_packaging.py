@@ -0,0 +1,84 @@
+"""
+Benchmark ZIP packaging of generated automation code
+
+Separate-classes mode used to rebuild one zipfile.ZipFile per tab on every
+rerun. This compares that with package_utils.ZipPackager: building every
+tab's archive the first time, again unchanged (archive cache), after one
+file changed (entry cache), and the Maven "download all" archive:
+
+    python benchmarks/bench_packaging.py --tabs 50 --files 6
+"""
+import argparse
+import io
+import random
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+
+from utils.package_utils import ZipPackager, maven_project
+
+
+def legacy_zip(files):
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'a', zipfile.ZIP_DEFLATED, False) as zip_file:
+        for file_name, content in files.items():
+            zip_file.writestr(file_name, content)
+    zip_buffer.seek(0)
+    return zip_buffer
+
+
+def java_file(package, name, rng):
+    methods = "\n\n".join(
+        f"    public void action{i}() {{\n        driver.findElement(By.id(\"el{rng.randint(0, 10**6)}\")).click();\n    }}"
+        for i in range(40)
+    )
+    return f"package {package};\n\npublic class {name} {{\n{methods}\n}}\n"
+
+
+def make_code(tabs, files, rng):
+    """Per-case file sets; every case repeats the same page objects, as self-contained generation does"""
+    pages = {f"src/main/java/com/qa/pages/Page{i}Page.java": java_file("com.qa.pages", f"Page{i}Page", rng)
+             for i in range(files - 1)}
+    return [dict(pages, **{f"src/test/java/com/qa/tests/Case{t}Test.java": java_file("com.qa.tests", f"Case{t}Test", rng)})
+            for t in range(tabs)]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tabs", type=int, default=50)
+    parser.add_argument("--files", type=int, default=6)
+    args = parser.parse_args()
+
+    code = make_code(args.tabs, args.files, random.Random(1))
+    packager = ZipPackager()
+    print(f"tabs={args.tabs} files per tab={args.files}")
+
+    legacy = timed(lambda: [legacy_zip(files) for files in code])
+    print(f"legacy, every rerun:           {legacy * 1000:7.1f} ms")
+    first = timed(lambda: [packager.zip_bytes(files) for files in code])
+    print(f"packager, first build:         {first * 1000:7.1f} ms (shared page objects deflated once)")
+    again = timed(lambda: [packager.zip_bytes(files) for files in code])
+    print(f"packager, unchanged:           {again * 1000:7.1f} ms")
+    test_path = next(path for path in code[0] if "/tests/" in path)
+    code[0][test_path] += "// edited\n"
+    changed = timed(lambda: [packager.zip_bytes(files) for files in code])
+    print(f"packager, one file changed:    {changed * 1000:7.1f} ms")
+    download_all = timed(lambda: packager.zip_bytes(maven_project(code)))
+    print(f"download all (Maven project):  {download_all * 1000:7.1f} ms")
+    print("rerun without a download click: 0 ms (archives are only built when a download is requested)")
+    stats = packager.stats()
+    print(f"entry cache: {stats['entries']} entries, {stats['entry_hits']} hits / {stats['entry_misses']} misses")
+
+
+if __name__ == "__main__":
+    main()
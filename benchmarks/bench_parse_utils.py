@@ -0,0 +1,113 @@
+"""
+Fuzz and benchmark test case extraction from malformed model output
+
+Builds a corpus of realistic broken responses (prose around the JSON, extra
+code blocks, truncated tails, trailing commas, raw newlines in strings) and
+compares the legacy greedy regex + json.loads with parse_utils:
+
+    python benchmarks/bench_parse_utils.py --samples 500 --seed 7
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+
+from utils.parse_utils import parse_test_cases
+
+
+def make_case(i, rng):
+    return {
+        "id": f"TC_{i:03d}",
+        "title": rng.choice(["Login with {user}", 'Reject "bad" input', "Reset password", "Cart total [EUR]"]) + f" #{i}",
+        "preconditions": ["User is registered"],
+        "test_data": [rng.choice(["path C:\\temp", "json {\"a\": 1}", "plain"])],
+        "test_steps": [f"Step {s}" for s in range(rng.randint(2, 6))],
+        "expected_results": ["Result } shown"],
+        "priority": rng.choice(["High", "Medium", "Low"]),
+        "attachments": [],
+    }
+
+
+def make_body(cases):
+    """Serialize a response body, returning it with the end offset of each case"""
+    body, ends = '{"test_cases": [', []
+    for i, case in enumerate(cases):
+        body += (", " if i else "") + json.dumps(case)
+        ends.append(len(body))
+    return body + "]}", ends
+
+
+def mutate(body, ends, rng):
+    """Return (text, complete cases a perfect parser could recover, mutation kind)"""
+    n = len(ends)
+    kind = rng.choice(["clean", "prose", "second_block", "truncated", "trailing_comma", "raw_newline"])
+    if kind == "prose":
+        return f"Sure! Here are the {{cases}} you asked for:\n```json\n{body}\n```\nLet me know if you need more.", n, kind
+    if kind == "second_block":
+        return f"```json\n{body}\n```\n\nExample usage:\n```python\nprint({{'x': 1}})\n```", n, kind
+    if kind == "truncated":
+        cut = rng.randint(len(body) // 3, len(body) - 3)
+        return "```json\n" + body[:cut], sum(end <= cut for end in ends), kind
+    if kind == "trailing_comma":
+        return body.replace('"attachments": []', '"attachments": [],'), n, kind
+    if kind == "raw_newline":
+        return body.replace("Step 1", "Step\n1"), n, kind
+    return body, n, kind
+
+
+def legacy_parse(text):
+    try:
+        m = re.search(r'\{[\s\S]*\}', text)
+        return json.loads(m.group()).get("test_cases", []) if m else []
+    except Exception:
+        return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    corpus = []
+    for _ in range(args.samples):
+        body, ends = make_body([make_case(i, rng) for i in range(1, rng.randint(1, 50) + 1)])
+        corpus.append(mutate(body, ends, rng))
+
+    totals = {"legacy": 0, "parse_utils": 0, "possible": 0, "dropped": 0}
+    by_kind = {}
+    for text, possible, kind in corpus:
+        legacy = len(legacy_parse(text))
+        cases, stats = parse_test_cases(text)
+        totals["legacy"] += legacy
+        totals["parse_utils"] += len(cases)
+        totals["possible"] += possible
+        totals["dropped"] += stats.dropped
+        row = by_kind.setdefault(kind, [0, 0, 0])
+        row[0] += legacy
+        row[1] += len(cases)
+        row[2] += possible
+
+    print(f"{'kind':<16}{'legacy':>8}{'new':>8}{'possible':>10}")
+    for kind, (legacy, new, possible) in sorted(by_kind.items()):
+        print(f"{kind:<16}{legacy:>8}{new:>8}{possible:>10}")
+    print(f"{'total':<16}{totals['legacy']:>8}{totals['parse_utils']:>8}{totals['possible']:>10}"
+          f"  (dropped reported: {totals['dropped']})")
+
+    big = "Intro text\n```json\n" + json.dumps(
+        {"test_cases": [make_case(i, rng) for i in range(20000)]}) + "\n```\n" + "trailing prose " * 1000
+    for name, fn in (("legacy", legacy_parse), ("parse_utils", lambda t: parse_test_cases(t)[0])):
+        start = time.perf_counter()
+        count = len(fn(big))
+        print(f"{name}: {len(big) / 1e6:.1f} MB response -> {count} cases in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
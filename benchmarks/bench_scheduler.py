@@ -0,0 +1,160 @@
+"""
+Benchmark the request scheduler against a stubbed MODEL that returns 429s
+
+First checks retry counts, backoff bounds and the token bucket against a
+fake model and clock. Then compares a batch of automation requests without
+retries (the old behaviour, where every rate-limited case is lost) against
+the scheduler with retries, checks the requests-per-minute limit is
+respected, and measures how long an interactive request waits behind a
+bulk backlog; it fails if any of the expected results does not hold:
+
+    python benchmarks/bench_scheduler.py --cases 40 --error-rate 0.2 --rpm 600
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(root_dir / "benchmarks"))
+
+from bench_concurrent_automation import SAMPLE_CODE, make_cases
+from fake_model import FakeModel
+from utils import ai_utils
+from utils.scheduler_utils import RequestScheduler, TokenBucket
+
+
+class RecordingModel(FakeModel):
+    """FakeModel that records when each request was sent"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent = []
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.sent.append(time.monotonic())
+        return super().generate_content(prompt, stream=stream, **kwargs)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def check_scheduler():
+    """Retry counts, backoff bounds and bucket refill, which do not depend on timing"""
+    # Three 429s then success: three retries and four calls
+    scheduler = RequestScheduler(max_retries=5, base_delay=0.001, max_delay=0.01)
+    model = FakeModel("ok", fail_first=3)
+    assert scheduler.run(lambda: model.generate_content("p"), lane="bulk").text == "ok"
+    stats = scheduler.stats()["bulk"]
+    assert (model.calls, stats["retries"], stats["succeeded"], stats["failed"]) == (4, 3, 1, 0), stats
+
+    # More failures than retries: the error surfaces after max_retries + 1 calls
+    scheduler = RequestScheduler(max_retries=2, base_delay=0.001, max_delay=0.01)
+    model = FakeModel("ok", fail_first=5)
+    try:
+        scheduler.run(lambda: model.generate_content("p"))
+        raise AssertionError("expected the rate-limit error once retries ran out")
+    except Exception as e:
+        assert type(e).__name__ == "FakeRateLimitError", e
+    stats = scheduler.stats()["interactive"]
+    assert (model.calls, stats["retries"], stats["failed"]) == (3, 2, 1), stats
+
+    # Full-jitter backoff stays within base * 2 ** attempt, capped at max_delay
+    scheduler = RequestScheduler(base_delay=1.0, max_delay=8.0, rng=random.Random(0))
+    for attempt in range(8):
+        assert 0 <= scheduler.backoff(attempt) <= min(8.0, 2 ** attempt)
+
+    # 60 rpm with a burst of 2: the third request waits a second, half that after 0.5s
+    clock = FakeClock()
+    bucket = TokenBucket(60, capacity=2, clock=clock)
+    bucket.take(1)
+    bucket.take(1)
+    assert bucket.wait_time(1) == 1.0
+    clock.now = 0.5
+    assert bucket.wait_time(1) == 0.5
+    clock.now = 10.0
+    assert bucket.wait_time(1) == 0.0 and bucket.level == 2
+    print("checks:       retry counts, backoff bounds and token bucket as expected")
+
+
+def run_batch(cases, workers):
+    start = time.perf_counter()
+    results = list(ai_utils.generate_automation_code_concurrently(cases, max_workers=workers))
+    ok = sum(1 for _tc, _code, error in results if error is None)
+    return ok, time.perf_counter() - start
+
+
+def max_per_window(times, window=60.0):
+    """Most requests sent in any window-second span"""
+    best, first = 0, 0
+    for last, sent in enumerate(times):
+        while sent - times[first] > window:
+            first += 1
+        best = max(best, last - first + 1)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--workers", type=int, default=ai_utils.AI_MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    check_scheduler()
+    cases = make_cases(args.cases)
+    ai_utils.RESPONSE_CACHE = None
+    print(f"cases={args.cases} latency={args.latency}s error_rate={args.error_rate} "
+          f"rpm={args.rpm} workers={args.workers}")
+
+    ai_utils.SCHEDULER = RequestScheduler(max_retries=0)
+    model = ai_utils.MODEL = FakeModel(SAMPLE_CODE, latency=args.latency, error_rate=args.error_rate)
+    ok, elapsed = run_batch(cases, args.workers)
+    print(f"no retries:   {ok}/{args.cases} succeeded in {elapsed:.2f}s")
+    # Every injected 429 loses its case
+    assert ok == args.cases - model.failures, (ok, model.failures)
+
+    # Burst capacity of one second's worth, so the rate limit shows up within the run
+    scheduler = ai_utils.SCHEDULER = RequestScheduler(
+        args.rpm, max_retries=8, base_delay=0.05, max_delay=1.0, burst=max(1, args.rpm // 60))
+    model = ai_utils.MODEL = RecordingModel(SAMPLE_CODE, latency=args.latency, error_rate=args.error_rate)
+    ok, elapsed = run_batch(cases, args.workers)
+    stats = scheduler.stats()["bulk"]
+    window = max_per_window(model.sent, window=1.0)
+    print(f"with retries: {ok}/{args.cases} succeeded in {elapsed:.2f}s "
+          f"({stats['retries']} retries, {model.failures} injected 429s)")
+    print(f"peak rate:    {window} requests in any 1s window (limit {args.rpm / 60:.0f}/s plus the burst)")
+    # Every 429 is retried until the case succeeds, and no faster than the bucket allows
+    assert ok == args.cases, ok
+    assert stats["retries"] == model.failures and model.calls == args.cases + model.failures, (stats, model.calls)
+    assert window <= 2 * max(1, args.rpm // 60) + 1, window
+
+    # Interactive latency while a bulk batch keeps the scheduler saturated
+    ai_utils.SCHEDULER = RequestScheduler(args.rpm, burst=1)
+    ai_utils.MODEL = FakeModel(SAMPLE_CODE, latency=args.latency)
+    bulk = []
+    backlog = threading.Thread(target=lambda: bulk.append(run_batch(make_cases(args.cases * 2), args.workers)))
+    backlog.start()
+    time.sleep(0.2)
+    start = time.perf_counter()
+    ai_utils.generate_test_case_automation_code(cases[0])
+    interactive = time.perf_counter() - start
+    backlog.join()
+    print(f"interactive request behind a {args.cases * 2}-case bulk backlog: {interactive:.2f}s "
+          f"(one request slot is {60 / args.rpm:.2f}s)")
+    # Served ahead of the backlog, not after the bulk cases still queued
+    assert interactive < bulk[0][1] / 2, (interactive, bulk)
+
+
+if __name__ == "__main__":
+    main()
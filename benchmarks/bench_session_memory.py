@@ -0,0 +1,88 @@
+"""
+Benchmark per-session memory accounting and spilling generated code to disk
+
+Builds what a heavy session holds (a library, the selected cases and
+separate-class automation code with its page objects for each of them),
+measures it key by key with memory_utils, and compares the generated
+code's footprint kept in memory with the same code in a SpillingDict:
+
+    python benchmarks/bench_session_memory.py --cases 20000 --selected 500
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(root_dir / "benchmarks"))
+
+from bench_store_memory import make_cases
+from utils import memory_utils
+from utils.memory_utils import SpillingDict, deep_sizeof
+from utils.store_utils import TestCaseStore
+
+
+def java_file(name, methods):
+    body = "\n".join(f"    public void step{i}() {{\n        driver.findElement(By.id(\"f{i}\")).click();\n    }}"
+                     for i in range(methods))
+    return f"package com.qa.pages;\n\npublic class {name} {{\n{body}\n}}\n"
+
+
+def make_code(test_cases, pages, methods):
+    """Self-contained output per case: page objects plus the test class"""
+    code = {}
+    for tc in test_cases:
+        files = {f"src/main/java/com/qa/pages/Page{p}Page.java": java_file(f"Page{p}Page", methods) for p in range(pages)}
+        files[f"src/test/java/com/qa/tests/{tc['id']}Test.java"] = java_file(f"{tc['id']}Test", 8)
+        code[tc["id"]] = files
+    return code
+
+
+def measure(session):
+    start = time.perf_counter()
+    seen, sizes = set(), {}
+    for key, value in session.items():
+        sizes[key] = deep_sizeof(value, seen)
+    return sizes, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=int, default=20000)
+    parser.add_argument("--selected", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--methods", type=int, default=30, help="Methods per page object")
+    args = parser.parse_args()
+
+    store = TestCaseStore(make_cases(args.cases, random.Random(0)))
+    selected = store.rows(range(args.selected))
+    code = make_code(selected, args.pages, args.methods)
+    session = {"test_cases": store, "selected_test_cases": selected, "automation_code": code}
+
+    sizes, seconds = measure(session)
+    print(f"library={args.cases} selected={args.selected} pages per case={args.pages}")
+    print(f"measured {sum(sizes.values()) / 2 ** 20:.1f} MB in {seconds * 1000:.1f} ms:")
+    for key, size in sizes.items():
+        print(f"  {key:22} {size / 2 ** 20:8.1f} MB")
+
+    start = time.perf_counter()
+    session["automation_code"] = spilled = SpillingDict(code)
+    spill_seconds = time.perf_counter() - start
+    del code
+    sizes, _ = measure(session)
+    stats = memory_utils.get_spill_store().stats()
+    print(f"spilled (threshold {memory_utils.SPILL_THRESHOLD_KB:.0f} KB) in {spill_seconds * 1000:.1f} ms: "
+          f"automation_code {sizes['automation_code'] / 2 ** 20:.2f} MB in memory, "
+          f"{stats['files']} files / {stats['bytes'] / 2 ** 20:.1f} MB on disk (identical files stored once)")
+
+    start = time.perf_counter()
+    for files in spilled.values():
+        for content in files.values():
+            pass
+    print(f"reading every spilled file back: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark self-contained vs shared-framework "Separate Test Classes" generation
+
+The stubbed MODEL answers like the real one does: without a framework each
+test class comes with its own copy of BasePage, BaseTest, DriverFactory and
+the page objects; with one, only the test class is written. Response time
+grows with response length (chunk_latency per chunk_size characters):
+
+    python benchmarks/bench_shared_framework.py --cases 20 --pages 4
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(root_dir / "benchmarks"))
+
+from bench_concurrent_automation import make_cases
+from fake_model import FakeModel
+from utils import ai_utils, budget_utils, code_utils
+from utils.scheduler_utils import RequestScheduler
+
+
+def java_class(path, name, methods):
+    body = "\n\n".join(
+        f"    public void step{i}(String value) {{\n"
+        f"        wait.until(ExpectedConditions.visibilityOfElementLocated(locator{i})).sendKeys(value);\n"
+        f"    }}"
+        for i in range(methods)
+    )
+    return f"// FILE: {path}\npackage com.qa;\n\npublic class {name} {{\n{body}\n}}\n"
+
+
+def make_responder(pages):
+    framework = "".join(
+        [java_class("src/main/java/com/qa/base/BasePage.java", "BasePage", 6),
+         java_class("src/main/java/com/qa/base/BaseTest.java", "BaseTest", 3),
+         java_class("src/main/java/com/qa/base/DriverFactory.java", "DriverFactory", 3)]
+        + [java_class(f"src/main/java/com/qa/pages/Page{i}Page.java", f"Page{i}Page", 8) for i in range(pages)]
+    )
+
+    def respond(prompt):
+        if "shared framework layer" in prompt:
+            return framework
+        test = java_class("src/test/java/com/qa/tests/ScenarioTest.java", "ScenarioTest", 4)
+        if "framework classes" in prompt:
+            return test
+        # Self-contained: the base classes and the two pages this case uses
+        return "".join(
+            [java_class("src/main/java/com/qa/base/BasePage.java", "BasePage", 6),
+             java_class("src/main/java/com/qa/base/BaseTest.java", "BaseTest", 3),
+             java_class("src/main/java/com/qa/base/DriverFactory.java", "DriverFactory", 3),
+             java_class("src/main/java/com/qa/pages/Page0Page.java", "Page0Page", 8),
+             java_class("src/main/java/com/qa/pages/Page1Page.java", "Page1Page", 8),
+             test]
+        )
+
+    return respond
+
+
+def run(cases, shared):
+    usage = budget_utils.TokenUsage()
+    start = time.perf_counter()
+    signatures = None
+    if shared:
+        framework = ai_utils.generate_shared_framework(cases, usage=usage)
+        signatures = code_utils.java_signatures(framework)
+    files = 0
+    for _tc, code, error in ai_utils.generate_automation_code_concurrently(cases, framework=signatures, usage=usage):
+        assert error is None
+        files += len(code_utils.parse_generated_code(code))
+    return usage.as_dict(), time.perf_counter() - start, files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--chunk-latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    ai_utils.RESPONSE_CACHE = None
+    ai_utils.SCHEDULER = RequestScheduler()
+    ai_utils.MODEL = FakeModel(make_responder(args.pages), latency=0.05, chunk_latency=args.chunk_latency)
+    cases = make_cases(args.cases)
+
+    print(f"cases={args.cases} pages={args.pages} workers={ai_utils.AI_MAX_CONCURRENCY}")
+    results = {}
+    for label, shared in (("self-contained", False), ("shared", True)):
+        usage, elapsed, files = results[label] = run(cases, shared)
+        print(f"{label:15} {usage['requests']:3} requests  ~{usage['prompt_tokens']:7,} prompt tokens  "
+              f"~{usage['response_tokens']:7,} output tokens  {elapsed:6.2f}s  {files} files generated")
+    before, after = results["self-contained"], results["shared"]
+    print(f"output tokens -{1 - after[0]['response_tokens'] / before[0]['response_tokens']:.0%}, "
+          f"wall time -{1 - after[1] / before[1]:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare memory and bulk-operation cost of a list of dicts vs TestCaseStore
+
+    python benchmarks/bench_store_memory.py --cases 50000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+
+from utils.memory_utils import deep_sizeof
+from utils.store_utils import TestCaseStore
+
+
+def make_cases(n, rng):
+    areas = ["UI/UX", "API", "Database", "Security"]
+    modules = ["Authentication", "Checkout", "Search", "Profile", "Admin"]
+    return [
+        {
+            "id": f"TC_{i:05d}",
+            "area": rng.choice(areas),
+            "module": rng.choice(modules),
+            "submodule": rng.choice(["Login", "Logout", "Reset", ""]),
+            "title": f"Scenario {i} for {rng.choice(modules).lower()}",
+            "preconditions": ["User is registered", "Application is running"],
+            "test_data": [f"Username: user{i}", "Password: Test@123"],
+            "test_steps": [f"Step {s} of scenario {i}" for s in range(1, rng.randint(3, 8))],
+            "expected_results": ["Dashboard is shown", "Welcome message displayed"],
+            "priority": rng.choice(["High", "Medium", "Low"]),
+            "attachments": [],
+            "selected": False,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=int, default=50000)
+    args = parser.parse_args()
+    rng = random.Random(3)
+
+    cases = make_cases(args.cases, rng)
+    dict_bytes = deep_sizeof(cases)
+    store = TestCaseStore(make_cases(args.cases, random.Random(3)))
+    store_bytes = deep_sizeof(store)
+    print(f"{args.cases} cases")
+    print(f"list of dicts:  {dict_bytes / args.cases:8.0f} bytes/case")
+    print(f"TestCaseStore:  {store_bytes / args.cases:8.0f} bytes/case ({store_bytes / dict_bytes:.0%})")
+
+    def dict_select_all():
+        for tc in cases:
+            tc["selected"] = True
+
+    ops = [
+        ("select all", dict_select_all, lambda: store.select_all(True)),
+        ("selected count", lambda: sum(1 for tc in cases if tc.get("selected")), lambda: store.selected_count),
+        ("priority counts", lambda: [sum(1 for tc in cases if tc["priority"] == p) for p in ("High", "Medium", "Low")],
+         store.priority_counts),
+        ("lookup by id", lambda: next(tc for tc in cases if tc["id"] == f"TC_{args.cases:05d}"),
+         lambda: store.get(f"TC_{args.cases:05d}")),
+    ]
+    for name, dict_op, store_op in ops:
+        print(f"{name:<16} dicts {timed(dict_op):8.2f} ms   store {timed(store_op):8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
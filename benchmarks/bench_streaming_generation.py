@@ -0,0 +1,101 @@
+"""
+Measure time to first test case with streaming vs whole-response generation
+
+Uses a fake streaming model, so no API key is needed. First checks that
+streamed and whole responses parse to the same cases whatever the chunk
+size, and that a cut-off stream still yields the cases completed before
+the cut; it fails if they do not:
+
+    python benchmarks/bench_streaming_generation.py --cases 50 --chunk-latency 0.02
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(root_dir / "benchmarks"))
+
+from fake_model import FakeModel
+from utils import ai_utils
+from utils.scheduler_utils import RequestScheduler
+
+
+def make_cases(n):
+    return [
+        {
+            "id": f"TC_{i:03d}",
+            "title": f"Scenario {i}",
+            "preconditions": ["User is registered"],
+            "test_data": ["Username: testuser"],
+            "test_steps": ["Open login page", "Enter credentials", "Click login"],
+            "expected_results": ["Dashboard is shown"],
+            "priority": "Medium",
+            "attachments": [],
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def make_response(n):
+    return "```json\n" + json.dumps({"test_cases": make_cases(n)}, indent=2) + "\n```"
+
+
+def check_parsing(n):
+    """Parsed cases match the response exactly, independent of where chunks split it"""
+    expected = make_cases(n)
+    response = make_response(n)
+    for chunk_size in (1, 7, 64, len(response)):
+        ai_utils.MODEL = FakeModel(response, chunk_size=chunk_size)
+        assert ai_utils.generate_test_cases_from_prompt("login", num_cases=n) == expected, chunk_size
+        assert list(ai_utils.stream_test_cases_from_prompt("login", num_cases=n)) == expected, chunk_size
+
+    # A response cut off inside a case yields exactly the cases before it
+    cut = response.index('"TC_{:03d}"'.format(n // 2 + 1))
+    ai_utils.MODEL = FakeModel(response[:cut], chunk_size=64)
+    streamed = list(ai_utils.stream_test_cases_from_prompt("login", num_cases=n))
+    assert streamed == expected[:n // 2], [tc["id"] for tc in streamed]
+    print(f"checks: {n} cases parsed identically for every chunk size, {len(streamed)} kept from a cut-off stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3, help="time to first chunk")
+    parser.add_argument("--chunk-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    ai_utils.RESPONSE_CACHE = None
+    # Measure generation itself, not the AI_RPM limit
+    ai_utils.SCHEDULER = RequestScheduler()
+    check_parsing(min(args.cases, 20))
+    ai_utils.MODEL = FakeModel(make_response(args.cases), latency=args.latency,
+                               chunk_size=64, chunk_latency=args.chunk_latency)
+
+    start = time.perf_counter()
+    cases = ai_utils.generate_test_cases_from_prompt("login", num_cases=args.cases)
+    whole = time.perf_counter() - start
+    assert cases == make_cases(args.cases)
+
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for _tc in ai_utils.stream_test_cases_from_prompt("login", num_cases=args.cases):
+        count += 1
+        if first is None:
+            first = time.perf_counter() - start
+    streamed = time.perf_counter() - start
+    assert count == args.cases
+    if args.cases > 1 and args.chunk_latency:
+        # The first case is complete long before the last chunk arrives
+        assert first < whole, (first, whole)
+
+    print(f"cases={args.cases}")
+    print(f"whole response: first case after {whole:.2f}s")
+    print(f"streaming:      first case after {first:.2f}s, all cases after {streamed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import random
+import threading
+import time
+
+
+class FakeRateLimitError(Exception):
+    """Mimics the 429 ResourceExhausted error the Gemini API raises"""
+
+    code = 429
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """
+    Stand-in for genai.GenerativeModel that answers locally
+
+    Args:
+        response: Text returned for every prompt, or a callable taking the prompt
+        latency: Seconds to sleep per call (time to first chunk when streaming)
+        chunk_size: Characters per chunk when called with stream=True
+        chunk_latency: Seconds to sleep between streamed chunks
+        error_rate: Fraction of calls that fail with FakeRateLimitError
+        fail_first: Number of initial calls that fail with FakeRateLimitError
+        seed: Seed for the injected failures
+    """
+
+    def __init__(self, response="", latency=0.0, chunk_size=64, chunk_latency=0.0,
+                 error_rate=0.0, fail_first=0, seed=0):
+        self.response = response
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_latency = chunk_latency
+        self.error_rate = error_rate
+        self.fail_first = fail_first
+        self.calls = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            fail = self.calls <= self.fail_first or self._rng.random() < self.error_rate
+            self.failures += fail
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise FakeRateLimitError("429 Resource has been exhausted (e.g. check quota).")
+        text = self.response(prompt) if callable(self.response) else self.response
+        if stream:
+            return self._stream(text)
+        if self.chunk_latency:
+            # A whole response arrives only after every chunk has been produced
+            time.sleep(self.chunk_latency * max(0, -(-len(text) // self.chunk_size) - 1))
+        return FakeResponse(text)
+
+    def _stream(self, text):
+        for i in range(0, len(text), self.chunk_size):
+            if i and self.chunk_latency:
+                time.sleep(self.chunk_latency)
+            yield FakeResponse(text[i:i + self.chunk_size])
@@ -1,8 +1,8 @@
 # pages/test_automation.py
+import functools
 import streamlit as st
-import zipfile
-from io import BytesIO
-from utils import ai_utils, code_utils
+import time
+from utils import ai_utils, budget_utils, code_utils, java_utils, job_utils, memory_utils, metrics_utils, package_utils
 import utils.ui_utils as ui_utils
 
 def render_test_automation():
@@ -21,35 +21,63 @@ def render_test_automation():
     st.markdown('<div class="combined-toggle">', unsafe_allow_html=True)
     mode = st.radio("Generation Mode:", ["Combined Test Suite", "Separate Test Classes"], key="generation_mode_radio", horizontal=True)
     st.markdown('</div>', unsafe_allow_html=True)
+    share_framework = rebuild_framework = False
+    if mode == "Separate Test Classes":
+        share_framework = st.checkbox(
+            "Share page objects across test classes", value=True, key="share_framework",
+            help="Generate BasePage, BaseTest and the page objects once for the suite and reuse them in every test class")
+        if share_framework and "framework" in st.session_state.automation_code:
+            rebuild_framework = st.checkbox("Rebuild shared framework", key="rebuild_framework")
+    validate_java = st.checkbox(
+        "Check Java syntax and repair broken files", value=True, key="validate_java",
+        help="Parse the generated Java locally and send only the files with syntax errors back for a fix")
 
-    if st.button("Generate Automation Code", key="generate_automation", use_container_width=True):
-        st.session_state.automation_code = {}
+    job = apply_automation_jobs()
+    generate_clicked = st.button("Generate Automation Code", key="generate_automation",
+                                 use_container_width=True, disabled=job is not None)
+    if generate_clicked and memory_utils.check_limit():
+        # Only the entries being regenerated are replaced; code saved for
+        # other test cases is kept
+        for key in ["combined"] + [tc["id"] for tc in st.session_state.selected_test_cases]:
+            st.session_state.automation_code.pop(key, None)
+            st.session_state.setdefault("code_issues", {}).pop(key, None)
+            st.session_state.setdefault("code_errors", {}).pop(key, None)
+        st.session_state.validation_report = java_utils.ValidationReport() if validate_java else None
+        test_cases = list(st.session_state.selected_test_cases)
         if mode == "Combined Test Suite":
-            automation_code = ai_utils.generate_combined_automation_code(st.session_state.selected_test_cases)
-            if automation_code:
-                st.session_state.automation_code["combined"] = code_utils.parse_generated_code(automation_code)
-                ui_utils.show_toast("✅ Combined test suite generated successfully!")
+            job = job_utils.submit_session_job("automation", _combined_job, test_cases, validate_java,
+                                               label=f"Combined suite of {len(test_cases)} test cases", total=1)
         else:
-            for tc in st.session_state.selected_test_cases:
-                automation_code = ai_utils.generate_test_case_automation_code(tc)
-                st.session_state.automation_code[tc['id']] = code_utils.parse_generated_code(automation_code)
-            ui_utils.show_toast("✅ Automation code generated successfully!")
+            framework = None
+            if share_framework and not rebuild_framework:
+                framework = st.session_state.automation_code.get("framework")
+            job = job_utils.submit_session_job("automation", _separate_job, test_cases, share_framework,
+                                               dict(framework) if framework else None, validate_java,
+                                               label=f"Automation code for {len(test_cases)} test cases",
+                                               total=len(test_cases))
+        st.session_state.automation_job = job.id
+    if job is not None:
+        _automation_status(job)
 
-    if st.session_state.automation_code:
+    if st.session_state.automation_code or (job is not None and mode == "Separate Test Classes"):
         if mode == "Combined Test Suite" and "combined" in st.session_state.automation_code:
             st.markdown("### 🧩 Combined Test Suite")
             st.subheader("Generated Automation Code")
+            _render_validation_report()
+            _render_code_issues("combined")
             for file_name, content in st.session_state.automation_code["combined"].items():
                 with st.expander(f"📄 {file_name}"):
-                    st.code(content, language='java')
+                    st.code(content, language=code_utils.detect_language(file_name, content))
 
-            # Zip for download
-            zip_buffer = BytesIO()
-            with zipfile.ZipFile(zip_buffer, 'a', zipfile.ZIP_DEFLATED, False) as zip_file:
-                for file_name, content in st.session_state.automation_code["combined"].items():
-                    zip_file.writestr(file_name, content)
-            zip_buffer.seek(0)
-            st.download_button("Download Combined Test Suite", data=zip_buffer, file_name="CombinedTestSuite.zip", mime="application/zip", use_container_width=True)
+            # Archives are built (or taken from the packager's cache) only when clicked
+            combined = st.session_state.automation_code["combined"]
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button("Download Combined Test Suite", data=functools.partial(package_utils.get_packager().zip_bytes, combined),
+                                   file_name="CombinedTestSuite.zip", mime="application/zip", on_click="ignore", use_container_width=True)
+            with col2:
+                st.download_button("📦 Download as Maven Project", data=functools.partial(package_utils.maven_zip, [combined]),
+                                   file_name="automation-tests.zip", mime="application/zip", on_click="ignore", use_container_width=True)
 
             st.markdown("### Test Cases in this Suite")
             for test_case in st.session_state.selected_test_cases:
@@ -64,6 +92,7 @@ def render_test_automation():
         else:
             # Separate files view
             tabs = st.tabs([f"Test Case: {tc['id']}" for tc in st.session_state.selected_test_cases])
+            framework = st.session_state.automation_code.get("framework") if share_framework else None
             for idx, tc in enumerate(st.session_state.selected_test_cases):
                 with tabs[idx]:
                     st.markdown(f"### {tc['title']}")
@@ -75,17 +104,211 @@ def render_test_automation():
                         st.markdown("**Expected Results:**")
                         for result in tc['expected_results']:
                             st.markdown(f"- {result}")
-                    if tc['id'] in st.session_state.automation_code:
-                        st.subheader("Generated Automation Code")
-                        for file_name, content in st.session_state.automation_code[tc['id']].items():
-                            with st.expander(f"📄 {file_name}"):
-                                st.code(content, language='java')
-                        # ZIP download
-                        zip_buffer = BytesIO()
-                        with zipfile.ZipFile(zip_buffer, 'a', zipfile.ZIP_DEFLATED, False) as zip_file:
-                            for file_name, content in st.session_state.automation_code[tc['id']].items():
-                                zip_file.writestr(file_name, content)
-                        zip_buffer.seek(0)
-                        st.download_button(label=f"Download Code for {tc['id']}", data=zip_buffer, file_name=f"{tc['id']}_automation.zip", mime="application/zip", use_container_width=True)
-                    else:
-                        st.info("Click 'Generate Automation Code' to create Java code")
+                    _render_case_code(tc, st.session_state.get("code_errors", {}).get(tc['id']), framework)
+
+            if framework:
+                with st.expander(f"🧱 Shared framework ({len(framework)} files)"):
+                    _render_code_issues("framework")
+                    for file_name, content in framework.items():
+                        st.markdown(f"**📄 {file_name}**")
+                        st.code(content, language=code_utils.detect_language(file_name, content))
+            case_files = [st.session_state.automation_code[tc['id']] for tc in st.session_state.selected_test_cases
+                          if tc['id'] in st.session_state.automation_code]
+            if case_files:
+                st.download_button(f"📦 Download All ({len(case_files)} test classes) as Maven Project",
+                                   data=functools.partial(package_utils.maven_zip, ([framework] if framework else []) + case_files),
+                                   file_name="automation-tests.zip", mime="application/zip", on_click="ignore",
+                                   key="download_all_maven", use_container_width=True)
+            _render_run_stats()
+            _render_validation_report()
+
+
+# -- generation jobs ----------------------------------------------------
+# These run on the job manager's worker threads: no Streamlit calls. Each
+# published item is {"id": key in automation_code, "files", "report", "error"}
+
+def _code_item(key, files=None, report=None, error=None):
+    return {"id": key, "files": dict(files) if files is not None else None,
+            "report": report.as_dict() if report is not None else None, "error": error}
+
+
+def _combined_job(job, test_cases, validate_java):
+    automation_code = ai_utils.generate_combined_automation_code(test_cases)
+    if not automation_code:
+        raise RuntimeError("AI generation failed")
+    files, report = code_utils.parse_generated_code(automation_code), None
+    metrics_utils.METRICS.record_parse("combined", files)
+    if validate_java:
+        job.check_cancelled()
+        job.set_progress(0, message="Checking Java syntax...")
+        files, report = ai_utils.validate_and_repair(files)
+    job.publish(_code_item("combined", files, report))
+    job.set_progress(1, message="Combined test suite generated")
+    return {"toast": "✅ Combined test suite generated successfully!"}
+
+
+def _separate_job(job, test_cases, share_framework, framework, validate_java):
+    started = time.perf_counter()
+    usage = budget_utils.TokenUsage()
+    if share_framework and not framework:
+        job.set_progress(0, message="Generating shared page objects...")
+        framework, report = ai_utils.generate_shared_framework(test_cases, usage=usage), None
+        if framework and validate_java:
+            framework, report = ai_utils.validate_and_repair(framework, usage=usage)
+        if framework:
+            job.publish(_code_item("framework", framework, report))
+    # Without a framework the cases fall back to self-contained code
+    framework = dict(framework) if framework else None
+    signatures = code_utils.java_signatures(framework) if framework else None
+
+    failed = []
+    # Validation and repairs run in the worker threads, next to generation
+    check = functools.partial(ai_utils.validate_generated_code, usage=usage) if validate_java else None
+    results = ai_utils.generate_automation_code_concurrently(test_cases, framework=signatures, usage=usage, postprocess=check)
+    for done, (tc, automation_code, error) in enumerate(results, 1):
+        # Raising here closes results, which cancels the requests not sent yet
+        job.check_cancelled()
+        if error is None:
+            report = None
+            if validate_java:
+                files, report = automation_code
+            else:
+                files = code_utils.parse_generated_code(automation_code)
+                metrics_utils.METRICS.record_parse("automation", files)
+            if framework:
+                shared = dict(framework)
+                files = code_utils.split_shared_files(files, framework)
+                # Page objects the case added now live only in the framework,
+                # so it is published again before the case that needs them
+                if framework != shared:
+                    job.publish(_code_item("framework", framework))
+            job.publish(_code_item(tc['id'], files, report))
+        else:
+            failed.append(tc['id'])
+            job.publish(_code_item(tc['id'], error=str(error)))
+        job.set_progress(done, message=f"Generated {done}/{len(test_cases)} test cases")
+    return {"failed": failed, "run": dict(
+        usage.as_dict(), mode="shared" if framework else "independent",
+        cases=len(test_cases), seconds=time.perf_counter() - started)}
+
+
+def apply_automation_job(job):
+    """Store the code job published since the last call; returns the keys applied"""
+    keys = []
+    for item in job_utils.get_job_manager().take(job):
+        key = item["id"]
+        if item["error"] is None:
+            st.session_state.automation_code[key] = item["files"]
+            st.session_state.setdefault("code_errors", {}).pop(key, None)
+        else:
+            st.session_state.setdefault("code_errors", {})[key] = item["error"]
+        if item["report"] is not None:
+            _record_validation(key, java_utils.ValidationReport.from_dict(item["report"]))
+        keys.append(key)
+    return keys
+
+
+def apply_automation_jobs():
+    """
+    Apply this session's automation job, whichever page is showing
+
+    Returns:
+        The job while it is running, else None
+    """
+    job_id = st.session_state.get("automation_job")
+    job = job_utils.get_job_manager().get(job_id) if job_id else None
+    if job is None:
+        st.session_state.pop("automation_job", None)
+        return None
+    apply_automation_job(job)
+    if job.running:
+        return job
+    del st.session_state.automation_job
+    result = job.result or {}
+    if result.get("run"):
+        st.session_state.setdefault("automation_runs", []).append(result["run"])
+    if job.status == job_utils.CANCELLED:
+        ui_utils.show_toast("⚠️ Automation code generation cancelled")
+    elif job.status == job_utils.FAILED:
+        ui_utils.show_toast(f"❌ {job.label} failed: {job.error}")
+    elif result.get("failed"):
+        ui_utils.show_toast(f"⚠️ Generated {job.total - len(result['failed'])}/{job.total} test cases")
+    else:
+        ui_utils.show_toast(result.get("toast", "✅ Automation code generated successfully!"))
+    return None
+
+
+def _automation_status(job):
+    """Progress of the running job, polled from a fragment; the page reruns when code arrives"""
+    @st.fragment(run_every=1.0)
+    def _automation_progress():
+        if not job.running or job.pending:
+            st.rerun()
+        col1, col2 = st.columns([4, 1])
+        col1.progress(job.progress, text=f"{job.label}: {job.message or job.status}")
+        if col2.button("Cancel", key="automation_cancel", use_container_width=True, disabled=job.cancelled):
+            job.cancel()
+    _automation_progress()
+
+
+def _render_run_stats():
+    """Show the cost of the last separate-classes run, compared with the last run of the other mode"""
+    runs = st.session_state.get("automation_runs")
+    if not runs:
+        return
+    last = runs[-1]
+    label = "shared framework" if last["mode"] == "shared" else "self-contained classes"
+    text = (f"Last run ({label}): {last['cases']} test cases, {last['requests']} requests "
+            f"({last['cached']} cached), ~{last['response_tokens']:,} output tokens in {last['seconds']:.1f}s")
+    other = next((run for run in reversed(runs) if run["mode"] != last["mode"]), None)
+    if other and other["response_tokens"] and other["seconds"]:
+        change = lambda key: (last[key] / last["cases"]) / (other[key] / other["cases"]) - 1
+        text += (f" · per test case vs the last {'self-contained' if other['mode'] == 'independent' else 'shared'} run: "
+                 f"output tokens {change('response_tokens'):+.0%}, time {change('seconds'):+.0%}")
+    st.caption(text)
+
+
+def _record_validation(key, report):
+    """Keep a validation report's unrepaired files for display and add it to this run's totals"""
+    st.session_state.setdefault("code_issues", {})[key] = report.broken
+    if st.session_state.get("validation_report") is not None:
+        st.session_state.validation_report.merge(report)
+
+
+def _render_validation_report():
+    report = st.session_state.get("validation_report")
+    if not report or not report.checked:
+        return
+    text = (f"Java syntax check: {report.first_pass_ok}/{report.checked} files valid on first pass "
+            f"({report.first_pass_rate:.0%})")
+    if report.repair_requests:
+        text += (f" · {report.repaired} repaired with {report.repair_requests} targeted requests "
+                 f"(~{report.repair_tokens:,} tokens, ~{report.saved_tokens:,} output tokens saved vs regenerating)")
+    broken = sum(len(files) for files in st.session_state.get("code_issues", {}).values())
+    if broken:
+        text += f" · {broken} still broken"
+    st.caption(text)
+
+
+def _render_code_issues(key):
+    for path, issues in st.session_state.get("code_issues", {}).get(key, {}).items():
+        st.warning(f"⚠️ {path} still has syntax errors:\n{java_utils.format_issues(issues)}")
+
+
+def _render_case_code(tc, error=None, framework=None):
+    if error is not None:
+        st.error(f"AI generation failed: {error}")
+    elif tc['id'] in st.session_state.automation_code:
+        st.subheader("Generated Automation Code")
+        _render_code_issues(tc['id'])
+        for file_name, content in st.session_state.automation_code[tc['id']].items():
+            with st.expander(f"📄 {file_name}"):
+                st.code(content, language=code_utils.detect_language(file_name, content))
+        # ZIP download, with the shared framework so the test class compiles
+        files = dict(framework or {}, **st.session_state.automation_code[tc['id']])
+        st.download_button(label=f"Download Code for {tc['id']}", data=functools.partial(package_utils.get_packager().zip_bytes, files),
+                           file_name=f"{tc['id']}_automation.zip", mime="application/zip", on_click="ignore", use_container_width=True)
+    elif st.session_state.get("automation_job"):
+        st.info("⏳ Generating...")
+    else:
+        st.info("Click 'Generate Automation Code' to create Java code")
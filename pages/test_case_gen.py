@@ -1,16 +1,16 @@
 # pages/test_case_gen.py
 import streamlit as st
-import base64
-import pandas as pd
-from io import BytesIO
-from utils import file_utils, ai_utils
+import time
+from utils import file_utils, ai_utils, search_utils, blob_utils, db_utils, dedup_utils, export_utils, import_utils, job_utils, memory_utils, report_utils
 import utils.ui_utils as ui_utils
 
 # Initialize session state
 if "test_cases" not in st.session_state:
-    st.session_state.test_cases = []
+    st.session_state.test_cases = db_utils.load_library()
 if "test_cases_str" not in st.session_state:
     st.session_state.test_cases_str = ""
+if "file_content" not in st.session_state:
+    st.session_state.file_content = memory_utils.SpillingDict()
 if "editing_test_case" not in st.session_state:
     st.session_state.editing_test_case = None
 if "editing_index" not in st.session_state:
@@ -19,6 +19,247 @@ if "selected_test_cases" not in st.session_state:
     st.session_state.selected_test_cases = []
 
 
+def _document_sections(uploaded_file):
+    """Lazily read an uploaded requirements document as generation sections"""
+    # Problems go through report_utils, like those of generation jobs
+    try:
+        chunks = file_utils.iter_file_chunks(uploaded_file)
+        yield from ai_utils.split_into_sections(chunk.text for chunk in chunks)
+    except file_utils.ExtractionLimitError as e:
+        report_utils.report("warning", f"{e}; only the first part was used")
+    except Exception as e:
+        report_utils.report("error", f"Failed to read {uploaded_file.name}: {e}")
+
+
+def _document_text(uploaded_file):
+    """{section name: text} of an uploaded document, extracted once and spilled to disk when large"""
+    # Only the latest document is kept; a running job holds on to the one it reads
+    key = f"{uploaded_file.name}:{uploaded_file.file_id}"
+    if key not in st.session_state.file_content:
+        with st.spinner(f"Reading {uploaded_file.name}..."):
+            sections = {f"section {i:04d}": text for i, text in enumerate(_document_sections(uploaded_file), 1)}
+        if not sections:
+            return sections
+        st.session_state.file_content = memory_utils.SpillingDict({key: sections})
+    return st.session_state.file_content[key]
+
+
+# -- generation jobs ----------------------------------------------------
+# These run on the job manager's worker threads: no Streamlit calls, and
+# cases are published to the job for the session to add to its library
+
+def _context_job(job, context_prompt, num_cases, context):
+    generated_cases = ai_utils.generate_test_cases_from_prompt(
+        context_prompt, num_cases=num_cases, priority=context["priority"]
+    )
+    for tc in generated_cases:
+        tc.setdefault("area", context["area"])
+        tc.setdefault("module", context["module"])
+        tc.setdefault("submodule", context["submodule"])
+        job.publish(tc)
+    job.set_progress(len(generated_cases))
+
+
+def _sections_job(job, sections, cases_per_section, priority):
+    def on_progress(done, error):
+        job.check_cancelled()
+        job.set_progress(done, message=f"Processed {done} section(s)...")
+
+    # Sections are deduplicated against each other, so cases arrive once all are done
+    generated_cases, failed = ai_utils.generate_test_cases_map_reduce(
+        sections, cases_per_section=cases_per_section, priority=priority, on_progress=on_progress,
+    )
+    if failed:
+        job.log("warning", f"⚠️ {len(failed)} section(s) failed to generate")
+    for tc in generated_cases:
+        job.publish(tc)
+
+
+def _stream_job(job, user_story, num_cases, priority):
+    for tc in ai_utils.stream_test_cases_from_prompt(user_story, num_cases=num_cases, priority=priority):
+        job.check_cancelled()
+        job.publish(tc)
+        job.set_progress(len(job.items), message=f"Received {len(job.items)}/{num_cases} test cases")
+
+
+def _submit_generation(label, fn, *args, total=None):
+    """Queue a generation job for this session; returns None when the session is over its memory limit"""
+    if not memory_utils.check_limit():
+        return None
+    job = job_utils.submit_session_job("test_cases", fn, *args, label=label, total=total)
+    st.session_state.setdefault("generation_jobs", []).append(job.id)
+    return job
+
+
+def apply_generation_job(job):
+    """Add the cases job published since the last call to the library"""
+    store = st.session_state.test_cases
+    generated_cases = []
+    for tc in job_utils.get_job_manager().take(job):
+        tc = dict(tc, id=store.next_id(), selected=False)
+        tc.setdefault("attachments", [])
+        tc["id"] = store.add(tc)
+        generated_cases.append(tc)
+    if generated_cases:
+        _index_generated(generated_cases)
+    return generated_cases
+
+
+def apply_generation_jobs():
+    """
+    Apply this session's generation jobs, whichever page is showing
+
+    Returns:
+        The jobs still running
+    """
+    manager = job_utils.get_job_manager()
+    running = []
+    for job_id in st.session_state.get("generation_jobs", []):
+        job = manager.get(job_id)
+        if job is None:
+            continue
+        apply_generation_job(job)
+        if job.running:
+            running.append(job)
+        elif job.status == job_utils.FAILED:
+            ui_utils.show_toast(f"❌ {job.label} failed: {job.error}")
+        elif job.status == job_utils.CANCELLED:
+            ui_utils.show_toast(f"⚠️ {job.label} cancelled after {len(job.items)} cases")
+        elif not job.items:
+            ui_utils.show_toast(f"⚠️ {job.label}: no test cases generated")
+    st.session_state.generation_jobs = [job.id for job in running]
+    return running
+
+
+def _generation_status():
+    """Progress of this session's running generation jobs, polled from a fragment"""
+    if not st.session_state.get("generation_jobs"):
+        return
+
+    @st.fragment(run_every=1.0)
+    def _generation_progress():
+        running = apply_generation_jobs()
+        if not running:
+            # Show the new cases in the library
+            st.rerun()
+        for job in running:
+            col1, col2 = st.columns([4, 1])
+            text = f"{job.label}: {job.message or job.status}"
+            col1.progress(job.progress, text=text)
+            if col2.button("Cancel", key=f"cancel_{job.id}", use_container_width=True, disabled=job.cancelled):
+                job.cancel()
+            recent = job.items[-3:]
+            if recent:
+                col1.caption(" · ".join(f"✅ {tc.get('title', '')}" for tc in recent))
+    _generation_progress()
+
+
+def _export_status():
+    """Progress of the running export, or the download once it is done"""
+    job = st.session_state.get("export_job")
+    if job is None:
+        return
+    if job.running:
+        # Poll the job from a fragment so only this panel reruns
+        @st.fragment(run_every=0.5)
+        def _export_progress():
+            if not job.running:
+                st.rerun()
+            col1, col2 = st.columns([4, 1])
+            col1.progress(job.progress, text=f"Exporting {job.done:,} of {job.total:,} cases...")
+            if col2.button("Cancel", key="export_cancel", use_container_width=True):
+                job.cancel()
+        _export_progress()
+    elif job.error:
+        if not isinstance(job.error, export_utils.ExportCancelled):
+            st.error("Export failed: " + str(job.error))
+        job.discard()
+        del st.session_state.export_job
+    else:
+        st.download_button(
+            f"💾 Download {job.file_name} ({job.total:,} cases, {job.finished - job.started:.1f}s)",
+            data=job.read,
+            file_name=job.file_name,
+            mime=job.mime,
+            on_click="ignore",
+            key="export_download",
+        )
+
+
+def _index_generated(generated_cases):
+    """Index a generation batch and queue any near-duplicates it introduced for review"""
+    store = st.session_state.test_cases
+    index = search_utils.get_test_case_index(store)
+    index.upsert(generated_cases)
+    clusters = dedup_utils.find_duplicate_clusters(store, index, [tc["id"] for tc in generated_cases])
+    message = f"✅ Generated {len(generated_cases)} cases!"
+    if clusters:
+        st.session_state.duplicate_clusters = dedup_utils.merge_clusters(
+            clusters, st.session_state.get("duplicate_clusters", [])
+        )
+        message += f" {len(clusters)} look like duplicates"
+    ui_utils.show_toast(message)
+
+
+def _merge_duplicate_clusters(store, clusters):
+    blob_store = blob_utils.get_attachment_store()
+    index = search_utils.get_test_case_index(store)
+    removed_total = 0
+    for cluster in clusters:
+        _keep_id, removed, released = dedup_utils.merge_duplicates(store, cluster)
+        if released:
+            blob_store.release(released)
+        index.remove(removed)
+        removed_total += len(removed)
+    return removed_total
+
+
+def _duplicates_panel(store):
+    """Review queue of near-duplicate clusters found in generated batches"""
+    clusters = [
+        [tc_id for tc_id in cluster if tc_id in store]
+        for cluster in st.session_state.get("duplicate_clusters", [])
+    ]
+    clusters = [sorted(cluster, key=store.row_of) for cluster in clusters if len(cluster) > 1]
+    st.session_state.duplicate_clusters = clusters
+    if not clusters:
+        return
+
+    with st.expander(f"🧬 {len(clusters)} possible duplicate group(s)", expanded=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🔗 Merge All", use_container_width=True, key="dup_merge_all"):
+                removed = _merge_duplicate_clusters(store, clusters)
+                st.session_state.duplicate_clusters = []
+                ui_utils.show_toast(f"✅ Removed {removed} duplicate cases")
+                st.rerun()
+        with col2:
+            if st.button("Dismiss All", use_container_width=True, key="dup_dismiss_all"):
+                st.session_state.duplicate_clusters = []
+                st.rerun()
+
+        for i, cluster in enumerate(clusters):
+            lines = [
+                f"- {'**keep**' if pos == 0 else 'drop'} · {tc_id} - {store.get(tc_id)['title']}"
+                for pos, tc_id in enumerate(cluster)
+            ]
+            col1, col2, col3 = st.columns([6, 1, 1])
+            col1.markdown("\n".join(lines))
+            if col2.button("Merge", key=f"dup_merge_{cluster[0]}", use_container_width=True):
+                removed = _merge_duplicate_clusters(store, [cluster])
+                st.session_state.duplicate_clusters = [c for c in clusters if c is not cluster]
+                ui_utils.show_toast(f"✅ Merged into {cluster[0]}, removed {removed}")
+                st.rerun()
+            if col3.button("Keep", key=f"dup_keep_{cluster[0]}", use_container_width=True):
+                st.session_state.duplicate_clusters = [c for c in clusters if c is not cluster]
+                st.rerun()
+
+
+def _toggle_select_all(store):
+    store.select_all(st.session_state.lib_select_all)
+    ui_utils.reset_card_selection()
+
+
 def render_test_case_gen():
     st.markdown("## 🧪 Test Case Generator")
     st.caption("Create comprehensive test cases using AI or manually")
@@ -86,13 +327,12 @@ def render_test_case_gen():
                 if not title or not steps or not expected:
                     st.error("⚠️ Please fill required fields (marked with *)")
                 else:
-                    attachments_data = []
-                    for f in attachments or []:
-                        content = base64.b64encode(f.read()).decode("utf-8")
-                        attachments_data.append({"name": f.name, "type": f.type, "content": content})
+                    # Only references are kept in the session; the bytes live in the blob store
+                    blob_store = blob_utils.get_attachment_store()
+                    attachments_data = [blob_store.put(f, f.name, f.type) for f in attachments or []]
 
                     test_case = {
-                        "id": f"TC_{len(st.session_state.test_cases) + 1:03d}",
+                        "id": st.session_state.test_cases.next_id(),
                         "area": area,
                         "module": module_name,
                         "submodule": submodule,
@@ -105,7 +345,8 @@ def render_test_case_gen():
                         "attachments": attachments_data,
                         "selected": False,
                     }
-                    st.session_state.test_cases.append(test_case)
+                    st.session_state.test_cases.add(test_case)
+                    search_utils.get_test_case_index(st.session_state.test_cases).upsert([test_case])
                     ui_utils.show_toast("✅ Test case saved!")
                     st.rerun()
 
@@ -133,20 +374,36 @@ Scenario: {context['title']}
 Steps: {context['steps']}
 Expected: {context['expected']}"""
 
-                with st.spinner("Generating..."):
-                    generated_cases = ai_utils.generate_test_cases_from_prompt(
-                        context_prompt, num_cases=num_generate, priority=context['priority']
-                    )
-                    if generated_cases:
-                        for i, tc in enumerate(generated_cases):
-                            tc["id"] = f"TC_{len(st.session_state.test_cases) + i + 1:03d}"
-                            tc.setdefault("area", context['area'])
-                            tc.setdefault("module", context['module'])
-                            tc.setdefault("submodule", context['submodule'])
-                            tc["selected"] = False
-                            st.session_state.test_cases.append(tc)
-                        ui_utils.show_toast(f"✅ Generated {len(generated_cases)} cases!")
-                        st.rerun()
+                if _submit_generation(f"Generating {num_generate} cases from context", _context_job,
+                                      context_prompt, num_generate, context, total=num_generate):
+                    st.rerun()
+
+        # Bulk import of exported suites
+        with st.expander("📤 Import Test Cases", expanded=False):
+            import_file = st.file_uploader(
+                "Exported test cases (XLSX, CSV or NDJSON with the Export columns)",
+                type=["xlsx", "xls", "csv", "ndjson", "jsonl"],
+                key="mc_import_file",
+            )
+            if import_file and st.button("📤 Import", use_container_width=True, key="mc_import") and memory_utils.check_limit():
+                with st.spinner("Importing..."):
+                    try:
+                        result = import_utils.import_test_cases(import_file, st.session_state.test_cases)
+                    except Exception as e:
+                        st.error("Failed to import test cases: " + str(e))
+                        result = None
+                if result:
+                    # Rebuilt lazily on the next search instead of embedding every imported case now
+                    st.session_state.pop("tc_index", None)
+                    notes = []
+                    if result.renumbered:
+                        notes.append(f"{result.renumbered:,} got new IDs")
+                    if result.defaulted_priorities:
+                        notes.append(f"{result.defaulted_priorities:,} unknown priorities set to Medium")
+                    st.success(f"✅ Imported {len(result.imported):,} test cases" + (f" ({'; '.join(notes)})" if notes else ""))
+                    if result.skipped:
+                        st.warning(f"⚠️ Skipped {result.skipped:,} rows without a title or steps")
+                        st.caption("\n".join(f"Row {row}: {message}" for row, message in result.errors))
 
     # -------------------------
     # AI Generation tab
@@ -159,138 +416,147 @@ Expected: {context['expected']}"""
             placeholder="Example:\nAs a user, I want to login so that I can access my account.\n\nAcceptance Criteria:\n• Valid credentials allow login\n• Invalid credentials show error",
         )
         
+        requirements_file = st.file_uploader(
+            "Or upload a requirements document",
+            type=["txt", "pdf", "docx", "csv", "xlsx", "xls"],
+            key="gen_req_file",
+        )
+
         col1, col2 = st.columns([3, 1])
         with col1:
-            num_test_cases = st.slider("Cases to Generate", 1, 50, 10, key="gen_req_num")
+            if requirements_file:
+                num_test_cases = st.slider("Cases per Section", 1, 20, 5, key="gen_req_per_section")
+            else:
+                num_test_cases = st.slider("Cases to Generate", 1, 50, 10, key="gen_req_num")
         with col2:
             priority = st.selectbox("Default Priority", ["High", "Medium", "Low"], index=1)
             
         if st.button("🤖 Generate Test Cases", use_container_width=True, type="primary"):
-            if user_story:
-                with st.spinner(f"Generating {num_test_cases} test cases..."):
-                    generated_cases = ai_utils.generate_test_cases_from_prompt(
-                        user_story, num_cases=num_test_cases, priority=priority
-                    )
-                    if generated_cases:
-                        for i, tc in enumerate(generated_cases):
-                            tc["id"] = f"TC_{len(st.session_state.test_cases) + i + 1:03d}"
-                            tc["selected"] = False
-                            tc.setdefault("attachments", [])
-                        st.session_state.test_cases.extend(generated_cases)
-                        ui_utils.show_toast(f"✅ Generated {len(generated_cases)} cases!")
-                        st.rerun()
+            if requirements_file or len(user_story) > ai_utils.SECTION_CHARS:
+                # Large input: generate per section in parallel, then merge
+                if requirements_file:
+                    sections = _document_text(requirements_file).values()
+                    cases_per_section = num_test_cases
+                else:
+                    sections = list(ai_utils.split_into_sections([user_story]))
+                    cases_per_section = -(-num_test_cases // len(sections))
+                label = f"Generating from {requirements_file.name}" if requirements_file else "Generating from requirements"
+                if _submit_generation(label, _sections_job, sections, cases_per_section, priority):
+                    st.rerun()
+            elif user_story:
+                # Cases reach the library as each one completes
+                if _submit_generation(f"Generating {num_test_cases} test cases", _stream_job,
+                                      user_story, num_test_cases, priority, total=num_test_cases):
+                    st.rerun()
             else:
                 st.warning("⚠️ Please enter requirements")
 
+    _generation_status()
+
     # -------------------------
     # Test Case Management
     # -------------------------
-    if st.session_state.test_cases:
+    store = st.session_state.test_cases
+    if store:
         st.markdown("---")
         st.markdown("## 📋 Test Case Library")
+        _duplicates_panel(store)
         
         # Bulk actions
+        ui_utils.apply_card_selection(store)
         col1, col2, col3, col4, col5 = st.columns([1, 1.5, 1.5, 1.5, 1])
         with col1:
-            all_selected = all(tc.get("selected", False) for tc in st.session_state.test_cases)
-            select_all = st.checkbox("Select All", value=all_selected)
-            if select_all != all_selected:
-                for tc in st.session_state.test_cases:
-                    tc["selected"] = select_all
+            # Keep the checkbox in step with per-card changes; user toggles
+            # are applied by the callback before the next rerun
+            st.session_state.lib_select_all = store.all_selected()
+            st.checkbox("Select All", key="lib_select_all", on_change=_toggle_select_all, args=(store,))
 
-        selected_count = sum(1 for tc in st.session_state.test_cases if tc.get("selected", False))
+        selected_count = store.selected_count
         
         with col2:
             if selected_count > 0:
                 if st.button(f"🤖 Automate ({selected_count})", use_container_width=True):
-                    st.session_state.selected_test_cases = [
-                        tc for tc in st.session_state.test_cases if tc.get("selected", False)
-                    ]
+                    st.session_state.selected_test_cases = store.selected_cases()
                     st.switch_page("pages/test_automation.py") if hasattr(st, 'switch_page') else None
         with col3:
-            if st.button("📥 Export Excel", use_container_width=True):
-                rows = []
-                for tc in st.session_state.test_cases:
-                    rows.append({
-                        "ID": tc.get("id", ""),
-                        "Area": tc.get("area", ""),
-                        "Module": tc.get("module", ""),
-                        "SubModule": tc.get("submodule", ""),
-                        "Title": tc.get("title", ""),
-                        "Priority": tc.get("priority", ""),
-                        "Preconditions": "\n".join(tc.get("preconditions", [])),
-                        "Test Data": "\n".join(tc.get("test_data", [])),
-                        "Steps": "\n".join(tc.get("test_steps", [])),
-                        "Expected": "\n".join(tc.get("expected_results", [])),
-                    })
-                df = pd.DataFrame(rows)
-                buffer = BytesIO()
-                df.to_excel(buffer, index=False, sheet_name="TestCases")
-                buffer.seek(0)
-                st.download_button(
-                    "💾 Download",
-                    buffer,
-                    "test_cases.xlsx",
-                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    use_container_width=True
-                )
+            export_format = st.selectbox(
+                "Export format", list(export_utils.EXPORT_FORMATS), key="lib_export_format",
+                format_func=str.upper, label_visibility="collapsed",
+            )
+            export_job = st.session_state.get("export_job")
+            if st.button("📥 Export", use_container_width=True, disabled=bool(export_job and export_job.running)):
+                if export_job:
+                    export_job.discard()
+                st.session_state.export_job = export_utils.start_export(store, export_format)
+                st.rerun()
         
         with col4:
             if selected_count > 0:
                 if st.button(f"🗑️ Delete ({selected_count})", use_container_width=True):
-                    st.session_state.test_cases = [
-                        tc for tc in st.session_state.test_cases if not tc.get("selected", False)
-                    ]
+                    released = store.attachments(store.selected_rows())
+                    removed = store.delete_selected()
+                    if released:
+                        blob_utils.get_attachment_store().release(released)
+                    search_utils.get_test_case_index(store).remove(removed)
                     ui_utils.show_toast(f"✅ Deleted {selected_count} cases")
                     st.rerun()
 
-        # Display test cases
-        for idx, tc in enumerate(st.session_state.test_cases):
-            col1, col2 = st.columns([0.05, 0.95])
-            with col1:
-                selected = st.checkbox("", value=tc.get("selected", False), key=f"sel_{tc['id']}", label_visibility="collapsed")
-                tc["selected"] = selected
-            
-            with col2:
-                priority_colors = {"High": "🔴", "Medium": "🟡", "Low": "🟢"}
-                priority_icon = priority_colors.get(tc['priority'], "⚪")
-                
-                with st.expander(f"{priority_icon} **{tc['id']}** - {tc['title']}", expanded=False):
-                    if tc.get("area") or tc.get("module") or tc.get("submodule"):
-                        info_parts = [p for p in [tc.get("area"), tc.get("module"), tc.get("submodule")] if p]
-                        st.caption(" > ".join(info_parts))
-                    
-                    col_a, col_b, col_c = st.columns(3)
-                    with col_a:
-                        if tc.get("preconditions"):
-                            st.markdown("**Preconditions:**")
-                            for pre in tc["preconditions"]:
-                                st.markdown(f"• {pre}")
-                    with col_b:
-                        if tc.get("test_data"):
-                            st.markdown("**Test Data:**")
-                            for data in tc["test_data"]:
-                                st.markdown(f"• {data}")
-                    
-                    st.markdown("**Test Steps:**")
-                    for i, step in enumerate(tc["test_steps"], 1):
-                        st.markdown(f"{i}. {step}")
-                    
-                    st.markdown("**Expected Results:**")
-                    for result in tc["expected_results"]:
-                        st.markdown(f"✓ {result}")
-                    
-                    # Actions
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.button("✏️ Edit", key=f"edit_{tc['id']}", use_container_width=True):
-                            st.session_state.editing_test_case = tc
-                            st.session_state.editing_index = idx
-                            st.rerun()
-                    with col2:
-                        if st.button("🤖 Automate", key=f"auto_{tc['id']}", use_container_width=True):
-                            st.session_state.selected_test_cases = [tc]
-                            # Navigate to automation page
+        _export_status()
+
+        # Filters are applied server-side; only the current page builds widgets
+        fcol1, fcol2, fcol3, fcol4 = st.columns([1.5, 1, 1, 2])
+        with fcol1:
+            priority_filter = st.multiselect("Priority", ["High", "Medium", "Low"], key="lib_priority")
+        with fcol2:
+            area_filter = st.selectbox(
+                "Area", ["All"] + store.distinct("area"), key="lib_area"
+            )
+        with fcol3:
+            module_filter = st.selectbox(
+                "Module", ["All"] + store.distinct("module"), key="lib_module"
+            )
+        with fcol4:
+            text_filter = st.text_input("Contains", placeholder="Text in title, steps or results", key="lib_text")
+
+        # Semantic search
+        search_query = st.text_input(
+            "🔍 Search similar test cases",
+            placeholder="Describe a scenario, e.g. login with expired password",
+            key="library_search",
+        )
+        filters = dict(
+            priorities=priority_filter,
+            area=None if area_filter == "All" else area_filter,
+            module=None if module_filter == "All" else module_filter,
+            text=text_filter,
+        )
+        scores = None
+        if search_query:
+            index = search_utils.get_test_case_index(store)
+            scores = dict(index.search(search_query, k=20))
+            filters["ids"] = list(scores)
+
+        # Display test cases; only the visible page is read from the store
+        render_start = time.perf_counter()
+        matching = store.count(**filters)
+        if scores is not None:
+            st.caption(f"Showing {matching} most similar test cases")
+        offset, page_size = ui_utils.page_bounds(matching, key="lib_page")
+        if scores is None:
+            page_items = store.page(offset, page_size, **filters)
+        else:
+            ranked = sorted(store.page(0, matching, **filters), key=lambda item: -scores[item[1]["id"]])
+            page_items = ranked[offset:offset + page_size]
+        for row, tc in page_items:
+            was_selected = tc["selected"]
+            if ui_utils.display_test_case_card(tc, row) != was_selected:
+                store.set_selected(row, not was_selected)
+        render_ms = (time.perf_counter() - render_start) * 1000
+        budget_note = "" if render_ms <= ui_utils.LIBRARY_RENDER_BUDGET_MS else " ⚠️ over budget"
+        st.caption(
+            f"Showing {len(page_items)} of {matching} matching cases "
+            f"({len(store)} total) · rendered in {render_ms:.0f} ms{budget_note}"
+        )
     else:
         st.info("💡 No test cases yet. Create or generate test cases to get started.")
 
@@ -301,6 +567,7 @@ Expected: {context['expected']}"""
         
         st.markdown("---")
         st.markdown(f"### ✏️ Editing: {tc['id']}")
+        ui_utils.display_attachment_downloads(tc.get("attachments", []), key=f"edit_{tc['id']}")
         
         with st.form(f"edit_form_{tc['id']}"):
             col1, col2, col3 = st.columns(3)
@@ -330,7 +597,7 @@ Expected: {context['expected']}"""
             col1, col2 = st.columns(2)
             with col1:
                 if st.form_submit_button("💾 Save Changes", use_container_width=True):
-                    st.session_state.test_cases[idx] = {
+                    updated = {
                         "id": tc["id"],
                         "area": area,
                         "module": module,
@@ -344,9 +611,17 @@ Expected: {context['expected']}"""
                         "attachments": tc.get("attachments", []),
                         "selected": tc.get("selected", False),
                     }
-                    st.session_state.editing_test_case = None
-                    ui_utils.show_toast("✅ Updated!")
-                    st.rerun()
+                    row = st.session_state.test_cases.row_of(tc["id"])
+                    if row is None:
+                        # Deleted here or in another session while it was being edited
+                        st.session_state.editing_test_case = None
+                        st.warning(f"⚠️ {tc['id']} was deleted while you were editing it; changes not saved")
+                    else:
+                        st.session_state.test_cases.update(row, updated)
+                        search_utils.get_test_case_index(st.session_state.test_cases).upsert([updated])
+                        st.session_state.editing_test_case = None
+                        ui_utils.show_toast("✅ Updated!")
+                        st.rerun()
             with col2:
                 if st.form_submit_button("❌ Cancel", use_container_width=True):
                     st.session_state.editing_test_case = None
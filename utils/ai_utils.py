@@ -1,27 +1,238 @@
 # utils/ai_utils.py
+import functools
+import itertools
 import os
-import google.generativeai as genai
-import streamlit as st
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
 from dotenv import load_dotenv
+from utils.budget_utils import PROMPT_TOKEN_BUDGET, RESPONSE_TOKEN_BUDGET, TokenUsage, compact_lines, plan_shards
+from utils.cache_utils import ResponseCache
+from utils.code_utils import merge_code_files, parse_generated_code, render_code_files
+from utils.java_utils import ValidationReport, check_java, format_issues, validate_files
+from utils.metrics_utils import METRICS
+from utils.parse_utils import TestCaseStreamParser, parse_test_cases
+from utils.report_utils import report
+from utils.scheduler_utils import RequestScheduler, estimate_tokens
 
 load_dotenv()
 
 
 API_KEY = os.getenv("GEMINI_API_KEY")
+# Upper bound on Gemini requests in flight for bulk generation
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+# Requirements longer than this are split into sections and generated in parallel
+SECTION_CHARS = int(os.getenv("AI_SECTION_CHARS", "12000"))
+# Targeted repair requests per broken Java file
+REPAIR_ROUNDS = int(os.getenv("AI_REPAIR_ROUNDS", "2"))
+MODEL_NAME = "gemini-2.0-flash"
+# Created by get_model() on the first request; benchmarks assign a stub here
 MODEL = None
-if API_KEY:
-    genai.configure(api_key=API_KEY)
-    MODEL = genai.GenerativeModel("gemini-2.0-flash")
+_model_lock = threading.Lock()
+
+# Identical prompts are answered from disk instead of spending API quota.
+# Set AI_CACHE_ENABLED=0 to always call the model.
+RESPONSE_CACHE = None
+if os.getenv("AI_CACHE_ENABLED", "1") != "0":
+    RESPONSE_CACHE = ResponseCache(
+        os.getenv("AI_CACHE_DIR", str(Path(__file__).resolve().parents[1] / ".cache" / "responses")),
+        ttl=int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600))),
+        max_bytes=int(os.getenv("AI_CACHE_MAX_MB", "200")) * 1024 * 1024,
+    )
+
+# Every model call goes through this scheduler, shared by all sessions in the
+# process: it enforces the request and token quotas (0 disables a limit),
+# serves interactive requests before bulk ones and retries 429/5xx errors.
+SCHEDULER = RequestScheduler(
+    rpm=int(os.getenv("AI_RPM", "60")),
+    tpm=int(os.getenv("AI_TPM", "1000000")),
+    max_retries=int(os.getenv("AI_MAX_RETRIES", "5")),
+    base_delay=float(os.getenv("AI_RETRY_BASE_DELAY", "1.0")),
+    max_delay=float(os.getenv("AI_RETRY_MAX_DELAY", "60")),
+)
+
+def _collect_metrics():
+    """Response cache and scheduler counters for metrics_utils.METRICS.render()"""
+    families = []
+    if RESPONSE_CACHE is not None:
+        cache = RESPONSE_CACHE.stats()
+        families += [
+            ("qe_ai_cache_hits_total", "counter", "Prompts answered from the response cache", [({}, cache["hits"])]),
+            ("qe_ai_cache_misses_total", "counter", "Prompts not found in the response cache", [({}, cache["misses"])]),
+        ]
+    lanes = SCHEDULER.stats()
+    families += [
+        ("qe_ai_scheduler_requests_total", "counter", "Requests the scheduler let through, by lane",
+         [({"lane": lane}, values["requests"]) for lane, values in lanes.items()]),
+        ("qe_ai_scheduler_wait_seconds_total", "counter", "Time requests waited for a rate limit slot, by lane",
+         [({"lane": lane}, values["wait_seconds"]) for lane, values in lanes.items()]),
+    ]
+    return families
+
+METRICS.add_collector(_collect_metrics)
+
+def get_model():
+    """
+    The Gemini model, configured on first use
+
+    google.generativeai takes about a second to import, so it is loaded
+    here, off the app's startup path, and only once per process.
+
+    Returns:
+        The model, or None when GEMINI_API_KEY is not set
+    """
+    global MODEL
+    if MODEL is None and API_KEY:
+        with _model_lock:
+            if MODEL is None:
+                import google.generativeai as genai
+                genai.configure(api_key=API_KEY)
+                # Shards of combined suites are sized to this output limit
+                MODEL = genai.GenerativeModel(MODEL_NAME, generation_config={"max_output_tokens": RESPONSE_TOKEN_BUDGET})
+    return MODEL
 
 def _model_check():
-    if MODEL is None:
-        st.error("GEMINI_API_KEY not configured. Set GEMINI_API_KEY in your environment or .env")
+    if get_model() is None:
+        report("error", "GEMINI_API_KEY not configured. Set GEMINI_API_KEY in your environment or .env")
         return False
     return True
 
-def generate_test_cases_from_prompt(prompt_text, num_cases=10, priority="Medium"):
-    if not _model_check(): return []
-    prompt_template = f"""
+def _token_counts(response, prompt, text):
+    """(prompt, response) tokens the model reported for a response, or estimates of them"""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    response_tokens = getattr(usage, "candidates_token_count", None)
+    return (prompt_tokens if isinstance(prompt_tokens, int) else estimate_tokens(prompt),
+            response_tokens if isinstance(response_tokens, int) else estimate_tokens(text))
+
+def _generate(prompt, call_type, lane="interactive", usage=None, parse=None, **params):
+    """
+    Send a prompt to the model, going through the response cache and the scheduler
+
+    The call is recorded in metrics_utils.METRICS under call_type (see
+    metrics_utils.CALL_TYPES). usage, if given, is a budget_utils.TokenUsage
+    the request is tallied in. parse, if given, maps the response text to
+    (result, clean): the result is returned instead of the text, and the
+    response is cached only when clean, so malformed or truncated output
+    is not replayed from the cache.
+    """
+    started = time.perf_counter()
+    key = None
+    if RESPONSE_CACHE is not None:
+        key = RESPONSE_CACHE.make_key(MODEL_NAME, prompt, params)
+        cached = RESPONSE_CACHE.get(key)
+        if cached is not None:
+            if usage is not None:
+                usage.add(prompt, cached, cached=True)
+            METRICS.record_call(call_type, lane, time.perf_counter() - started, "cached")
+            return parse(cached)[0] if parse else cached
+    attempts = 0
+
+    def call():
+        nonlocal attempts
+        attempts += 1
+        return get_model().generate_content(prompt, **params)
+
+    try:
+        response = SCHEDULER.run(call, lane=lane, tokens=estimate_tokens(prompt))
+        text = response.text
+    except Exception:
+        METRICS.record_call(call_type, lane, time.perf_counter() - started, "error", retries=max(0, attempts - 1))
+        raise
+    METRICS.record_call(call_type, lane, time.perf_counter() - started, "success",
+                        *_token_counts(response, prompt, text), retries=attempts - 1)
+    if usage is not None:
+        usage.add(prompt, text)
+    result, clean = parse(text) if parse else (text, bool(text))
+    if key is not None and clean:
+        RESPONSE_CACHE.set(key, text)
+    return result
+
+def _stream(prompt, call_type, lane="interactive", check=None, **params):
+    """
+    Yield response text as the model streams it, going through the response cache
+
+    The scheduler retries the request until its first chunk arrives; an
+    error after text has been yielded is raised to the caller. The call is
+    recorded in metrics_utils.METRICS like _generate's, with its time to
+    the first chunk; a stream the caller abandons counts as "cancelled".
+    check, if given, is called with the whole text and the response is
+    cached only when it returns True.
+    """
+    started = time.perf_counter()
+    key = None
+    if RESPONSE_CACHE is not None:
+        # Streamed and whole responses share cache entries
+        key = RESPONSE_CACHE.make_key(MODEL_NAME, prompt, params)
+        cached = RESPONSE_CACHE.get(key)
+        if cached is not None:
+            METRICS.record_call(call_type, lane, time.perf_counter() - started, "cached")
+            yield cached
+            return
+    attempts = 0
+
+    def open_stream():
+        nonlocal attempts
+        attempts += 1
+        chunks = iter(get_model().generate_content(prompt, stream=True, **params))
+        return next(chunks, None), chunks
+
+    tokens = estimate_tokens(prompt)
+    parts = []
+    chunk = first_chunk = None
+    outcome = "error"
+    try:
+        first, chunks = SCHEDULER.run(open_stream, lane=lane, tokens=tokens)
+        first_chunk = time.perf_counter() - started
+        for chunk in itertools.chain([first] if first is not None else [], chunks):
+            parts.append(chunk.text)
+            yield chunk.text
+        outcome = "success"
+    except GeneratorExit:
+        outcome = "cancelled"
+        raise
+    finally:
+        spent = _token_counts(chunk, prompt, "".join(parts)) if first_chunk is not None else (0, 0)
+        METRICS.record_call(call_type, lane, time.perf_counter() - started, outcome, *spent,
+                            retries=max(0, attempts - 1), first_chunk=first_chunk)
+    usage = getattr(chunk, "usage_metadata", None)
+    SCHEDULER.record_usage(tokens, getattr(usage, "total_token_count", 0))
+    text = "".join(parts)
+    if key is not None and text and (check is None or check(text)):
+        RESPONSE_CACHE.set(key, text)
+
+def _map_concurrently(fn, items, max_workers=None):
+    """
+    Apply fn to items on a thread pool, yielding (item, result, error) as each completes
+
+    Items are pulled lazily so at most a couple of batches of work are queued
+    at any time, and at most max_workers calls run at once.
+    """
+    max_workers = max_workers or AI_MAX_CONCURRENCY
+    items = iter(items)
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    pending = {}
+    try:
+        for item in itertools.islice(items, 2 * max_workers):
+            pending[pool.submit(fn, item)] = item
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                for next_item in itertools.islice(items, 1):
+                    pending[pool.submit(fn, next_item)] = next_item
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
+    finally:
+        # Don't keep spending quota if the caller stops early (e.g. a rerun)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _test_cases_prompt(prompt_text, num_cases, priority):
+    return f"""
 You are a senior QA engineer with 15+ years of experience.
 Generate {num_cases} comprehensive test cases based on the following requirements:
 
@@ -45,21 +256,98 @@ Instructions:
     ]
 }}
 """
+
+def _parse_test_cases(text):
+    """parse_test_cases() for _generate: clean when cases came back and none were dropped"""
+    cases, stats = parse_test_cases(text)
+    return (cases, stats), bool(cases) and not stats.dropped
+
+def _parse_files(text, default_path=None):
+    """
+    parse_generated_code() for _generate: clean when there are files
+
+    A response without a marker is taken as the file default_path, if given.
+    """
+    files = parse_generated_code(text)
+    if not files and default_path:
+        files = parse_generated_code(f"// FILE: {default_path}\n{text}")
+    return files, bool(files)
+
+def _checked_code(text):
+    """Generated code for _generate, returned as text: clean when it has file markers"""
+    return text, bool(parse_generated_code(text))
+
+def _generate_test_cases(prompt_text, num_cases, priority, lane="interactive"):
+    """Generate test cases for one prompt, raising on failure; returns (cases, ParseStats)"""
+    cases, stats = _generate(_test_cases_prompt(prompt_text, num_cases, priority), "test_cases", lane=lane,
+                             parse=_parse_test_cases)
+    METRICS.record_parse("test_cases", cases, stats.dropped)
+    return cases, stats
+
+def _warn_dropped(dropped, recovered):
+    if dropped:
+        report("warning", f"⚠️ Recovered {recovered} test cases; {dropped} malformed or truncated entries were skipped")
+
+def generate_test_cases_from_prompt(prompt_text, num_cases=10, priority="Medium"):
+    if not _model_check(): return []
     try:
-        resp = MODEL.generate_content(prompt_template)
-        # try to extract JSON from response
-        import re, json
-        json_match = re.search(r'\{[\s\S]*\}', resp.text)
-        if json_match:
-            data = json.loads(json_match.group())
-            return data.get("test_cases", [])
-        return []
+        cases, stats = _generate_test_cases(prompt_text, num_cases, priority)
+        _warn_dropped(stats.dropped, stats.recovered)
+        return cases
     except Exception as e:
-        st.error("AI generation failed: " + str(e))
+        report("error", "AI generation failed: " + str(e))
         return []
 
-def generate_test_case_automation_code(test_case):
-    if not _model_check(): return ""
+def stream_test_cases_from_prompt(prompt_text, num_cases=10, priority="Medium"):
+    """
+    Generate test cases with the streaming API
+
+    Yields each test case as soon as its JSON object is complete, so callers
+    can show the first cases long before the whole response has arrived.
+    """
+    if not _model_check(): return
+    parser = TestCaseStreamParser()
+    failed = False
+    try:
+        for text in _stream(_test_cases_prompt(prompt_text, num_cases, priority), "test_cases",
+                            check=lambda text: _parse_test_cases(text)[1]):
+            yield from parser.feed(text)
+    except Exception as e:
+        failed = True
+        report("error", "AI generation failed: " + str(e))
+    stats = parser.finish()
+    if not failed:
+        # A stream cut off by an error says nothing about the response's format
+        METRICS.record_parse("test_cases", stats.recovered, stats.dropped)
+    _warn_dropped(stats.dropped, stats.recovered)
+
+def _generate_automation_code(test_case, lane="interactive", framework=None, usage=None):
+    """
+    Generate automation code for one test case, raising on failure
+
+    framework, if given, holds the signatures of the shared framework
+    classes; the model then writes only the test class against them.
+    """
+    if framework:
+        output_instructions = f"""
+The project already contains these framework classes (signatures only):
+
+{framework}
+
+Reuse them: do NOT output these files again. Write only the test class for
+this test case, extending BaseTest if it exists. Only if a page the test
+needs has no page object yet, add one under src/main/java/com/qa/pages/.
+
+Output files should be indicated with lines like:
+// FILE: src/test/java/com/qa/tests/[Name]Test.java
+[Java code here]
+"""
+    else:
+        output_instructions = """
+Output files should be indicated with lines like:
+// FILE: src/main/java/com/qa/pages/[PageName]Page.java
+[Java code here]
+"""
     prompt_template = f"""
 You are a super senior QA automation engineer with over 30 years of enterprise experience.
 Write complete, production-grade Selenium test automation code in Java using TestNG and Page Object Model.
@@ -70,36 +358,339 @@ Based on the following test case:
 {chr(10).join(test_case.get('test_steps', []))}
 - Expected Results:
 {chr(10).join(test_case.get('expected_results', []))}
+{output_instructions}
+"""
+    return _generate(prompt_template, "automation", lane=lane, usage=usage, parse=_checked_code)
+
+def generate_test_case_automation_code(test_case):
+    if not _model_check(): return ""
+    try:
+        return _generate_automation_code(test_case)
+    except Exception as e:
+        report("error", "AI generation failed: " + str(e))
+        return ""
+
+def generate_automation_code_concurrently(test_cases, max_workers=None, framework=None, usage=None, postprocess=None):
+    """
+    Generate automation code for several test cases in parallel
+
+    Results are yielded in completion order so callers can render each
+    case as soon as it is ready. A failing case does not affect the others.
+
+    Args:
+        test_cases: List of test case dictionaries
+        max_workers: Maximum requests in flight (default AI_MAX_CONCURRENCY)
+        framework: Optional shared framework signatures (see code_utils.java_signatures)
+        usage: Optional budget_utils.TokenUsage to tally the requests in
+        postprocess: Optional callable run on each generated text in the
+            worker thread (e.g. validate_generated_code); its result is
+            yielded in place of the text
+
+    Yields:
+        (test_case, code, error) tuples; error is None on success
+    """
+    if not _model_check(): return
+    generate = functools.partial(_generate_automation_code, lane="bulk", framework=framework, usage=usage)
+    if postprocess is not None:
+        generate = lambda tc, generate=generate: postprocess(generate(tc))
+    for tc, code, error in _map_concurrently(generate, test_cases, max_workers):
+        yield tc, code if postprocess else code or "", error
+
+def _repair_prompt(path, content, issues, attempt=1, rejected=None):
+    # A retry names its attempt and what the last one got wrong, so it is a
+    # new request rather than the cached answer that was already rejected
+    retry = "" if attempt == 1 else f"""
+This is repair attempt {attempt}. The previous attempt was rejected because it still had these errors:
+{format_issues(rejected or issues)}
+"""
+    return f"""
+You are a super senior QA automation engineer with over 30 years of enterprise experience.
+The following generated Java file does not compile. Syntax errors found:
+{format_issues(issues)}
+{retry}
+Fix these errors (and anything they break) and keep the rest of the code unchanged.
+Return only the complete corrected file, marked with:
+// FILE: {path}
+
+Current file:
+// FILE: {path}
+{content}
+"""
+
+def _repair_java_file(path, content, issues, lane="interactive", usage=None, attempt=1, rejected=None):
+    """
+    Ask the model to fix one broken file; returns the new contents
+
+    attempt and rejected (the errors of the last rejected repair) are set
+    when an earlier repair of the same content did not help.
+    """
+    # A response without a marker is taken as the file itself
+    files = _generate(_repair_prompt(path, content, issues, attempt, rejected), "repair", lane=lane, usage=usage,
+                      parse=functools.partial(_parse_files, default_path=path))
+    return files.get(path) or next(iter(files.values()), "")
+
+def validate_and_repair(files, lane="interactive", usage=None, rounds=None):
+    """
+    Check generated Java files and repair the broken ones one file at a time
+
+    Only a file with syntax errors is sent back, with its error list, so a
+    broken page object costs one small request instead of regenerating the
+    whole output. A repair is kept only if it has fewer problems.
+
+    Args:
+        files: Parsed {path: content} output
+        lane: Scheduler lane of the repair requests
+        usage: Optional budget_utils.TokenUsage to tally repair requests in
+        rounds: Repair attempts per file (default AI_REPAIR_ROUNDS)
+
+    Returns:
+        (files, ValidationReport); files is a new dict if anything was repaired
+    """
+    result = ValidationReport()
+    problems = validate_files(files)
+    result.checked = sum(1 for path in files if path.endswith(".java"))
+    result.first_pass_ok = result.checked - len(problems)
+    if problems and get_model() is not None:
+        files = dict(files)
+        regenerate_tokens = estimate_tokens("".join(files.values()))
+        repair_usage = TokenUsage()
+        rounds_run = 0
+        # path -> (attempts on the current content, errors of the last rejected repair)
+        attempts = {}
+        for _round in range(REPAIR_ROUNDS if rounds is None else rounds):
+            rounds_run += 1
+            for path, issues in list(problems.items()):
+                attempt, rejected = attempts.get(path, (0, None))
+                try:
+                    fixed = _repair_java_file(path, files[path], issues, lane=lane, usage=repair_usage,
+                                              attempt=attempt + 1, rejected=rejected)
+                except Exception:
+                    attempts[path] = (attempt + 1, rejected)
+                    continue
+                remaining = check_java(path, fixed) if fixed else issues
+                if len(remaining) < len(issues):
+                    files[path] = fixed
+                    problems[path] = remaining
+                    attempts.pop(path, None)
+                else:
+                    attempts[path] = (attempt + 1, remaining)
+                if not remaining:
+                    del problems[path]
+                    result.repaired += 1
+            if not problems:
+                break
+        spent = repair_usage.as_dict()
+        result.repair_requests = spent["requests"] + spent["cached"]
+        result.repair_tokens = spent["prompt_tokens"] + spent["response_tokens"]
+        # Without repair each round would have been a full regeneration; output
+        # tokens are what make generation slow and costly, so compare those
+        result.saved_tokens = max(0, rounds_run * regenerate_tokens - spent["response_tokens"])
+        if usage is not None:
+            usage.merge(repair_usage)
+    result.broken = problems
+    return files, result
+
+def validate_generated_code(code_text, lane="bulk", usage=None):
+    """Parse a generated response and validate_and_repair it; returns (files, ValidationReport)"""
+    files = parse_generated_code(code_text)
+    METRICS.record_parse("automation", files)
+    return validate_and_repair(files, lane=lane, usage=usage)
+
+def _framework_prompt(test_cases):
+    # Titles and steps tell the model which pages and actions the suite needs;
+    # past the prompt budget only titles are listed
+    lines, size = [], 0
+    for i, tc in enumerate(test_cases, 1):
+        block = f"{i}. {tc.get('title')}"
+        steps = compact_lines(tc.get('test_steps'))
+        if steps and size < PROMPT_TOKEN_BUDGET:
+            block += "\n" + "\n".join("   - " + step for step in steps)
+        lines.append(block)
+        size += estimate_tokens(block)
+    test_cases_str = "\n".join(lines)
+    return f"""
+You are a super senior QA automation engineer with over 30 years of enterprise experience.
+Write the shared framework layer of a Selenium Java test suite using TestNG and Page Object Model.
+It will be used by one test class per test case, written separately.
+
+Write:
+- BasePage (common waits and element helpers)
+- DriverFactory (WebDriver setup) and BaseTest (TestNG setup/teardown)
+- One page object per page the test cases below use, under src/main/java/com/qa/pages/,
+  with a public method for every action and check the steps need
+
+Do NOT write any test classes.
+
+Test cases of the suite:
+{test_cases_str}
 
 Output files should be indicated with lines like:
 // FILE: src/main/java/com/qa/pages/[PageName]Page.java
 [Java code here]
-
 """
+
+def generate_shared_framework(test_cases, usage=None):
+    """
+    Generate the page objects and base classes a suite of test classes shares
+
+    The prompt depends only on the suite, so regenerating the same suite is
+    served from the response cache.
+
+    Returns:
+        {path: content} of the framework files, or {} on failure
+    """
+    if not _model_check(): return {}
     try:
-        resp = MODEL.generate_content(prompt_template)
-        return resp.text
+        files = _generate(_framework_prompt(test_cases), "framework", usage=usage, parse=_parse_files)
     except Exception as e:
-        st.error("AI generation failed: " + str(e))
-        return ""
+        report("error", "Shared framework generation failed: " + str(e))
+        return {}
+    METRICS.record_parse("framework", files)
+    return files
 
-def generate_combined_automation_code(test_cases):
-    if not _model_check(): return ""
-    test_cases_str = "\n\n".join(
-        [f"Test Case {i+1}: {tc.get('title')}\nSteps:\n{chr(10).join(tc.get('test_steps', []))}\nExpected:\n{chr(10).join(tc.get('expected_results', []))}"
-         for i, tc in enumerate(test_cases)]
-    )
-    prompt_template = f"""
+def split_into_sections(texts, max_chars=SECTION_CHARS):
+    """
+    Pack requirement text into sections of roughly max_chars
+
+    Args:
+        texts: Iterable of strings, e.g. chunk texts from file_utils.iter_file_chunks
+        max_chars: Target section size
+
+    Yields:
+        Section strings, split on paragraph boundaries where possible
+    """
+    buffer, size = [], 0
+    for text in texts:
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if buffer and size + len(paragraph) > max_chars:
+                yield "\n\n".join(buffer)
+                buffer, size = [], 0
+            buffer.append(paragraph)
+            size += len(paragraph) + 2
+    if buffer:
+        yield "\n\n".join(buffer)
+
+def _dedupe_key(test_case):
+    normalize = lambda value: " ".join(re.findall(r"\w+", str(value).lower()))
+    return (normalize(test_case.get("title", "")),
+            tuple(normalize(step) for step in test_case.get("test_steps", [])))
+
+def merge_test_cases(batches, start_index=1):
+    """
+    Merge per-section batches, dropping exact duplicates and renumbering IDs
+
+    Args:
+        batches: Iterable of test case lists, in section order
+        start_index: Number given to the first merged case (TC_001 by default)
+    """
+    merged, seen = [], set()
+    for batch in batches:
+        for tc in batch:
+            key = _dedupe_key(tc)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(dict(tc, id=f"TC_{start_index + len(merged):03d}"))
+    return merged
+
+def generate_test_cases_map_reduce(sections, cases_per_section=5, priority="Medium",
+                                   start_index=1, max_workers=None, on_progress=None):
+    """
+    Generate test cases for each requirement section in parallel and merge them
+
+    Args:
+        sections: Iterable of section strings; consumed lazily
+        cases_per_section: Number of cases requested per section
+        priority: Default priority
+        start_index: Number given to the first merged case
+        max_workers: Maximum requests in flight (default AI_MAX_CONCURRENCY)
+        on_progress: Optional callback(sections_done, error) after each section
+
+    Returns:
+        (test_cases, failed) where failed lists the indexes of failed sections
+    """
+    if not _model_check(): return [], []
+    batches, failed = {}, []
+    recovered = dropped = 0
+
+    def generate_section(item):
+        return _generate_test_cases(item[1], cases_per_section, priority, lane="bulk")
+
+    results = _map_concurrently(generate_section, enumerate(sections), max_workers)
+    for done, ((idx, _section), result, error) in enumerate(results, 1):
+        if error is None:
+            batches[idx], stats = result
+            recovered += stats.recovered
+            dropped += stats.dropped
+        else:
+            failed.append(idx)
+        if on_progress:
+            on_progress(done, error)
+    _warn_dropped(dropped, recovered)
+    return merge_test_cases((batches[i] for i in sorted(batches)), start_index), sorted(failed)
+
+def _combined_case_block(number, test_case):
+    steps = "\n".join(compact_lines(test_case.get('test_steps')))
+    expected = "\n".join(compact_lines(test_case.get('expected_results')))
+    return f"Test Case {number}: {test_case.get('title')}\nSteps:\n{steps}\nExpected:\n{expected}"
+
+def _combined_prompt(blocks, part=1, parts=1):
+    test_cases_str = "\n\n".join(blocks)
+    shard_note = ""
+    if parts > 1:
+        shard_note = f"""
+This is part {part} of {parts} of a larger suite. Name the test class CombinedTestPart{part}.
+Put page objects in src/main/java/com/qa/pages/ and name them after the page (e.g. LoginPage.java),
+since other parts generate page objects for the same pages.
+"""
+    return f"""
 You are a super senior QA automation engineer with over 30 years of enterprise experience.
 Create a SINGLE test class that includes test methods for the following test cases:
 
 {test_cases_str}
-
+{shard_note}
 Output the code with file markers as // FILE: path.
 """
-    try:
-        resp = MODEL.generate_content(prompt_template)
-        return resp.text
-    except Exception as e:
-        st.error("AI generation failed: " + str(e))
+
+def generate_combined_automation_code(test_cases):
+    """
+    Generate one test suite covering several test cases
+
+    Suites whose prompt or expected output would exceed the token budgets
+    are split into shards generated concurrently; the shards' files are
+    merged, with shared page objects deduplicated.
+
+    Returns:
+        Generated code with // FILE: markers, or "" on failure
+    """
+    if not _model_check(): return ""
+    blocks = [_combined_case_block(i + 1, tc) for i, tc in enumerate(test_cases)]
+    shards = plan_shards(blocks, estimate_tokens(_combined_prompt([], 1, 2)))
+    if len(shards) == 1:
+        try:
+            return _generate(_combined_prompt(blocks), "combined", parse=_checked_code)
+        except Exception as e:
+            report("error", "AI generation failed: " + str(e))
+            return ""
+
+    prompts = [_combined_prompt([blocks[i] for i in shard], part, len(shards))
+               for part, shard in enumerate(shards, 1)]
+    outputs, failed = {}, []
+    generate = lambda item: _generate(item[1], "combined", parse=_parse_files)
+    for (part, _prompt), files, error in _map_concurrently(generate, enumerate(prompts, 1)):
+        if error is None:
+            outputs[part] = files
+        else:
+            failed.append(part)
+    if not outputs:
+        report("error", "AI generation failed for every part of the suite")
         return ""
+    if failed:
+        missing = sorted(i + 1 for part in failed for i in shards[part - 1])
+        report("warning", f"⚠️ {len(failed)} of {len(shards)} parts of the suite failed; "
+                   f"test cases {', '.join(map(str, missing))} have no code")
+    report("info", f"Suite of {len(test_cases)} test cases was generated in {len(shards)} parts and merged")
+    return render_code_files(merge_code_files(outputs[part] for part in sorted(outputs)))
@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from utils import ai_utils, code_utils, file_utils, metrics_utils
+from utils.export_utils import EXPORT_COLUMNS
+from utils.report_utils import reporting_to
+from utils.store_utils import LIST_FIELDS
+
+# Documents processed at once; each one still spreads its model calls over
+# AI_MAX_CONCURRENCY threads, and every call shares the process's scheduler
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+CHECKPOINT_FILE = "checkpoint.ndjson"
+CASES_FILE = "test_cases.ndjson"
+CASES_DIR = "cases"
+CODE_DIR = "code"
+CASE_FIELDS = [field for _header, field in EXPORT_COLUMNS]
+
+
+class Checkpoint:
+    """
+    Append-only record of the document stages a batch has finished
+
+    Each line is one JSON record with the document, the stage ("cases" or
+    "code") and the sha256 of the document's content, so a rerun skips
+    work that is done and redoes documents that changed since. A line cut
+    short by a crash is ignored.
+
+    Args:
+        path: NDJSON checkpoint file, created when missing
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._records = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._records[record["document"], record["stage"]] = record
+
+    def get(self, document, stage, fingerprint):
+        """The record of a finished stage of this version of the document, or None"""
+        record = self._records.get((document, stage))
+        return record if record and record["sha256"] == fingerprint else None
+
+    def record(self, document, stage, fingerprint, **info):
+        record = dict(info, document=document, stage=stage, sha256=fingerprint, finished=time.time())
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._records[document, stage] = record
+
+
+def find_documents(input_dir, recursive=True):
+    """Paths of the supported requirement documents under input_dir, sorted"""
+    root = Path(input_dir)
+    paths = root.rglob("*") if recursive else root.glob("*")
+    return sorted(p for p in paths if p.is_file() and p.suffix.lower() in file_utils.DOCUMENT_TYPES)
+
+
+def _fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _slug(document):
+    return re.sub(r"[^\w.-]+", "_", document)
+
+
+def _safe_path(path):
+    """A generated file path with absolute and parent parts removed"""
+    parts = [part for part in PurePosixPath(path.replace("\\", "/")).parts if part not in ("/", "..", ".")]
+    return Path(*parts) if parts else Path("unnamed.txt")
+
+
+def _write_atomic(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _case_record(test_case, source):
+    record = {field: test_case.get(field, [] if field in LIST_FIELDS else "") for field in CASE_FIELDS}
+    record["source"] = source
+    return record
+
+
+def generate_document_cases(path, num_cases=10, priority="Medium"):
+    """
+    Generate test cases for one requirements document
+
+    Short documents take one request; long ones are split into sections
+    generated in parallel and merged, as in the app.
+
+    Args:
+        path: Document path (see file_utils.DOCUMENT_TYPES)
+        num_cases: Cases for the whole document
+        priority: Default priority
+
+    Returns:
+        (test cases, [(level, message), ...] reported while generating)
+    """
+    messages = []
+    with reporting_to(lambda level, message: messages.append((level, message))):
+        with file_utils.DocumentFile(path) as f:
+            text = file_utils.extract_text_from_file(f)
+        if not text.strip():
+            messages.append(("error", f"No text could be read from {path}"))
+            return [], messages
+        if len(text) <= ai_utils.SECTION_CHARS:
+            return ai_utils.generate_test_cases_from_prompt(text, num_cases=num_cases, priority=priority), messages
+        sections = list(ai_utils.split_into_sections([text]))
+        cases, failed = ai_utils.generate_test_cases_map_reduce(
+            sections, cases_per_section=-(-num_cases // len(sections)), priority=priority,
+        )
+        if failed:
+            messages.append(("warning", f"{len(failed)} of {len(sections)} sections failed to generate"))
+    return cases, messages
+
+
+def generate_document_code(test_cases, code_dir, validate=True):
+    """
+    Generate automation code for test cases and write one tree per case under code_dir
+
+    Returns:
+        (files written, ids of the cases whose generation failed)
+    """
+    check = ai_utils.validate_generated_code if validate else None
+    written, failed = 0, []
+    for tc, code, error in ai_utils.generate_automation_code_concurrently(test_cases, postprocess=check):
+        if error is not None:
+            failed.append(tc["id"])
+            continue
+        if validate:
+            files = code[0]
+        else:
+            files = code_utils.parse_generated_code(code)
+            metrics_utils.METRICS.record_parse("automation", files)
+        case_dir = code_dir / _slug(tc["id"])
+        for file_name, content in files.items():
+            _write_atomic(case_dir / _safe_path(file_name), content)
+            written += 1
+    return written, failed
+
+
+def run_batch(input_dir, output_dir, num_cases=10, priority="Medium", automation=False, validate=True,
+              workers=None, on_document=None):
+    """
+    Generate test cases (and optionally automation code) for every document in a directory
+
+    Runs without Streamlit; messages the utils report are collected per
+    document and passed to on_document. Output in output_dir:
+
+    - cases/<document>.ndjson: each document's test cases
+    - code/<document>/<test case id>/...: generated code trees
+    - test_cases.ndjson: every case, one JSON object per line in the
+      export's NDJSON format plus a "source" field, importable in the app
+    - checkpoint.ndjson: finished stages; rerunning resumes after them
+
+    Documents run on a thread pool rather than processes: the work is
+    waiting on the model, and the rate limiter and response cache are
+    shared within one process.
+
+    Args:
+        input_dir: Directory searched recursively for documents
+        output_dir: Output directory, created when missing
+        num_cases: Test cases per document
+        priority: Default priority
+        automation: Also generate automation code for every case
+        validate: Syntax-check generated Java and repair broken files
+        workers: Documents processed at once (default BATCH_WORKERS)
+        on_document: Optional callback(document, status, info) after each document
+
+    Returns:
+        Summary dict: documents, skipped, failed, cases, code_files, seconds
+    """
+    started = time.perf_counter()
+    input_dir, output_dir = Path(input_dir), Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint = Checkpoint(output_dir / CHECKPOINT_FILE)
+    documents = [(path, path.relative_to(input_dir).as_posix()) for path in find_documents(input_dir)]
+    summary = {"documents": len(documents), "skipped": 0, "failed": 0, "cases": 0, "code_files": 0}
+    lock = threading.Lock()
+
+    def process(item):
+        path, document = item
+        fingerprint = _fingerprint(path)
+        cases_path = output_dir / CASES_DIR / (_slug(document) + ".ndjson")
+        info = {"messages": []}
+        resumed = True
+        if checkpoint.get(document, "cases", fingerprint) and cases_path.exists():
+            with open(cases_path, encoding="utf-8") as f:
+                cases = [json.loads(line) for line in f if line.strip()]
+        else:
+            resumed = False
+            cases, info["messages"] = generate_document_cases(path, num_cases, priority)
+            if not cases:
+                return "failed", info
+            cases = [_case_record(tc, document) for tc in cases]
+            _write_atomic(cases_path, "".join(json.dumps(tc, ensure_ascii=False) + "\n" for tc in cases))
+            checkpoint.record(document, "cases", fingerprint, cases=len(cases), messages=info["messages"])
+        info["cases"] = len(cases)
+
+        if automation:
+            done = checkpoint.get(document, "code", fingerprint)
+            if done:
+                info["code_files"] = done["files"]
+            else:
+                resumed = False
+                code_dir = output_dir / CODE_DIR / _slug(document)
+                shutil.rmtree(code_dir, ignore_errors=True)
+                info["code_files"], failed = generate_document_code(cases, code_dir, validate)
+                if failed:
+                    # Not checkpointed, so a rerun retries the document's code
+                    info["messages"].append(("error", f"Automation code failed for {', '.join(failed)}"))
+                    return "failed", info
+                checkpoint.record(document, "code", fingerprint, files=info["code_files"])
+        return "skipped" if resumed else "done", info
+
+    def run(item):
+        messages = []
+        try:
+            with reporting_to(lambda level, message: messages.append((level, message))):
+                status, info = process(item)
+        except Exception as e:
+            status, info = "failed", {"messages": [("error", str(e))]}
+        info["messages"] = info.get("messages", []) + messages
+        with lock:
+            if status != "done":
+                summary[status] += 1
+            summary["cases"] += info.get("cases", 0)
+            summary["code_files"] += info.get("code_files", 0)
+        if on_document:
+            on_document(item[1], status, info)
+
+    with ThreadPoolExecutor(max_workers=workers or BATCH_WORKERS, thread_name_prefix="batch") as pool:
+        list(pool.map(run, documents))
+
+    # Combined file, in document order, from the per-document files
+    with open(output_dir / CASES_FILE, "w", encoding="utf-8") as out:
+        for _path, document in documents:
+            cases_path = output_dir / CASES_DIR / (_slug(document) + ".ndjson")
+            if cases_path.exists():
+                with open(cases_path, encoding="utf-8") as f:
+                    shutil.copyfileobj(f, out)
+    summary["seconds"] = time.perf_counter() - started
+    return summary
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import streamlit as st
+
+ATTACHMENT_DIR = os.getenv(
+    "ATTACHMENT_DIR", str(Path(__file__).resolve().parents[1] / "data" / "attachments")
+)
+READ_BLOCK = 1024 * 1024
+# Uploads still being written are left alone by gc for this long
+TMP_GRACE_SECONDS = 3600
+
+
+class AttachmentStore:
+    """
+    Content-addressed store for test case attachments
+
+    Files are written once under their sha256 digest, so the same upload
+    attached to several test cases is stored a single time. Test cases only
+    keep a small reference dict ({"name", "type", "ref", "size"}) and the
+    bytes are read from disk on demand. Each digest carries a reference
+    count in a SQLite file next to the blobs; a blob is deleted once the
+    last test case using it is released. Counts change in write
+    transactions that also create or delete the blob, so server processes
+    sharing the directory never lose a reference or delete a blob in use.
+
+    Args:
+        root: Directory holding the blobs and the reference counts
+    """
+
+    def __init__(self, root=ATTACHMENT_DIR):
+        self.root = Path(root)
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.root / "refs.db", isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS refs (digest TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+            self._local.conn = conn
+            self._import_counts(conn)
+        return conn
+
+    @contextmanager
+    def _counting(self):
+        """Write transaction on the reference counts, shared with every other process"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _import_counts(self, conn):
+        """Move the counts of the older refs.json file into the database"""
+        path = self.root / "refs.json"
+        try:
+            counts = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        with self._counting():
+            conn.executemany("INSERT OR IGNORE INTO refs VALUES (?, ?)", counts.items())
+        path.unlink(missing_ok=True)
+
+    def _path(self, digest):
+        return self.root / digest[:2] / digest
+
+    def put(self, fileobj, name, content_type=None):
+        """
+        Stream a file into the store and return its reference
+
+        The file is hashed while it is copied to a temporary file, so it is
+        never held in memory as a whole.
+        """
+        tmp_dir = self.root / "tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for block in iter(lambda: fileobj.read(READ_BLOCK), b""):
+                    digest.update(block)
+                    out.write(block)
+                    size += len(block)
+            key = digest.hexdigest()
+            path = self._path(key)
+            with self._counting() as conn:
+                if path.exists():
+                    os.unlink(tmp)
+                else:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(tmp, path)
+                self._add(conn, [key])
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return {"name": name, "type": content_type, "ref": key, "size": size}
+
+    def exists(self, attachment):
+        return self._path(attachment["ref"]).exists()
+
+    def open(self, attachment):
+        """Open an attachment for reading as a binary file"""
+        return open(self._path(attachment["ref"]), "rb")
+
+    @contextmanager
+    def view(self, attachment):
+        """Memory-map an attachment and yield a read-only memoryview of it"""
+        with self.open(attachment) as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield memoryview(b"")
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    yield view
+                finally:
+                    view.release()
+
+    def read(self, attachment):
+        with self.view(attachment) as view:
+            return view.tobytes()
+
+    def retain(self, attachments):
+        """Add a reference for attachments copied onto another test case"""
+        with self._counting() as conn:
+            self._add(conn, [attachment["ref"] for attachment in attachments])
+
+    def release(self, attachments):
+        """Drop one reference per attachment, deleting blobs nobody uses"""
+        with self._counting() as conn:
+            conn.executemany("UPDATE refs SET count = count - 1 WHERE digest = ?",
+                             [(attachment["ref"],) for attachment in attachments])
+            conn.execute("DELETE FROM refs WHERE count <= 0")
+            for key in {attachment["ref"] for attachment in attachments}:
+                if not conn.execute("SELECT 1 FROM refs WHERE digest = ?", (key,)).fetchone():
+                    self._unlink(self._path(key))
+
+    @staticmethod
+    def _add(conn, keys):
+        conn.executemany("INSERT INTO refs VALUES (?, 1) ON CONFLICT (digest) DO UPDATE SET count = count + 1",
+                         [(key,) for key in keys])
+
+    def gc(self, live_attachments=None):
+        """
+        Delete blobs without references and leftover temporary files
+
+        Args:
+            live_attachments: When given, the complete set of attachments in
+                use; reference counts are rebuilt from it first
+
+        Returns:
+            Number of bytes freed
+        """
+        freed = 0
+        with self._counting() as conn:
+            if live_attachments is not None:
+                conn.execute("DELETE FROM refs")
+                self._add(conn, [attachment["ref"] for attachment in live_attachments])
+            counted = {key for (key,) in conn.execute("SELECT digest FROM refs")}
+            cutoff = time.time() - TMP_GRACE_SECONDS
+            for path in (self.root / "tmp").glob("*"):
+                try:
+                    stale = path.stat().st_mtime < cutoff
+                except OSError:
+                    continue
+                if stale:
+                    freed += self._unlink(path)
+            for path in self.root.glob("??/*"):
+                if path.name not in counted:
+                    freed += self._unlink(path)
+        return freed
+
+    def stats(self):
+        counts = dict(self.conn.execute("SELECT digest, count FROM refs"))
+        return {
+            "blobs": len(counts),
+            "references": sum(counts.values()),
+            "disk_bytes": sum(self._path(key).stat().st_size for key in counts if self._path(key).exists()),
+        }
+
+    def clear(self):
+        with self._counting() as conn:
+            conn.execute("DELETE FROM refs")
+            for path in self.root.iterdir():
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return 0
+        return size
+
+
+@st.cache_resource
+def get_attachment_store():
+    """Process-wide attachment store shared by all sessions"""
+    return AttachmentStore()
@@ -0,0 +1,110 @@
+import os
+import re
+import threading
+
+from utils.scheduler_utils import estimate_tokens
+
+# Largest prompt sent in one request. Well below gemini-2.0-flash's context
+# window: quality drops long before the hard limit.
+PROMPT_TOKEN_BUDGET = int(os.getenv("AI_PROMPT_TOKENS", "32000"))
+# Output tokens the model may produce per response (gemini-2.0-flash caps at
+# 8192); the model is configured with it as max_output_tokens
+RESPONSE_TOKEN_BUDGET = int(os.getenv("AI_RESPONSE_TOKENS", "8192"))
+# Expected output for one combined suite: class scaffolding and page objects,
+# plus one test method (and its page calls) per test case. A method grows
+# with its case's steps, so it is estimated from the case's prompt tokens.
+RESPONSE_BASE_TOKENS = int(os.getenv("AI_RESPONSE_BASE_TOKENS", "1500"))
+RESPONSE_MIN_CASE_TOKENS = int(os.getenv("AI_RESPONSE_MIN_CASE_TOKENS", "120"))
+RESPONSE_TOKENS_PER_PROMPT_TOKEN = float(os.getenv("AI_RESPONSE_TOKENS_PER_PROMPT_TOKEN", "3"))
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def compact_lines(items):
+    """Collapse whitespace in each item and drop empty and repeated consecutive items"""
+    lines = []
+    for item in items or []:
+        line = WHITESPACE_RE.sub(" ", str(item)).strip()
+        if line and (not lines or lines[-1] != line):
+            lines.append(line)
+    return lines
+
+
+def estimate_case_response_tokens(block_tokens):
+    """Expected output for one test case of a combined suite, from the tokens of its prompt block"""
+    return max(RESPONSE_MIN_CASE_TOKENS, int(block_tokens * RESPONSE_TOKENS_PER_PROMPT_TOKEN))
+
+
+def plan_shards(blocks, base_prompt_tokens=0, prompt_budget=None, response_budget=None):
+    """
+    Pack prompt blocks into shards that each fit the prompt and response budgets
+
+    Blocks keep their order; a block larger than the prompt budget on its
+    own still gets a shard of its own. How many cases fit in the response
+    budget follows from each block's estimated output (see
+    estimate_case_response_tokens), so short cases share a shard with many
+    others and long ones with few.
+
+    Args:
+        blocks: Prompt text of each test case
+        base_prompt_tokens: Tokens of the instructions wrapped around every shard
+        prompt_budget: Prompt tokens per shard (default PROMPT_TOKEN_BUDGET)
+        response_budget: Response tokens per shard (default RESPONSE_TOKEN_BUDGET)
+
+    Returns:
+        List of shards, each a list of block indexes
+    """
+    prompt_budget = prompt_budget or PROMPT_TOKEN_BUDGET
+    response_budget = response_budget or RESPONSE_TOKEN_BUDGET
+    shards, current, size, output = [], [], base_prompt_tokens, RESPONSE_BASE_TOKENS
+    for i, block in enumerate(blocks):
+        tokens = estimate_tokens(block)
+        case_output = estimate_case_response_tokens(tokens)
+        if current and (size + tokens > prompt_budget or output + case_output > response_budget):
+            shards.append(current)
+            current, size, output = [], base_prompt_tokens, RESPONSE_BASE_TOKENS
+        current.append(i)
+        size += tokens
+        output += case_output
+    if current:
+        shards.append(current)
+    return shards
+
+
+class TokenUsage:
+    """
+    Thread-safe tally of the estimated tokens a batch of requests used
+
+    Responses served from the response cache count towards the tokens (so
+    runs stay comparable) but as cached rather than model requests.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.cached = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, prompt, response, cached=False):
+        with self._lock:
+            if cached:
+                self.cached += 1
+            else:
+                self.requests += 1
+            self.prompt_tokens += estimate_tokens(prompt)
+            self.response_tokens += estimate_tokens(response)
+
+    def as_dict(self):
+        with self._lock:
+            return {"requests": self.requests, "cached": self.cached,
+                    "prompt_tokens": self.prompt_tokens, "response_tokens": self.response_tokens}
+
+    def merge(self, other):
+        """Add another tally's counts to this one"""
+        counts = other.as_dict()
+        with self._lock:
+            self.requests += counts["requests"]
+            self.cached += counts["cached"]
+            self.prompt_tokens += counts["prompt_tokens"]
+            self.response_tokens += counts["response_tokens"]
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class ResponseCache:
+    """
+    Content-addressed cache for model responses
+
+    Entries are keyed by a hash of (model name, prompt, generation params) and
+    kept in a small in-process LRU backed by one JSON file per entry on disk.
+
+    Args:
+        cache_dir: Directory holding the on-disk entries
+        ttl: Seconds an entry stays valid (default 7 days)
+        max_bytes: Disk budget; oldest-used entries are evicted beyond it
+        memory_items: Number of entries kept in the in-process LRU
+    """
+
+    def __init__(self, cache_dir, ttl=7 * 24 * 3600, max_bytes=200 * 1024 * 1024, memory_items=256):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_name, prompt, params=None):
+        payload = json.dumps([model_name, prompt, params or {}], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] < self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+        path = self._path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            if now - data["created"] >= self.ttl:
+                self._remove(path)
+                self.misses += 1
+                return None
+            # mtime tracks last use so size eviction drops the coldest entries
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+            self._remember(key, data["created"], data["text"])
+            self.hits += 1
+            return data["text"]
+
+    def set(self, key, text):
+        created = time.time()
+        path = self._path(key)
+        payload = json.dumps({"created": created, "text": text})
+        with self._lock:
+            self._remember(key, created, text)
+            usage = self._disk_usage()
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                old_size = path.stat().st_size if path.exists() else 0
+                tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+                tmp.write_text(payload, encoding="utf-8")
+                os.replace(tmp, path)
+                self._disk_bytes = usage + path.stat().st_size - old_size
+            except OSError:
+                return
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for path in self._entries():
+                self._remove(path)
+            self._disk_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_usage(),
+            }
+
+    def _remember(self, key, created, text):
+        self._memory[key] = (created, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return []
+        return list(self.cache_dir.glob("*/*.json"))
+
+    def _disk_usage(self):
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(p.stat().st_size for p in self._entries())
+        return self._disk_bytes
+
+    def _remove(self, path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        if self._disk_bytes is not None:
+            self._disk_bytes -= size
+        self._memory.pop(path.stem, None)
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        for path in self._entries():
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        entries.sort()
+        # Expired entries go first, then least recently used until under budget
+        for mtime, path in entries:
+            if self._disk_bytes <= self.max_bytes and now - mtime < self.ttl:
+                break
+            self._remove(path)
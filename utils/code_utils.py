@@ -1,21 +1,421 @@
 # utils/code_utils.py
+import itertools
 import re
+from collections.abc import Mapping
 
-def parse_generated_code(code_text):
-    files = {}
-    current_file = None
-    buffer = []
+# A page object is identified by its package or its class name
+PAGE_OBJECT_RE = re.compile(r"(/pages?/|Page\.java$)")
+# A test class has @Test methods; other classes (page objects, BaseTest,
+# DriverFactory...) are support code every test shares
+TEST_METHOD_RE = re.compile(r"@Test\b")
+IMPORT_RE = re.compile(r"^import\s+[\w.* \t]+;[ \t]*$", re.MULTILINE)
+PACKAGE_RE = re.compile(r"^package\s+[\w.]+;[ \t]*$", re.MULTILINE)
+# Method signatures (name and parameter list) and field declarations of a
+# class body. Modifiers are optional, since package-private members have
+# none; statements are told apart by their keywords.
+METHOD_RE = re.compile(
+    r"^[ \t]*(?:@\w+(?:\([^)]*\))?\s*)*(?:(?:public|protected|private|static|final|synchronized|abstract|default)\s+)*"
+    r"(?!(?:return|new|else|throw)\b)[\w<>\[\],.? ]+?\s+(?!(?:if|for|while|switch|catch|synchronized)\b)"
+    r"(\w+)\s*\(([^)]*)\)\s*(?:throws\s+[\w., ]+)?\{",
+    re.MULTILINE,
+)
+FIELD_RE = re.compile(
+    r"^[ \t]*(?:@\w+(?:\([^)]*\))?\s*)*(?:(?:public|protected|private|static|final|volatile|transient)\s+)*"
+    r"(?!(?:return|throw|package|import)\b)[\w<>\[\],.? ]+?\s+(\w+)\s*(?:=[^;{]*)?;[ \t]*$",
+    re.MULTILINE,
+)
+PARAM_ANNOTATION_RE = re.compile(r"@\w+(?:\([^)]*\))?|\bfinal\b")
+
+# One pass over a response finds every file marker and fence line:
+#   // FILE: path   # FILE: path   <!-- FILE: path -->   ```lang   ~~~
+MARKER_RE = re.compile(
+    r"^[ \t]*(?:"
+    r"(?://|#)[ \t]*FILE:[ \t]*(?P<path>[^\r\n]*?)"
+    r"|<!--[ \t]*FILE:[ \t]*(?P<xml_path>[^\r\n]*?)[ \t]*-->"
+    r"|(?P<fence>```|~~~)[ \t]*(?P<lang>[\w+#.-]*)[^\r\n]*"
+    r")[ \t]*\r?$",
+    re.MULTILINE,
+)
+# Literal parts of the markers; searching for these first and matching
+# MARKER_RE only on their lines skips the bulk of the text much faster
+MARKER_HINT_RE = re.compile(r"FILE:|```|~~~")
+NON_SPACE_RE = re.compile(r"\S")
+# Decoration models put around a path, e.g. `Foo.java` or **Foo.java**
+PATH_STRIP = "`'\"* "
+LANGUAGES = {
+    ".java": "java", ".kt": "kotlin", ".kts": "kotlin", ".groovy": "groovy", ".gradle": "groovy",
+    ".xml": "xml", ".html": "html", ".properties": "properties", ".json": "json",
+    ".yml": "yaml", ".yaml": "yaml", ".md": "markdown", ".py": "python", ".js": "javascript",
+    ".ts": "typescript", ".feature": "gherkin", ".sql": "sql", ".sh": "bash",
+}
+
+def detect_language(path, content=None, hint=None):
+    """
+    Language of a generated file, for syntax highlighting
+
+    The file extension decides; otherwise a fence language hint, then a
+    look at the content.
+    """
+    dot = path.rfind(".")
+    if dot > path.rfind("/") and path[dot:].lower() in LANGUAGES:
+        return LANGUAGES[path[dot:].lower()]
+    if hint:
+        return hint.lower()
+    head = (content or "").lstrip()[:1]
+    return {"<": "xml", "{": "json", "[": "json"}.get(head, "text")
+
+def _byte_offsets(text, offsets):
+    """UTF-8 byte offsets of ascending character offsets into text"""
+    if text.isascii():
+        return list(offsets)
+    result, pos, byte = [], 0, 0
+    for offset in offsets:
+        byte += len(text[pos:offset].encode("utf-8", "surrogatepass"))
+        pos = offset
+        result.append(byte)
+    return result
+
+class GeneratedFile:
+    """
+    One file of a generated response, kept as slices of the response text
+
+    Args:
+        source: The whole response text
+        path: File path from the marker
+        spans: (start, end) character offsets of the file's lines in source,
+            for slicing the str; byte_spans gives them as byte offsets
+        hint: Language named by the enclosing code fence, if any
+    """
+    __slots__ = ("source", "path", "spans", "hint", "_content")
+
+    def __init__(self, source, path, spans, hint=None, content=None):
+        self.source = source
+        self.path = path
+        self.spans = spans
+        self.hint = hint
+        self._content = content
+
+    @property
+    def content(self):
+        """File text (built from the spans on each access unless merged)"""
+        if self._content is not None:
+            return self._content
+        if len(self.spans) == 1:
+            start, end = self.spans[0]
+            return self.source[start:end].strip()
+        return "".join(self.source[start:end] for start, end in self.spans).strip()
+
+    @property
+    def byte_spans(self):
+        """spans as (start, end) offsets into the UTF-8 encoded response"""
+        offsets = iter(_byte_offsets(self.source, [offset for span in self.spans for offset in span]))
+        return list(zip(offsets, offsets))
+
+    @property
+    def language(self):
+        return detect_language(self.path, None if self.hint else self.content, self.hint)
+
+    def __repr__(self):
+        return f"GeneratedFile({self.path!r}, spans={self.spans!r})"
 
-    for line in code_text.splitlines():
-        m = re.match(r"// FILE: (.+)", line)
+class ParsedCode(Mapping):
+    """
+    Read-only {path: content} view of a generated response
+
+    Contents are sliced out of the response when read, so parsing a large
+    response does not copy it. files gives the GeneratedFile entries.
+    """
+
+    def __init__(self, files):
+        self.files = files
+
+    def __getitem__(self, path):
+        return self.files[path].content
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __repr__(self):
+        return f"ParsedCode({list(self.files)!r})"
+
+def _iter_markers(text):
+    end = 0
+    for hint in MARKER_HINT_RE.finditer(text):
+        if hint.start() < end:
+            continue
+        m = MARKER_RE.match(text, text.rfind("\n", 0, hint.start()) + 1)
         if m:
-            if current_file and buffer:
-                files[current_file] = "\n".join(buffer).strip()
-            current_file = m.group(1).strip()
-            buffer = []
+            end = m.end()
+            yield m
+
+def _add_file(files, generated, duplicates):
+    path = generated.path
+    existing = files.get(path)
+    if existing is None:
+        files[path] = generated
+        return
+    content = generated.content
+    if " ".join(existing.content.split()) == " ".join(content.split()) or duplicates == "last":
+        files[path] = generated
+    elif duplicates == "version":
+        for n in itertools.count(2):
+            if path.endswith(".java"):
+                new_path, new_content = _renamed(path, content, f"V{n}")
+            else:
+                dot = path.rfind(".")
+                dot = dot if dot > path.rfind("/") else len(path)
+                new_path, new_content = f"{path[:dot]}_v{n}{path[dot:]}", None
+            if new_path not in files:
+                files[new_path] = GeneratedFile(generated.source, new_path, generated.spans, generated.hint, new_content)
+                return
+    elif path.endswith(".java"):
+        # The later copy is usually a revision: its members win, the earlier
+        # copy only contributes members the later one lacks
+        files[path] = GeneratedFile(generated.source, path, generated.spans, generated.hint,
+                                    merge_java_class(content, existing.content))
+    else:
+        files[path] = generated
+
+def parse_code_files(code_text, duplicates="merge"):
+    """
+    Split a generated response into files in a single pass
+
+    Files start at a // FILE:, # FILE: or <!-- FILE: --> marker line.
+    Markdown fence lines are never part of a file; once a file has fenced
+    code, prose outside the fences (e.g. "Here is the page object:") is
+    dropped. Text before the first marker is ignored.
+
+    Args:
+        code_text: Model response
+        duplicates: What to do with a path seen twice: "merge" (Java members
+            are merged, other files keep the last copy), "version" (later
+            copies are kept as Name_v2 / NameV2 classes) or "last"
+
+    Returns:
+        ParsedCode mapping paths to contents
+    """
+    files = {}
+    current = None  # [path, spans, fenced spans, hint]
+    in_fence = False
+    fence_hint = None
+    pos = 0  # start of the text not yet assigned
+
+    def close(end):
+        if current is not None and end > pos:
+            (current[2] if in_fence else current[1]).append((pos, end))
+
+    def finish():
+        if current is not None:
+            spans = current[2] or current[1]
+            if any(NON_SPACE_RE.search(code_text, start, end) for start, end in spans):
+                _add_file(files, GeneratedFile(code_text, current[0], spans, current[3]), duplicates)
+
+    for m in _iter_markers(code_text):
+        close(m.start())
+        pos = m.end() + 1
+        if m.group("fence"):
+            if not in_fence:
+                fence_hint = m.group("lang") or None
+                if current is not None and current[3] is None:
+                    current[3] = fence_hint
+            in_fence = not in_fence
+            continue
+        finish()
+        path = (m.group("path") or m.group("xml_path") or "").strip(PATH_STRIP)
+        current = [path, [], [], fence_hint if in_fence else None] if path else None
+    close(len(code_text))
+    finish()
+    return ParsedCode(files)
+
+def parse_generated_code(code_text):
+    """Parse a generated response into a {path: content} mapping (see parse_code_files)"""
+    return parse_code_files(code_text)
+
+def render_code_files(files):
+    """Join a {path: content} mapping back into text with // FILE: markers"""
+    return "\n\n".join(f"// FILE: {path}\n{content}" for path, content in files.items())
+
+def _block_end(text, start):
+    """Index just past the brace that closes the block opened at text[start]"""
+    depth, i, n = 0, start, len(text)
+    while i < n:
+        ch = text[i]
+        if ch in "\"'":
+            # Skip string and char literals
+            i += 1
+            while i < n and text[i] != ch:
+                i += 2 if text[i] == "\\" else 1
+        elif text.startswith("//", i):
+            i = text.find("\n", i)
+            if i < 0:
+                return n
+        elif text.startswith("/*", i):
+            i = text.find("*/", i + 2)
+            if i < 0:
+                return n
+            i += 1
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return n
+
+def _param_types(params):
+    """Parameter types of a Java parameter list, e.g. "final String a, Map<K, V> b" -> "String,Map<K,V>" """
+    params = PARAM_ANNOTATION_RE.sub("", params)
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(params):
+        if ch == "<":
+            depth += 1
+        elif ch == ">":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(params[start:i])
+            start = i + 1
+    parts.append(params[start:])
+    # Each parameter is its type followed by its name
+    return ",".join("".join(part.split()[:-1]) for part in parts if part.strip())
+
+def _members(content):
+    """
+    Map the members of a Java class to their source (first definition wins)
+
+    Fields are keyed by name, methods by name and parameter types, so
+    overloads are separate members.
+    """
+    body_start = content.find("{")
+    members, methods = {}, []
+    for m in METHOD_RE.finditer(content, body_start + 1):
+        if methods and m.start() < methods[-1][1]:
+            continue  # inside the previous method, e.g. an anonymous class
+        end = _block_end(content, m.end() - 1)
+        methods.append((m.start(), end))
+        members.setdefault(f"{m.group(1)}({_param_types(m.group(2))})", content[m.start():end])
+    for m in FIELD_RE.finditer(content, body_start + 1):
+        # Locals declared inside method bodies are not fields
+        if not any(start <= m.start() < end for start, end in methods):
+            members.setdefault(m.group(1), m.group(0).strip("\n"))
+    return members
+
+def merge_java_class(base, other):
+    """
+    Add the imports, fields and methods of other that base lacks to base
+
+    Used for page objects that several generated shards wrote independently.
+    """
+    imports = {line.strip() for line in IMPORT_RE.findall(base)}
+    missing_imports = [line.strip() for line in IMPORT_RE.findall(other) if line.strip() not in imports]
+    existing = _members(base)
+    missing = [source for name, source in _members(other).items() if name not in existing]
+    if missing:
+        close = base.rstrip().rfind("}")
+        base = base[:close].rstrip() + "\n\n" + "\n\n".join(missing) + "\n}\n"
+    if missing_imports:
+        anchors = list(IMPORT_RE.finditer(base)) or list(PACKAGE_RE.finditer(base))
+        block = "\n".join(dict.fromkeys(missing_imports))
+        if anchors:
+            at = anchors[-1].end()
+            base = base[:at] + "\n" + block + base[at:]
+        else:
+            base = block + "\n\n" + base
+    return base.strip()
+
+def _renamed(path, content, suffix):
+    """Give a clashing Java class a new name, e.g. CombinedTest.java -> CombinedTestPart2.java"""
+    stem = path.rsplit("/", 1)[-1][:-len(".java")]
+    new_path = path[:-len(stem + ".java")] + stem + suffix + ".java"
+    return new_path, re.sub(r"\b" + re.escape(stem) + r"\b", stem + suffix, content)
+
+def merge_code_files(file_maps):
+    """
+    Merge the parsed outputs of several generation shards into one file set
+
+    Identical files are kept once. Support classes that several shards
+    wrote (page objects, BaseTest, DriverFactory...) are merged member by
+    member. Test classes with the same path are renamed with a PartN
+    suffix so no test is lost; other clashing files (e.g. testng.xml) keep
+    the first shard's version.
+
+    Args:
+        file_maps: {path: content} dicts in shard order
+
+    Returns:
+        Merged {path: content} dict
+    """
+    merged = {}
+    for part, files in enumerate(file_maps, 1):
+        for path, content in files.items():
+            existing = merged.get(path)
+            if existing is None:
+                merged[path] = content
+            elif " ".join(existing.split()) == " ".join(content.split()):
+                continue
+            elif path.endswith(".java") and not (TEST_METHOD_RE.search(existing) or TEST_METHOD_RE.search(content)):
+                merged[path] = merge_java_class(existing, content)
+            elif path.endswith(".java"):
+                new_path, new_content = _renamed(path, content, f"Part{part}")
+                merged.setdefault(new_path, new_content)
+    return merged
+
+# Public API of a framework class: its declaration and public method or
+# constructor signatures, without bodies
+CLASS_DECL_RE = re.compile(r"^[ \t]*public\s+(?:abstract\s+|final\s+)*(?:class|interface|enum)\s+\w+[^{]*", re.MULTILINE)
+PUBLIC_SIGNATURE_RE = re.compile(r"^[ \t]*public\s+[^;{=()]*\([^)]*\)[^;{]*(?=\{)", re.MULTILINE)
+
+def java_signatures(files):
+    """
+    Summarize Java files as declarations and public signatures only
+
+    The summary is what a per-case prompt needs to call existing page
+    objects, at a fraction of the tokens of their full source.
+    """
+    parts = []
+    for path, content in files.items():
+        if not path.endswith(".java"):
+            continue
+        decl = CLASS_DECL_RE.search(content)
+        if decl is None:
+            continue
+        package = PACKAGE_RE.search(content)
+        lines = [f"// {path}"]
+        if package:
+            lines.append(package.group(0).strip())
+        lines.append(decl.group(0).strip() + " {")
+        for m in PUBLIC_SIGNATURE_RE.finditer(content, decl.end()):
+            lines.append("    " + " ".join(m.group(0).split()) + ";")
+        lines.append("}")
+        parts.append("\n".join(lines))
+    return "\n\n".join(parts)
+
+def split_shared_files(files, framework):
+    """
+    Move files that belong to the shared framework out of one case's output
+
+    Page objects and other framework classes the case re-emitted are merged
+    into the framework (new members only), so every test class compiles
+    against one copy.
+
+    Args:
+        files: Parsed {path: content} output for one test case
+        framework: Shared framework {path: content}; updated in place
+
+    Returns:
+        The case's own files
+    """
+    own = {}
+    for path, content in files.items():
+        if path in framework:
+            # Other re-emitted framework files (e.g. testng.xml) keep the shared version
+            if path.endswith(".java") and " ".join(framework[path].split()) != " ".join(content.split()):
+                framework[path] = merge_java_class(framework[path], content)
+        elif path.endswith(".java") and PAGE_OBJECT_RE.search(path):
+            framework[path] = content
         else:
-            if current_file:
-                buffer.append(line)
-    if current_file and buffer:
-        files[current_file] = "\n".join(buffer).strip()
-    return files
+            own[path] = content
+    return own
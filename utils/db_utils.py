@@ -0,0 +1,709 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+import weakref
+from contextlib import contextmanager
+from operator import itemgetter
+from pathlib import Path
+
+import streamlit as st
+
+from utils.memory_utils import SpillingDict
+from utils.store_utils import (CATEGORY_FIELDS, ID_RE, LIST_FIELDS, LIST_SEP, PRIORITIES, PRIORITY_CODES, TEXT_FIELDS,
+                               TestCaseStore, priority_code)
+
+# SQLite file shared by every server process; empty disables persistence
+LIBRARY_DB = os.getenv("LIBRARY_DB", str(Path(__file__).resolve().parents[1] / "data" / "library.db"))
+LOAD_BATCH_ROWS = 5000
+# URL query parameter holding the workspace id (see get_owner())
+WORKSPACE_PARAM = "workspace"
+WORKSPACE_RE = re.compile(r"[0-9a-f]{12}")
+
+FIELDS = TEXT_FIELDS + LIST_FIELDS
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS test_cases (
+    {", ".join(f"{field} TEXT NOT NULL DEFAULT ''" for field in FIELDS)},
+    position INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    attachments TEXT,
+    rev INTEGER NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE INDEX IF NOT EXISTS idx_test_cases_position ON test_cases (position);
+CREATE INDEX IF NOT EXISTS idx_test_cases_priority ON test_cases (priority);
+CREATE INDEX IF NOT EXISTS idx_test_cases_area ON test_cases (area);
+CREATE INDEX IF NOT EXISTS idx_test_cases_module ON test_cases (module);
+CREATE INDEX IF NOT EXISTS idx_test_cases_rev ON test_cases (rev);
+CREATE TABLE IF NOT EXISTS deleted_test_cases (id TEXT PRIMARY KEY, rev INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS automation_code (
+    tc_id TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (tc_id, file_name)
+);
+CREATE TABLE IF NOT EXISTS selections (
+    owner TEXT NOT NULL,
+    tc_id TEXT NOT NULL,
+    PRIMARY KEY (owner, tc_id)
+);
+CREATE INDEX IF NOT EXISTS idx_selections_tc_id ON selections (tc_id);
+CREATE TABLE IF NOT EXISTS workspace_code (
+    owner TEXT NOT NULL,
+    key TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (owner, key, file_name)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    created REAL NOT NULL,
+    applied INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES ('library_rev', 0), ('code_rev', 0);
+"""
+ROW_COLUMNS = ", ".join(FIELDS) + ", priority, attachments, position"
+# A row as LibraryStore reads it: ROW_COLUMNS plus whether the workspace
+# (the first parameter) selected it
+ROW_SQL = (
+    f"SELECT {ROW_COLUMNS}, EXISTS(SELECT 1 FROM selections WHERE owner = ? AND tc_id = test_cases.id) "
+    "FROM test_cases"
+)
+INSERT_SQL = f"INSERT INTO test_cases ({ROW_COLUMNS}, rev) VALUES ({', '.join('?' * (len(FIELDS) + 4))})"
+UPDATE_SQL = f"UPDATE test_cases SET {', '.join(f'{field} = ?' for field in FIELDS[1:])}, priority = ?, attachments = ?, rev = ? WHERE id = ?"
+# Code entries that belong to a workspace rather than to one test case
+WORKSPACE_CODE_KEYS = ("framework", "combined")
+
+
+def _casefold(value):
+    return value.casefold() if isinstance(value, str) else value
+
+
+class LibraryDB:
+    """
+    SQLite persistence for the test case library and generated code
+
+    The database runs in WAL mode so several Streamlit processes can read
+    while one writes. Each thread gets its own connection. A revision
+    counter in ``meta`` is bumped by every write, which lets each session
+    notice and pull changes made by other sessions or processes.
+
+    Args:
+        path: Database file
+    """
+
+    def __init__(self, path=LIBRARY_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self.conn.executescript(SCHEMA)
+
+    def connect(self, **kwargs):
+        """New connection to the database; kwargs go to sqlite3.connect()"""
+        conn = sqlite3.connect(self.path, isolation_level=None, timeout=30, **kwargs)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # SQLite's lower() only folds ASCII letters
+        conn.create_function("casefold", 1, _casefold, deterministic=True)
+        return conn
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self.connect()
+        return conn
+
+    @contextmanager
+    def transaction(self, write=True):
+        """
+        Run a block in one transaction
+
+        Write transactions take the write lock up front (BEGIN IMMEDIATE);
+        read transactions see a consistent snapshot without blocking writers.
+        """
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def revision(self, name="library_rev", conn=None):
+        return (conn or self.conn).execute("SELECT value FROM meta WHERE key = ?", (name,)).fetchone()[0]
+
+    def bump(self, conn, name="library_rev"):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = ?", (name,))
+        return self.revision(name, conn)
+
+    def count(self, **filters):
+        """Number of test cases matching the filters (see query())"""
+        where, params = self._where(**filters)
+        return self.conn.execute(f"SELECT COUNT(*) FROM test_cases {where}", params).fetchone()[0]
+
+    def max_number(self, conn=None):
+        """Largest n of the library's TC_n ids, 0 when there are none"""
+        return (conn or self.conn).execute(
+            "SELECT COALESCE(MAX(CAST(SUBSTR(id, 4) AS INTEGER)), 0) FROM test_cases WHERE id GLOB 'TC_[0-9]*'"
+        ).fetchone()[0]
+
+    def iter_pages(self, owner="", batch=LOAD_BATCH_ROWS, conn=None):
+        """Yield lists of rows (see ROW_SQL) in library order, one page of up to batch rows at a time"""
+        conn = conn or self.conn
+        position = -1
+        while True:
+            rows = conn.execute(
+                f"{ROW_SQL} WHERE position > ? ORDER BY position LIMIT ?", (owner, position, batch)
+            ).fetchall()
+            if not rows:
+                return
+            yield rows
+            position = rows[-1][len(FIELDS) + 2]
+
+    def query(self, owner="", limit=50, offset=0, **filters):
+        """
+        One page of test case rows matching the filters, using the column indexes
+
+        Args:
+            owner: Workspace whose selection the rows report
+            limit, offset: The page, in library order
+            priorities: Priorities to keep (all when empty)
+            area, module: Exact area / module to keep (all when None)
+            text: Text to find in title, steps or expected results (ASCII case-insensitive)
+            ids: Test case ids to keep (all when None)
+
+        Returns:
+            List of row tuples (see ROW_SQL)
+        """
+        where, params = self._where(**filters)
+        return self.conn.execute(
+            f"{ROW_SQL} {where} ORDER BY position LIMIT ? OFFSET ?", [owner] + params + [limit, offset]
+        ).fetchall()
+
+    @staticmethod
+    def _where(priorities=None, area=None, module=None, text="", ids=None):
+        clauses, params = [], []
+        if priorities:
+            codes = [PRIORITY_CODES[p.lower()] for p in priorities]
+            clauses.append(f"priority IN ({', '.join('?' * len(codes))})")
+            params.extend(codes)
+        if area is not None:
+            clauses.append("area = ?")
+            params.append(area)
+        if module is not None:
+            clauses.append("module = ?")
+            params.append(module)
+        needle = text.strip().casefold()
+        if needle:
+            # One call per row; a needle never spans the separator between columns
+            clauses.append("instr(casefold(title || char(31) || test_steps || char(31) || expected_results), ?)")
+            params.append(needle)
+        if ids is not None:
+            clauses.append("id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(ids)))
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def save_job(self, record):
+        """Insert or replace a finished background job (job_utils.Job.to_record())"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?)",
+            (record["id"], record["kind"], record["created"], record["applied"], json.dumps(record)),
+        )
+
+    def set_job_applied(self, job_id, applied):
+        self.conn.execute("UPDATE jobs SET applied = ? WHERE id = ?", (applied, job_id))
+
+    def load_jobs(self, limit):
+        """The newest limit job records, newest first"""
+        records = []
+        for applied, data in self.conn.execute("SELECT applied, data FROM jobs ORDER BY created DESC LIMIT ?", (limit,)):
+            records.append(dict(json.loads(data), applied=applied))
+        return records
+
+    def delete_jobs(self, before):
+        """Forget jobs created before a time.time() value"""
+        self.conn.execute("DELETE FROM jobs WHERE created < ?", (before,))
+
+    def load_code(self, owner=""):
+        """Generated code of every test case plus the workspace's own entries (WORKSPACE_CODE_KEYS)"""
+        code = {}
+        for tc_id, file_name, content in self.conn.execute(
+            "SELECT tc_id, file_name, content FROM automation_code "
+            f"WHERE tc_id NOT IN ({', '.join('?' * len(WORKSPACE_CODE_KEYS))}) ORDER BY rowid",
+            WORKSPACE_CODE_KEYS,
+        ):
+            code.setdefault(tc_id, {})[file_name] = content
+        for key, file_name, content in self.conn.execute(
+            "SELECT key, file_name, content FROM workspace_code WHERE owner = ? ORDER BY rowid", (owner,)
+        ):
+            code.setdefault(key, {})[file_name] = content
+        return code
+
+
+class LibraryStore:
+    """
+    The test case library of a LibraryDB, read a page at a time instead of held in the session
+
+    Offers the TestCaseStore interface the pages and utils use. A row is a
+    case's position in the database, which keeps library order and does
+    not move when other sessions add or delete cases. Counts and filter
+    values are read through the column indexes and cached until the
+    library changes; cases are read only when shown, exported or indexed.
+    Every change is written as it happens in one transaction, which also
+    assigns ids and positions, so sessions and server processes never
+    collide. The selection belongs to the workspace (see get_owner()).
+
+    Args:
+        db: LibraryDB
+        owner: Workspace id the selection is kept under
+    """
+
+    def __init__(self, db, owner=""):
+        self.db = db
+        self.owner = owner
+        self._rev = db.revision()
+        self._cache = {}
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def refresh(self):
+        """
+        Ids changed or removed since the last call, by any session
+
+        Only plain reads: the revision is read first, so a change committed
+        meanwhile is at worst reported again on the next call.
+
+        Returns:
+            (changed ids, removed ids)
+        """
+        rev = self.db.revision()
+        if rev == self._rev:
+            return [], []
+        conn = self.db.conn
+        changed = [tc_id for (tc_id,) in conn.execute("SELECT id FROM test_cases WHERE rev > ?", (self._rev,))]
+        removed = [tc_id for (tc_id,) in conn.execute("SELECT id FROM deleted_test_cases WHERE rev > ?", (self._rev,))]
+        self._rev = rev
+        self._cache.clear()
+        return changed, removed
+
+    # -- reading --------------------------------------------------------
+
+    def __len__(self):
+        return self._cached("len", self.db.count)
+
+    def __iter__(self):
+        for rows in self.db.iter_pages(self.owner):
+            for values in rows:
+                yield _row_dict(values)
+
+    def __getitem__(self, row):
+        values = self.db.conn.execute(f"{ROW_SQL} WHERE position = ?", (self.owner, row)).fetchone()
+        if values is None:
+            raise IndexError(row)
+        return _row_dict(values)
+
+    def __contains__(self, tc_id):
+        return self.row_of(tc_id) is not None
+
+    def row_of(self, tc_id):
+        found = self.db.conn.execute("SELECT position FROM test_cases WHERE id = ?", (tc_id,)).fetchone()
+        return found[0] if found else None
+
+    def get(self, tc_id):
+        values = self.db.conn.execute(f"{ROW_SQL} WHERE id = ?", (self.owner, tc_id)).fetchone()
+        return None if values is None else _row_dict(values)
+
+    def snapshot(self):
+        """LibrarySnapshot of the store, for readers on another thread"""
+        return LibrarySnapshot(self.db, self.owner)
+
+    def iter_columns(self, fields, batch=LOAD_BATCH_ROWS):
+        """Yield the given columns batch rows at a time, like TestCaseStore.iter_columns()"""
+        with self.db.transaction(write=False) as conn:
+            yield from _column_batches(self.db.iter_pages(self.owner, batch, conn=conn), fields)
+
+    def rows(self, rows):
+        rows = list(rows)
+        found = {values[len(FIELDS) + 2]: _row_dict(values) for values in self.db.conn.execute(
+            f"{ROW_SQL} WHERE position IN (SELECT value FROM json_each(?))", (self.owner, json.dumps(rows))
+        )}
+        return [found[row] for row in rows if row in found]
+
+    def attachments(self, rows):
+        """Attachment references of the given rows, flattened"""
+        return [a for (refs,) in self.db.conn.execute(
+            "SELECT attachments FROM test_cases WHERE attachments IS NOT NULL "
+            "AND position IN (SELECT value FROM json_each(?)) ORDER BY position", (json.dumps(list(rows)),)
+        ) for a in json.loads(refs)]
+
+    def priority_counts(self):
+        def compute():
+            counts = dict.fromkeys(PRIORITIES, 0)
+            for code, count in self.db.conn.execute("SELECT priority, COUNT(*) FROM test_cases GROUP BY priority"):
+                counts[PRIORITIES[code]] = count
+            return counts
+        return dict(self._cached("priority_counts", compute))
+
+    def distinct(self, field):
+        """Sorted non-empty values of a categorical field"""
+        if field not in CATEGORY_FIELDS:
+            raise ValueError(f"Not a categorical field: {field}")
+        return list(self._cached(("distinct", field), lambda: [value for (value,) in self.db.conn.execute(
+            f"SELECT DISTINCT {field} FROM test_cases WHERE {field} != '' ORDER BY {field}"
+        )]))
+
+    def next_number(self):
+        return self.db.max_number() + 1
+
+    def next_id(self):
+        return f"TC_{self.next_number():03d}"
+
+    def count(self, **filters):
+        """Number of cases matching the filters (see LibraryDB.query())"""
+        return self._cached(("count", json.dumps(filters, sort_keys=True)), lambda: self.db.count(**filters))
+
+    def page(self, offset, limit, **filters):
+        """
+        One page of the cases matching the filters (see LibraryDB.query())
+
+        Returns:
+            List of (row, test case dict)
+        """
+        return [(values[len(FIELDS) + 2], _row_dict(values))
+                for values in self.db.query(self.owner, limit, offset, **filters)]
+
+    # -- selection ------------------------------------------------------
+
+    @property
+    def selected_count(self):
+        return self._cached("selected_count", lambda: self.db.conn.execute(
+            "SELECT COUNT(*) FROM selections WHERE owner = ?", (self.owner,)
+        ).fetchone()[0])
+
+    def all_selected(self):
+        return len(self) > 0 and self.selected_count == len(self)
+
+    def is_selected(self, row):
+        return bool(self.db.conn.execute(
+            "SELECT EXISTS(SELECT 1 FROM selections s JOIN test_cases t ON t.id = s.tc_id "
+            "WHERE s.owner = ? AND t.position = ?)", (self.owner, row)
+        ).fetchone()[0])
+
+    def set_selected(self, row, selected=True):
+        found = self.db.conn.execute("SELECT id FROM test_cases WHERE position = ?", (row,)).fetchone()
+        if found is not None:
+            self.set_selected_ids({found[0]: selected})
+
+    def set_selected_ids(self, states):
+        """Apply {test case id: selected}; only actual changes are written"""
+        current = {tc_id for (tc_id,) in self.db.conn.execute(
+            "SELECT tc_id FROM selections WHERE owner = ? AND tc_id IN (SELECT value FROM json_each(?))",
+            (self.owner, json.dumps(list(states))),
+        )}
+        select = [(self.owner, tc_id) for tc_id, selected in states.items() if selected and tc_id not in current]
+        unselect = [(self.owner, tc_id) for tc_id, selected in states.items() if not selected and tc_id in current]
+        if not select and not unselect:
+            return
+        with self.db.transaction() as conn:
+            # Only cases still in the library are selected
+            conn.executemany(
+                "INSERT OR IGNORE INTO selections SELECT ?, id FROM test_cases WHERE id = ?", select
+            )
+            conn.executemany("DELETE FROM selections WHERE owner = ? AND tc_id = ?", unselect)
+        self._cache.pop("selected_count", None)
+
+    def select_all(self, selected=True):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM selections WHERE owner = ?", (self.owner,))
+            if selected:
+                conn.execute("INSERT INTO selections SELECT ?, id FROM test_cases", (self.owner,))
+        self._cache.pop("selected_count", None)
+
+    def selected_rows(self):
+        return [row for (row,) in self.db.conn.execute(
+            "SELECT t.position FROM selections s JOIN test_cases t ON t.id = s.tc_id "
+            "WHERE s.owner = ? ORDER BY t.position", (self.owner,)
+        )]
+
+    def selected_cases(self):
+        return [_row_dict(values) for values in self.db.conn.execute(
+            f"{ROW_SQL} WHERE id IN (SELECT tc_id FROM selections WHERE owner = ?) ORDER BY position",
+            (self.owner, self.owner),
+        )]
+
+    # -- writing --------------------------------------------------------
+
+    @contextmanager
+    def _writing(self):
+        """Write transaction with the library revision bumped; yields (conn, rev)"""
+        with self.db.transaction() as conn:
+            yield conn, self.db.bump(conn)
+        self._cache.clear()
+
+    def add(self, test_case):
+        """Append a test case; a missing or already used id is replaced with the next free one"""
+        return self.extend([test_case])[0]
+
+    def extend(self, test_cases):
+        test_cases = list(test_cases)
+        columns = {field: [str(tc.get(field) or "") for tc in test_cases] for field in TEXT_FIELDS}
+        for field in LIST_FIELDS:
+            columns[field] = [LIST_SEP.join(str(item) for item in tc.get(field) or []) for tc in test_cases]
+        return self._insert(
+            columns,
+            [priority_code(tc.get("priority")) for tc in test_cases],
+            [int(bool(tc.get("selected"))) for tc in test_cases],
+            [tc.get("attachments") or None for tc in test_cases],
+        )
+
+    def extend_columns(self, columns, priorities, selected=None, attachments=None):
+        """Bulk-append rows given column-wise, like TestCaseStore.extend_columns()"""
+        attachments = attachments or {}
+        return self._insert(columns, priorities, selected, [attachments.get(tc_id) for tc_id in columns["id"]])
+
+    def _insert(self, columns, priorities, selected, attachments):
+        if not columns["id"]:
+            return []
+        with self._writing() as (conn, rev):
+            # Ids and positions are assigned inside the write transaction,
+            # after whatever other processes committed before it
+            taken = {tc_id for (tc_id,) in conn.execute(
+                "SELECT id FROM test_cases WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(columns["id"]),)
+            )}
+            number = self.db.max_number(conn)
+            position = conn.execute("SELECT COALESCE(MAX(position), -1) FROM test_cases").fetchone()[0]
+            ids, params = [], []
+            for i, tc_id in enumerate(columns["id"]):
+                if not tc_id or tc_id in taken:
+                    number += 1
+                    tc_id = f"TC_{number:03d}"
+                m = ID_RE.match(tc_id)
+                if m:
+                    number = max(number, int(m.group(1)))
+                taken.add(tc_id)
+                ids.append(tc_id)
+                position += 1
+                params.append(
+                    [tc_id] + [columns[field][i] for field in FIELDS[1:]]
+                    + [priorities[i], json.dumps(attachments[i]) if attachments[i] else None, position, rev]
+                )
+            conn.executemany(INSERT_SQL, params)
+            conn.executemany("DELETE FROM deleted_test_cases WHERE id = ?", [(tc_id,) for tc_id in ids])
+            if selected:
+                conn.executemany("INSERT OR IGNORE INTO selections VALUES (?, ?)",
+                                 [(self.owner, tc_id) for tc_id, flag in zip(ids, selected) if flag])
+        return ids
+
+    def update(self, row, test_case):
+        """Replace the fields of a row, keeping its id; nothing happens when the row was deleted meanwhile"""
+        with self._writing() as (conn, rev):
+            found = conn.execute("SELECT id FROM test_cases WHERE position = ?", (row,)).fetchone()
+            if found is None:
+                return
+            tc_id = found[0]
+            refs = test_case.get("attachments")
+            conn.execute(UPDATE_SQL, [str(test_case.get(field) or "") for field in TEXT_FIELDS[1:]]
+                         + [LIST_SEP.join(str(item) for item in test_case.get(field) or []) for field in LIST_FIELDS]
+                         + [priority_code(test_case.get("priority")), json.dumps(refs) if refs else None, rev, tc_id])
+            if test_case.get("selected"):
+                conn.execute("INSERT OR IGNORE INTO selections VALUES (?, ?)", (self.owner, tc_id))
+            else:
+                conn.execute("DELETE FROM selections WHERE owner = ? AND tc_id = ?", (self.owner, tc_id))
+
+    def delete_rows(self, rows):
+        """Delete rows and return the ids that were removed"""
+        rows = list(rows)
+        if not rows:
+            return []
+        with self._writing() as (conn, rev):
+            removed = [tc_id for (tc_id,) in conn.execute(
+                "SELECT id FROM test_cases WHERE position IN (SELECT value FROM json_each(?)) ORDER BY position",
+                (json.dumps(rows),),
+            )]
+            params = [(tc_id,) for tc_id in removed]
+            conn.executemany("DELETE FROM test_cases WHERE id = ?", params)
+            conn.executemany("INSERT OR REPLACE INTO deleted_test_cases VALUES (?, ?)",
+                             [(tc_id, rev) for tc_id in removed])
+            conn.executemany("DELETE FROM selections WHERE tc_id = ?", params)
+            if conn.executemany("DELETE FROM automation_code WHERE tc_id = ?", params).rowcount:
+                self.db.bump(conn, "code_rev")
+        return removed
+
+    def delete_selected(self):
+        return self.delete_rows(self.selected_rows())
+
+
+def _row_dict(values):
+    """Test case dictionary of a row read with ROW_SQL"""
+    tc = dict(zip(FIELDS, values))
+    for field in LIST_FIELDS:
+        tc[field] = tc[field].split(LIST_SEP) if tc[field] else []
+    priority, attachments, _position, selected = values[len(FIELDS):]
+    tc["priority"] = PRIORITIES[priority]
+    tc["attachments"] = json.loads(attachments) if attachments else []
+    tc["selected"] = bool(selected)
+    return tc
+
+
+def _column_batches(pages, fields):
+    """Lists of column values, one per field, of each page of ROW_SQL rows"""
+    n = len(FIELDS)
+    getters = [(lambda values: PRIORITIES[values[n]]) if field == "priority" else itemgetter(FIELDS.index(field))
+               for field in fields]
+    for rows in pages:
+        yield [[get(values) for values in rows] for get in getters]
+
+
+class LibrarySnapshot:
+    """
+    Read-only view of the library as it was when the snapshot was taken
+
+    Holds a connection of its own with a read transaction open, so its
+    length and its columns come from the same state of the database while
+    other sessions keep writing. The transaction ends with close() or when
+    the snapshot is garbage collected.
+
+    Args:
+        db: LibraryDB
+        owner: Workspace id, as for LibraryStore
+    """
+
+    def __init__(self, db, owner=""):
+        self.db = db
+        self.owner = owner
+        # Used from the thread the snapshot is handed to
+        self._conn = db.connect(check_same_thread=False)
+        self._conn.execute("BEGIN")
+        self._len = self._conn.execute("SELECT COUNT(*) FROM test_cases").fetchone()[0]
+        self._finalizer = weakref.finalize(self, self._conn.close)
+
+    def __len__(self):
+        return self._len
+
+    def iter_columns(self, fields, batch=LOAD_BATCH_ROWS):
+        """Yield the given columns batch rows at a time, like TestCaseStore.iter_columns()"""
+        yield from _column_batches(self.db.iter_pages(self.owner, batch, conn=self._conn), fields)
+
+    def close(self):
+        self._finalizer()
+
+
+class PersistentCodeMap(SpillingDict):
+    """
+    Generated automation code (test case id -> {file name: content}) saved to a LibraryDB
+
+    Setting or deleting an entry replaces that entry's files in the
+    database; refresh() reloads the map when another session changed it.
+    Test cases' code is shared by everyone, while the entries in
+    WORKSPACE_CODE_KEYS (the shared framework and the combined suite)
+    belong to the workspace. Large entries are kept on disk rather than in
+    the session (see SpillingDict).
+
+    Args:
+        db: LibraryDB
+        owner: Workspace id the WORKSPACE_CODE_KEYS entries are kept under
+    """
+
+    def __init__(self, db, owner=""):
+        self.db = db
+        self.owner = owner
+        self._rev = db.revision("code_rev")
+        super().__init__(db.load_code(owner))
+
+    def refresh(self):
+        # Plain reads: the revision is read before the code, so a change
+        # committed in between only causes another reload next time
+        rev = self.db.revision("code_rev")
+        if rev == self._rev:
+            return False
+        code = self.db.load_code(self.owner)
+        self._rev = rev
+        super().clear()
+        super().update(code)
+        return True
+
+    def _delete(self, conn, key):
+        if key in WORKSPACE_CODE_KEYS:
+            conn.execute("DELETE FROM workspace_code WHERE owner = ? AND key = ?", (self.owner, key))
+        else:
+            conn.execute("DELETE FROM automation_code WHERE tc_id = ?", (key,))
+
+    def __setitem__(self, key, files):
+        with self.db.transaction() as conn:
+            self._delete(conn, key)
+            if key in WORKSPACE_CODE_KEYS:
+                conn.executemany("INSERT INTO workspace_code VALUES (?, ?, ?, ?)",
+                                 [(self.owner, key, name, content) for name, content in files.items()])
+            else:
+                conn.executemany("INSERT INTO automation_code VALUES (?, ?, ?)",
+                                 [(key, name, content) for name, content in files.items()])
+            self._rev = self.db.bump(conn, "code_rev")
+        super().__setitem__(key, files)
+
+    def __delitem__(self, key):
+        with self.db.transaction() as conn:
+            self._delete(conn, key)
+            self._rev = self.db.bump(conn, "code_rev")
+        super().__delitem__(key)
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def clear(self):
+        # Only the entries this map holds: code other sessions saved since
+        # the last refresh, and other workspaces' entries, are kept
+        with self.db.transaction() as conn:
+            for key in self:
+                self._delete(conn, key)
+            self._rev = self.db.bump(conn, "code_rev")
+        super().clear()
+
+
+def get_owner():
+    """
+    Id of this browser tab's workspace, kept in the URL
+
+    Selections, the shared framework, the combined suite and background
+    jobs belong to a workspace, so sessions do not overwrite each other's
+    in the shared database. The id is added to the URL on
+    first use, so reloading the page or reopening the link returns to the
+    same workspace while a new tab starts its own.
+    """
+    owner = st.query_params.get(WORKSPACE_PARAM, "")
+    if not WORKSPACE_RE.fullmatch(owner):
+        owner = uuid.uuid4().hex[:12]
+        st.query_params[WORKSPACE_PARAM] = owner
+    return owner
+
+
+@st.cache_resource
+def get_library_db():
+    """Process-wide LibraryDB, or None when LIBRARY_DB is empty"""
+    return LibraryDB(LIBRARY_DB) if LIBRARY_DB else None
+
+
+def load_library():
+    """A session's test case store: the shared library when a database is configured"""
+    db = get_library_db()
+    return LibraryStore(db, get_owner()) if db else TestCaseStore()
+
+
+def load_automation_code():
+    db = get_library_db()
+    return PersistentCodeMap(db, get_owner()) if db else SpillingDict()
@@ -0,0 +1,107 @@
+import os
+
+from utils.search_utils import test_case_text
+
+# Cosine similarity at which two test cases count as near-duplicates; by
+# default each embedder's own duplicate_threshold is used
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD")) if os.getenv("DEDUP_THRESHOLD") else None
+# Neighbours looked up per new case
+DEDUP_NEIGHBOURS = 5
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        if parent != item:
+            parent = self.parent[item] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+
+def find_duplicate_clusters(store, index, new_ids, threshold=DEDUP_THRESHOLD, k=DEDUP_NEIGHBOURS):
+    """
+    Group newly added test cases with the library cases they duplicate
+
+    Each new case is looked up in the similarity index (one batched query,
+    so the cost grows with the batch size times the per-query cost of the
+    index rather than with the square of the library). Matches above the
+    threshold, including matches between new cases, are joined into
+    clusters.
+
+    Args:
+        store: TestCaseStore holding the library, new cases included
+        index: TestCaseIndex that already contains the new cases
+        new_ids: Ids of the cases added by the generation batch
+        threshold: Minimum similarity for two cases to be duplicates
+            (defaults to the embedder's duplicate_threshold)
+        k: Neighbours looked up per new case
+
+    Returns:
+        List of clusters, each a list of ids in library order, so the first
+        id is the oldest case and the natural one to keep
+    """
+    new_ids = [tc_id for tc_id in new_ids if tc_id in store]
+    if not new_ids:
+        return []
+    if threshold is None:
+        threshold = getattr(index.embedder, "duplicate_threshold", 0.9)
+    texts = [test_case_text(store.get(tc_id)) for tc_id in new_ids]
+    groups = _UnionFind()
+    for tc_id, matches in zip(new_ids, index.search_many(texts, k + 1)):
+        for other_id, score in matches:
+            if other_id != tc_id and score >= threshold and other_id in store:
+                groups.union(tc_id, other_id)
+
+    clusters = {}
+    for tc_id in groups.parent:
+        clusters.setdefault(groups.find(tc_id), []).append(tc_id)
+    return [sorted(ids, key=store.row_of) for ids in clusters.values() if len(ids) > 1]
+
+
+def merge_clusters(clusters, pending):
+    """Fold newly found clusters into the clusters already waiting for review"""
+    groups = _UnionFind()
+    for cluster in list(pending) + list(clusters):
+        for tc_id in cluster[1:]:
+            groups.union(tc_id, cluster[0])
+    merged = {}
+    for tc_id in groups.parent:
+        merged.setdefault(groups.find(tc_id), []).append(tc_id)
+    return [ids for ids in merged.values() if len(ids) > 1]
+
+
+def merge_duplicates(store, cluster):
+    """
+    Keep the oldest case of a cluster and delete the others
+
+    Attachments of the deleted cases move to the kept case unless it
+    already has the same file.
+
+    Returns:
+        (kept id, removed ids, attachments no longer referenced)
+    """
+    live = sorted((tc_id for tc_id in cluster if tc_id in store), key=store.row_of)
+    if len(live) < 2:
+        return (live[0] if live else None), [], []
+    keep_id, drop_ids = live[0], live[1:]
+    drop_rows = [store.row_of(tc_id) for tc_id in drop_ids]
+
+    kept = store.get(keep_id)
+    refs = {a.get("ref") for a in kept["attachments"]}
+    released = []
+    for attachment in store.attachments(drop_rows):
+        if attachment.get("ref") in refs:
+            released.append(attachment)
+        else:
+            refs.add(attachment.get("ref"))
+            kept["attachments"].append(attachment)
+    if len(kept["attachments"]) != len(store.get(keep_id)["attachments"]):
+        store.update(store.row_of(keep_id), kept)
+    # Rows may have moved if the update pulled in other sessions' changes
+    removed = store.delete_rows([store.row_of(tc_id) for tc_id in drop_ids if tc_id in store])
+    return keep_id, removed, released
@@ -0,0 +1,203 @@
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+from utils.store_utils import LIST_FIELDS, LIST_SEP
+
+# (header, field) pairs of the spreadsheet and CSV exports
+EXPORT_COLUMNS = [
+    ("ID", "id"),
+    ("Area", "area"),
+    ("Module", "module"),
+    ("SubModule", "submodule"),
+    ("Title", "title"),
+    ("Priority", "priority"),
+    ("Preconditions", "preconditions"),
+    ("Test Data", "test_data"),
+    ("Steps", "test_steps"),
+    ("Expected", "expected_results"),
+]
+# format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (".csv", "text/csv"),
+    "ndjson": (".ndjson", "application/x-ndjson"),
+}
+
+
+class ExportCancelled(Exception):
+    """Raised inside an export when its job is cancelled"""
+
+
+def iter_export_rows(store, list_sep="\n"):
+    """
+    Yield one list of cell values per test case, straight from the store columns
+
+    List fields are joined with list_sep: by default one item per line, as
+    in the old pandas export.
+    """
+    list_positions = [i for i, (_header, field) in enumerate(EXPORT_COLUMNS) if field in LIST_FIELDS]
+    for columns in store.iter_columns([field for _header, field in EXPORT_COLUMNS]):
+        if list_sep == LIST_SEP:
+            yield from (list(values) for values in zip(*columns))
+            continue
+        for values in zip(*columns):
+            values = list(values)
+            for i in list_positions:
+                values[i] = values[i].replace(LIST_SEP, list_sep)
+            yield values
+
+
+def write_xlsx(store, fileobj, rows=None):
+    """Write an Excel workbook row by row with openpyxl's write-only mode"""
+    import openpyxl
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("TestCases")
+    ws.append([header for header, _field in EXPORT_COLUMNS])
+    for values in rows if rows is not None else iter_export_rows(store):
+        # Control characters are not allowed in XLSX cells
+        ws.append([ILLEGAL_CHARACTERS_RE.sub("", v) for v in values])
+    wb.save(fileobj)
+
+
+def write_csv(store, fileobj, rows=None):
+    writer = csv.writer(fileobj)
+    writer.writerow([header for header, _field in EXPORT_COLUMNS])
+    writer.writerows(rows if rows is not None else iter_export_rows(store))
+
+
+def write_ndjson(store, fileobj, rows=None):
+    """Write one JSON test case per line, lists kept as arrays"""
+    fields = [field for _header, field in EXPORT_COLUMNS]
+    # Split on the store's separator, so items containing line breaks stay whole
+    for values in rows if rows is not None else iter_export_rows(store, LIST_SEP):
+        tc = dict(zip(fields, values))
+        for field in LIST_FIELDS:
+            tc[field] = tc[field].split(LIST_SEP) if tc[field] else []
+        fileobj.write(json.dumps(tc, ensure_ascii=False))
+        fileobj.write("\n")
+
+
+WRITERS = {"xlsx": write_xlsx, "csv": write_csv, "ndjson": write_ndjson}
+# Separator of list items in the rows a writer takes, where it is not a line break
+ROW_LIST_SEP = {"ndjson": LIST_SEP}
+
+
+def export_to_file(store, fmt, path, rows=None):
+    """
+    Export a test case store to a file on disk
+
+    Args:
+        store: TestCaseStore to export
+        fmt: One of EXPORT_FORMATS
+        path: Destination file path
+        rows: Optional iterable of row values to use instead of the store's rows,
+            as iter_export_rows(store, ROW_LIST_SEP.get(fmt, "\n")) yields them
+    """
+    if fmt not in WRITERS:
+        raise ValueError("Unsupported export format: " + fmt)
+    if fmt == "xlsx":
+        write_xlsx(store, path, rows)
+    else:
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            WRITERS[fmt](store, f, rows)
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class ExportJob:
+    """
+    Background export of a test case library to a spooled temp file
+
+    The store is snapshotted when the job is created, so the library can be
+    edited while the export runs. The file is removed with discard() or when
+    the job is garbage collected.
+
+    Args:
+        store: TestCaseStore to export
+        fmt: One of EXPORT_FORMATS
+        file_name: Download name without extension
+    """
+
+    def __init__(self, store, fmt, file_name="test_cases"):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError("Unsupported export format: " + fmt)
+        self.fmt = fmt
+        suffix, self.mime = EXPORT_FORMATS[fmt]
+        self.file_name = file_name + suffix
+        self._store = store.snapshot()
+        # Counted on the snapshot, so the total matches the rows exported
+        self.total = len(self._store)
+        self.done = 0
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+        fd, self.path = tempfile.mkstemp(prefix="export_", suffix=suffix)
+        os.close(fd)
+        self._finalizer = weakref.finalize(self, _unlink, self.path)
+        self._thread = threading.Thread(target=self._run, name=f"export-{fmt}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    @property
+    def succeeded(self):
+        return self.finished is not None and self.error is None
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+    def cancel(self):
+        self._cancel.set()
+
+    def read(self):
+        """Bytes of the finished export"""
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def discard(self):
+        self.cancel()
+        self._finalizer()
+
+    def _tracked(self, rows):
+        for values in rows:
+            if self._cancel.is_set():
+                raise ExportCancelled("Export cancelled")
+            yield values
+            self.done += 1
+
+    def _run(self):
+        try:
+            rows = iter_export_rows(self._store, ROW_LIST_SEP.get(self.fmt, "\n"))
+            export_to_file(self._store, self.fmt, self.path, self._tracked(rows))
+        except Exception as e:
+            self.error = e
+        finally:
+            close = getattr(self._store, "close", None)
+            if close:
+                close()
+            self._store = None
+            self.finished = time.time()
+
+
+def start_export(store, fmt, file_name="test_cases"):
+    """Start exporting store in a background thread and return the ExportJob"""
+    return ExportJob(store, fmt, file_name).start()
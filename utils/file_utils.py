@@ -1,37 +1,242 @@
-# utils/file_utils.py
-import PyPDF2
-import docx
-import pandas as pd
-from io import BytesIO
-import streamlit as st
+import io
+import os
+from collections import namedtuple
 
-def extract_text_from_txt(uploaded_file):
-    return uploaded_file.read().decode("utf-8")
+from utils.report_utils import report
 
-def extract_text_from_pdf(uploaded_file):
+# Target size of a single chunk and ceiling on text extracted from one document
+CHUNK_CHARS = int(os.getenv("EXTRACT_CHUNK_CHARS", "8000"))
+MAX_EXTRACT_CHARS = int(os.getenv("MAX_EXTRACT_CHARS", "2000000"))
+ROWS_PER_CHUNK = 200
+
+EXCEL_TYPES = ("application/vnd.ms-excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# MIME types of the requirement documents the extractors read, by extension
+DOCUMENT_TYPES = {
+    ".txt": "text/plain",
+    ".pdf": "application/pdf",
+    ".docx": DOCX_TYPE,
+    ".csv": "text/csv",
+    ".xlsx": EXCEL_TYPES[1],
+    ".xls": EXCEL_TYPES[0],
+}
+
+# kind is "line", "page", "paragraph" or "row"; start/end are 0-based unit
+# indices (end exclusive) and offset is the chunk's position in the joined text
+TextChunk = namedtuple("TextChunk", ["text", "kind", "start", "end", "offset"])
+
+
+class ExtractionLimitError(Exception):
+    """Raised when a document yields more text than the configured ceiling"""
+
+
+class DocumentFile(io.BufferedReader):
+    """
+    A document on disk, opened so the extractors can read it like an UploadedFile
+
+    Args:
+        path: File path; its extension picks the MIME type (see DOCUMENT_TYPES)
+    """
+
+    def __init__(self, path):
+        super().__init__(io.FileIO(path, "rb"))
+        self.type = DOCUMENT_TYPES.get(os.path.splitext(str(path))[1].lower(), "application/octet-stream")
+
+
+def _split_text(text, max_chars):
+    """Split an oversized unit, preferring line breaks as cut points"""
+    while len(text) > max_chars:
+        cut = text.rfind("\n", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        yield text[:cut]
+        text = text[cut:].lstrip("\n")
+    if text:
+        yield text
+
+
+def _pack(units, max_chars):
+    """Group (index, text) units into (text, start, end) chunks of up to max_chars"""
+    buffer, size, start, end = [], 0, None, None
+    for index, text in units:
+        if not text:
+            continue
+        if buffer and size + len(text) + 1 > max_chars:
+            yield "\n".join(buffer), start, end
+            buffer, size = [], 0
+        if len(text) > max_chars:
+            for piece in _split_text(text, max_chars):
+                yield piece, index, index + 1
+            continue
+        if not buffer:
+            start = index
+        buffer.append(text)
+        size += len(text) + 1
+        end = index + 1
+    if buffer:
+        yield "\n".join(buffer), start, end
+
+
+def _frame_chunks(frames, max_chars):
+    row = 0
+    for df in frames:
+        if df.empty:
+            continue
+        df.index = range(row, row + len(df))
+        text = df.to_markdown()
+        if len(text) <= max_chars:
+            yield text, row, row + len(df)
+        else:
+            # Oversized batch: repeat the table header on every piece
+            lines = text.split("\n")
+            header = "\n".join(lines[:2])
+            lines = ((row + i, line) for i, line in enumerate(lines[2:]))
+            for piece, start, end in _pack(lines, max(max_chars - len(header) - 1, 1)):
+                yield header + "\n" + piece, start, end
+        row += len(df)
+
+
+def iter_txt_chunks(uploaded_file, max_chars=CHUNK_CHARS):
+    lines = ((i, line.decode("utf-8").rstrip("\r\n")) for i, line in enumerate(uploaded_file))
+    for text, start, end in _pack(lines, max_chars):
+        yield text, "line", start, end
+
+
+def iter_pdf_chunks(uploaded_file, max_chars=CHUNK_CHARS):
+    import PyPDF2
+
+    # PdfReader reads pages on demand from the file object
+    reader = PyPDF2.PdfReader(uploaded_file)
+    pages = ((i, page.extract_text() or "") for i, page in enumerate(reader.pages))
+    for text, start, end in _pack(pages, max_chars):
+        yield text, "page", start, end
+
+
+def iter_docx_chunks(uploaded_file, max_chars=CHUNK_CHARS):
+    import docx
+
+    doc = docx.Document(uploaded_file)
+    paragraphs = ((i, p.text) for i, p in enumerate(doc.paragraphs))
+    for text, start, end in _pack(paragraphs, max_chars):
+        yield text, "paragraph", start, end
+
+
+def iter_csv_chunks(uploaded_file, max_chars=CHUNK_CHARS, rows=ROWS_PER_CHUNK):
+    import pandas as pd
+
+    for text, start, end in _frame_chunks(pd.read_csv(uploaded_file, chunksize=rows), max_chars):
+        yield text, "row", start, end
+
+
+def iter_xlsx_frames(uploaded_file, rows):
+    """DataFrames of up to rows records from the active sheet of an .xlsx file, read in streaming mode"""
+    import openpyxl
+    import pandas as pd
+
+    wb = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
     try:
-        reader = PyPDF2.PdfReader(BytesIO(uploaded_file.read()))
-        text = "".join([p.extract_text() or "" for p in reader.pages])
-        return text
-    except Exception as e:
-        st.error("Failed to read PDF: " + str(e))
-        return ""
+        values = wb.active.iter_rows(values_only=True)
+        header = next(values, None)
+        if header is None:
+            return
+        columns = [str(c) if c is not None else f"Column {i + 1}" for i, c in enumerate(header)]
+        batch = []
+        for record in values:
+            # Pad or cut each record to the header width
+            batch.append((tuple(record) + (None,) * len(columns))[:len(columns)])
+            if len(batch) == rows:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        wb.close()
 
-def extract_text_from_docx(uploaded_file):
+
+def iter_xlsx_chunks(uploaded_file, max_chars=CHUNK_CHARS, rows=ROWS_PER_CHUNK):
+    if uploaded_file.type == "application/vnd.ms-excel":
+        import pandas as pd
+
+        # Legacy .xls has no streaming reader, so it is loaded in one go
+        df = pd.read_excel(uploaded_file)
+        frames = (df.iloc[i:i + rows] for i in range(0, len(df), rows))
+    else:
+        frames = iter_xlsx_frames(uploaded_file, rows)
+    for text, start, end in _frame_chunks(frames, max_chars):
+        yield text, "row", start, end
+
+
+def iter_file_chunks(uploaded_file, max_chars=CHUNK_CHARS, max_total_chars=MAX_EXTRACT_CHARS):
+    """
+    Lazily extract text from an uploaded file in chunks
+
+    Args:
+        uploaded_file: Streamlit UploadedFile or any binary file object with a ``type``
+        max_chars: Target maximum size of each chunk
+        max_total_chars: Ceiling on the total text extracted from the file
+
+    Yields:
+        TextChunk tuples in document order
+
+    Raises:
+        ValueError: If the file type is not supported
+        ExtractionLimitError: Once the next chunk would pass max_total_chars
+    """
+    # Not a generator itself, so unsupported types fail on the call
+    t = uploaded_file.type
+    if t == "text/plain":
+        chunks = iter_txt_chunks(uploaded_file, max_chars)
+    elif t == "application/pdf":
+        chunks = iter_pdf_chunks(uploaded_file, max_chars)
+    elif t == DOCX_TYPE:
+        chunks = iter_docx_chunks(uploaded_file, max_chars)
+    elif t == "text/csv":
+        chunks = iter_csv_chunks(uploaded_file, max_chars)
+    elif t in EXCEL_TYPES:
+        chunks = iter_xlsx_chunks(uploaded_file, max_chars)
+    else:
+        raise ValueError("Unsupported file type: " + t)
+
+    return _with_offsets(chunks, uploaded_file.name, max_total_chars)
+
+
+def _with_offsets(chunks, name, max_total_chars=MAX_EXTRACT_CHARS):
+    offset = 0
+    for text, kind, start, end in chunks:
+        if offset + len(text) > max_total_chars:
+            raise ExtractionLimitError(f"{name} has more than {max_total_chars:,} characters of text")
+        yield TextChunk(text, kind, start, end, offset)
+        offset += len(text) + 1
+
+
+def _join_chunks(uploaded_file, chunks, label):
+    parts = []
     try:
-        doc = docx.Document(BytesIO(uploaded_file.read()))
-        return "\n".join([p.text for p in doc.paragraphs])
+        for chunk in _with_offsets(chunks, uploaded_file.name):
+            parts.append(chunk.text)
+    except ExtractionLimitError as e:
+        report("warning", f"{e}; only the first part was read")
     except Exception as e:
-        st.error("Failed to read DOCX: " + str(e))
+        report("error", f"Failed to read {label}: " + str(e))
         return ""
+    return "\n".join(parts)
+
+
+def extract_text_from_txt(uploaded_file):
+    return _join_chunks(uploaded_file, iter_txt_chunks(uploaded_file), "TXT")
+
+def extract_text_from_pdf(uploaded_file):
+    return _join_chunks(uploaded_file, iter_pdf_chunks(uploaded_file), "PDF")
+
+def extract_text_from_docx(uploaded_file):
+    return _join_chunks(uploaded_file, iter_docx_chunks(uploaded_file), "DOCX")
 
 def extract_text_from_csv(uploaded_file):
-    df = pd.read_csv(uploaded_file)
-    return df.to_markdown()
+    return _join_chunks(uploaded_file, iter_csv_chunks(uploaded_file), "CSV")
 
 def extract_text_from_xlsx(uploaded_file):
-    df = pd.read_excel(uploaded_file)
-    return df.to_markdown()
+    return _join_chunks(uploaded_file, iter_xlsx_chunks(uploaded_file), "Excel file")
 
 def extract_text_from_file(uploaded_file):
     t = uploaded_file.type
@@ -39,11 +244,11 @@ def extract_text_from_file(uploaded_file):
         return extract_text_from_txt(uploaded_file)
     if t == "application/pdf":
         return extract_text_from_pdf(uploaded_file)
-    if t == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+    if t == DOCX_TYPE:
         return extract_text_from_docx(uploaded_file)
     if t == "text/csv":
         return extract_text_from_csv(uploaded_file)
-    if t in ("application/vnd.ms-excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"):
+    if t in EXCEL_TYPES:
         return extract_text_from_xlsx(uploaded_file)
-    st.error("Unsupported file type: " + t)
+    report("error", "Unsupported file type: " + t)
     return ""
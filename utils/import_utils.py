@@ -0,0 +1,157 @@
+import os
+import re
+from collections import namedtuple
+
+from utils.export_utils import EXPORT_COLUMNS
+from utils.file_utils import EXCEL_TYPES, iter_xlsx_frames
+from utils.store_utils import DEFAULT_PRIORITY, LIST_FIELDS, LIST_SEP, PRIORITY_CODES, TEXT_FIELDS
+
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "20000"))
+# Row errors kept for display; further errors are only counted
+MAX_REPORTED_ERRORS = 50
+
+# Header spellings accepted besides the ones the export writes, compared
+# case-insensitively with spaces, dashes and underscores removed
+COLUMN_ALIASES = {
+    "testcaseid": "id",
+    "submodule": "submodule",
+    "scenario": "title",
+    "testscenario": "title",
+    "steps": "test_steps",
+    "teststeps": "test_steps",
+    "expected": "expected_results",
+    "expectedresults": "expected_results",
+    "expectedresult": "expected_results",
+}
+for _header, _field in EXPORT_COLUMNS:
+    COLUMN_ALIASES.setdefault(re.sub(r"[\s_-]+", "", _header.lower()), _field)
+    COLUMN_ALIASES.setdefault(_field.replace("_", ""), _field)
+
+# Line breaks (plus surrounding blanks) become list separators. The export
+# writes one item per line and nothing else, so items are kept as they are:
+# "1. Open 2.5 settings" stays a step that starts with "1."
+LINE_BREAK_RE = r"\s*(?:\r?\n|\r)+\s*"
+
+# imported: ids of the new cases; skipped: invalid rows; renumbered: rows
+# whose id was missing or taken; errors: (row number, message) samples
+ImportResult = namedtuple("ImportResult", ["imported", "skipped", "renumbered", "errors", "defaulted_priorities"])
+
+
+def _column_map(columns):
+    mapping = {}
+    for column in columns:
+        field = COLUMN_ALIASES.get(re.sub(r"[\s_-]+", "", str(column).lower()))
+        if field and field not in mapping.values():
+            mapping[column] = field
+    return mapping
+
+
+def iter_import_frames(uploaded_file, rows=IMPORT_CHUNK_ROWS):
+    """
+    Read an exported test case file as DataFrames of up to rows rows
+
+    Supports the CSV, XLSX and NDJSON files written by the export.
+
+    Raises:
+        ValueError: If the file type is not supported
+    """
+    import pandas as pd
+
+    name = uploaded_file.name.lower()
+    if uploaded_file.type == "text/csv" or name.endswith(".csv"):
+        return pd.read_csv(uploaded_file, chunksize=rows, dtype=str, keep_default_na=False)
+    if name.endswith((".ndjson", ".jsonl")):
+        return pd.read_json(uploaded_file, lines=True, chunksize=rows, dtype=False)
+    if uploaded_file.type in EXCEL_TYPES or name.endswith((".xlsx", ".xls")):
+        if name.endswith(".xls"):
+            df = pd.read_excel(uploaded_file, dtype=str)
+            return (df.iloc[i:i + rows] for i in range(0, len(df), rows))
+        return iter_xlsx_frames(uploaded_file, rows)
+    raise ValueError("Unsupported import file: " + uploaded_file.name)
+
+
+def _text(series):
+    return series.fillna("").astype(str).str.strip()
+
+
+def _list_column(series):
+    """Normalize a column of newline-joined text or JSON arrays into LIST_SEP-joined strings"""
+    is_list = series.map(type) == list
+    column = _text(series.where(~is_list)).str.replace(LINE_BREAK_RE, LIST_SEP, regex=True)
+    if is_list.any():
+        # Array items are kept whole, line breaks inside them included
+        items = series[is_list].map(lambda values: LIST_SEP.join(s for s in (str(v).strip() for v in values) if s))
+        column = column.where(~is_list, items)
+    return column
+
+
+def normalize_frame(df):
+    """
+    Map a raw import chunk onto the store's columns with vectorized string ops
+
+    Returns:
+        (columns, priority codes, valid mask, defaulted priority mask) where
+        columns maps every TEXT_FIELDS/LIST_FIELDS field to a Series
+    """
+    import pandas as pd
+
+    df = df.rename(columns=_column_map(df.columns))
+    empty = pd.Series("", index=df.index, dtype=object)
+    columns = {}
+    for field in TEXT_FIELDS:
+        columns[field] = _text(df[field]) if field in df else empty
+    for field in LIST_FIELDS:
+        columns[field] = _list_column(df[field]) if field in df else empty
+
+    priority = _text(df["priority"]).str.lower() if "priority" in df else empty
+    codes = priority.map(PRIORITY_CODES)
+    defaulted = codes.isna() & (priority != "")
+    codes = codes.fillna(PRIORITY_CODES[DEFAULT_PRIORITY.lower()]).astype("int8")
+
+    valid = (columns["title"] != "") & (columns["test_steps"] != "")
+    return columns, codes, valid, defaulted
+
+
+def _row_errors(columns, valid, first_row):
+    errors = []
+    for row in valid.index[~valid]:
+        missing = [label for label, field in (("Title", "title"), ("Steps", "test_steps"))
+                   if not columns[field][row]]
+        errors.append((first_row + int(row), "missing " + " and ".join(missing)))
+    return errors
+
+
+def import_test_cases(uploaded_file, store, rows=IMPORT_CHUNK_ROWS):
+    """
+    Validate and bulk-load an exported test case file into a store
+
+    Rows without a title or steps are skipped and reported. Ids that are
+    missing or already in the library are replaced with new ones, and
+    unknown priorities become the default priority.
+
+    Args:
+        uploaded_file: Streamlit UploadedFile or binary file object with ``name`` and ``type``
+        store: TestCaseStore to append to
+        rows: Rows read and normalized per chunk
+
+    Returns:
+        ImportResult
+    """
+    imported, errors = [], []
+    skipped = renumbered = defaulted_count = 0
+    first_row = 2  # spreadsheet row of the first record, after the header
+    for df in iter_import_frames(uploaded_file, rows):
+        df = df.reset_index(drop=True)
+        columns, codes, valid, defaulted = normalize_frame(df)
+        if not valid.all():
+            skipped += int((~valid).sum())
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.extend(_row_errors(columns, valid, first_row)[:MAX_REPORTED_ERRORS - len(errors)])
+        defaulted_count += int((defaulted & valid).sum())
+
+        batch = {field: columns[field][valid].tolist() for field in TEXT_FIELDS + LIST_FIELDS}
+        ids = store.extend_columns(batch, codes[valid].tolist())
+        renumbered += sum(1 for given, tc_id in zip(batch["id"], ids) if given != tc_id)
+        imported.extend(ids)
+        first_row += len(df)
+    return ImportResult(imported, skipped, renumbered, errors, defaulted_count)
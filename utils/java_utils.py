@@ -0,0 +1,185 @@
+import re
+from collections import namedtuple
+
+try:
+    import javalang
+except ImportError:  # the structural checker below still catches the common breakages
+    javalang = None
+
+# Issues reported per file; later ones are usually knock-on errors
+MAX_ISSUES = 5
+
+# line and column are 1-based; column may be 0 when unknown
+JavaIssue = namedtuple("JavaIssue", ["line", "column", "message"])
+
+TYPE_DECL_RE = re.compile(r"\b(?:class|interface|enum|record)\s+\w+")
+PUBLIC_TYPE_RE = re.compile(r"\bpublic\s+(?:(?:abstract|final|sealed|strictfp)\s+)*(?:class|interface|enum|record)\s+(\w+)")
+CLOSERS = {")": "(", "]": "[", "}": "{"}
+# Runs of plain code are skipped in one step; comments and literals are
+# matched whole so brackets inside them are ignored; an opening delimiter
+# that matches none of them is unterminated
+STRUCTURE_TOKEN_RE = re.compile(
+    r'[^/"\'()\[\]{}]+|/(?![/*])|//[^\n]*|/\*.*?\*/|"""(?:\\.|[^\\])*?"""'
+    r'|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\''
+    r'|(?P<open>[(\[{])|(?P<close>[)\]}])|(?P<unterminated>/\*|"""|"|\')',
+    re.DOTALL,
+)
+
+
+def _position(source, index):
+    line = source.count("\n", 0, index) + 1
+    return line, index - (source.rfind("\n", 0, index) + 1) + 1
+
+
+def _structure_issues(source):
+    """Unbalanced brackets and unterminated strings or comments, found in one regex scan"""
+    issues, stack = [], []
+    skip_to = 0
+    for m in STRUCTURE_TOKEN_RE.finditer(source):
+        if m.start() < skip_to:
+            continue
+        kind = m.lastgroup
+        if kind == "open":
+            stack.append(m.start())
+        elif kind == "close":
+            ch = m.group()
+            if stack and source[stack[-1]] == CLOSERS[ch]:
+                stack.pop()
+            else:
+                issues.append(JavaIssue(*_position(source, m.start()), f"unexpected '{ch}'"))
+        elif kind == "unterminated":
+            token = m.group()
+            message = {"/*": "unterminated comment", '"""': "unterminated text block",
+                       '"': "unterminated string literal", "'": "unterminated character literal"}[token]
+            issues.append(JavaIssue(*_position(source, m.start()), message))
+            if token in ("/*", '"""'):
+                break
+            # The rest of the line is part of the broken literal
+            skip_to = source.find("\n", m.start())
+            if skip_to < 0:
+                break
+        if len(issues) >= MAX_ISSUES:
+            break
+    for index in stack[:MAX_ISSUES - len(issues)]:
+        issues.append(JavaIssue(*_position(source, index), f"'{source[index]}' is never closed"))
+    return issues
+
+
+def _javalang_issues(source):
+    try:
+        tree = javalang.parse.parse(source)
+    except javalang.tokenizer.LexerError as e:
+        return [JavaIssue(0, 0, f"lexer error: {e}")], None
+    except javalang.parser.JavaSyntaxError as e:
+        position = getattr(e.at, "position", None)
+        if position is None:
+            return [JavaIssue(*_position(source, len(source)), e.description or "unexpected end of file")], None
+        line = getattr(position, "line", position[0])
+        column = getattr(position, "column", position[1])
+        return [JavaIssue(line, column, f"{e.description} near '{e.at.value}'")], None
+    return [], tree
+
+
+def check_java(path, source):
+    """
+    Find syntax errors in one Java file without a JDK
+
+    Uses javalang's parser when it is installed. Otherwise a structural scan
+    reports unbalanced brackets and unterminated literals or comments, which
+    covers the usual damage in generated code (truncated output, stray
+    fences), though not every grammar error.
+
+    Args:
+        path: File path, used to check the public class name
+        source: File contents
+
+    Returns:
+        List of JavaIssue, empty when the file looks valid
+    """
+    if javalang is not None:
+        issues, tree = _javalang_issues(source)
+        public_types = [t.name for t in tree.types if "public" in t.modifiers] if tree else []
+    else:
+        issues = _structure_issues(source)
+        public_types = PUBLIC_TYPE_RE.findall(source) if not issues else []
+    if not issues and not TYPE_DECL_RE.search(source):
+        issues.append(JavaIssue(1, 0, "no class, interface or enum declaration"))
+    stem = path.rsplit("/", 1)[-1][:-len(".java")]
+    for name in public_types[:1]:
+        if name != stem:
+            m = re.search(r"\b" + name + r"\b", source)
+            line = _position(source, m.start())[0] if m else 0
+            issues.append(JavaIssue(line, 0, f"class {name} is public, should be declared in a file named {name}.java"))
+    return issues[:MAX_ISSUES]
+
+
+def validate_files(files):
+    """
+    Check every .java file of a generated file set
+
+    Returns:
+        {path: [JavaIssue, ...]} for the files with problems
+    """
+    problems = {}
+    for path, content in files.items():
+        if path.endswith(".java"):
+            issues = check_java(path, content)
+            if issues:
+                problems[path] = issues
+    return problems
+
+
+def format_issues(issues):
+    return "\n".join(
+        f"- line {issue.line}" + (f", column {issue.column}" if issue.column else "") + f": {issue.message}"
+        for issue in issues
+    )
+
+
+class ValidationReport:
+    """
+    Outcome of validating (and repairing) generated code
+
+    Attributes:
+        checked: Java files checked
+        first_pass_ok: Files that were valid as generated
+        repaired: Files fixed by a targeted repair request
+        broken: {path: [JavaIssue]} still failing after the repair rounds
+        repair_requests: Repair requests sent
+        repair_tokens: Estimated prompt and output tokens of those requests
+        saved_tokens: Estimated output tokens a full regeneration of the
+            broken outputs would have produced, minus the repairs' output tokens
+    """
+
+    def __init__(self):
+        self.checked = 0
+        self.first_pass_ok = 0
+        self.repaired = 0
+        self.broken = {}
+        self.repair_requests = 0
+        self.repair_tokens = 0
+        self.saved_tokens = 0
+
+    @property
+    def first_pass_rate(self):
+        return self.first_pass_ok / self.checked if self.checked else 1.0
+
+    def merge(self, other):
+        self.checked += other.checked
+        self.first_pass_ok += other.first_pass_ok
+        self.repaired += other.repaired
+        self.broken.update(other.broken)
+        self.repair_requests += other.repair_requests
+        self.repair_tokens += other.repair_tokens
+        self.saved_tokens += other.saved_tokens
+        return self
+
+    def as_dict(self):
+        return dict(vars(self), broken={path: [list(issue) for issue in issues] for path, issues in self.broken.items()})
+
+    @classmethod
+    def from_dict(cls, values):
+        report = cls()
+        vars(report).update(values)
+        report.broken = {path: [JavaIssue(*issue) for issue in issues] for path, issues in values.get("broken", {}).items()}
+        return report
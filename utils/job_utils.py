@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from utils import db_utils
+from utils.report_utils import reporting_to
+
+# Generation jobs run at once per server process; each one still spreads
+# its own model calls over AI_MAX_CONCURRENCY threads
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Finished jobs kept (with their results) in memory and listed in the sidebar
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "20"))
+# How long finished jobs are kept in the database
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's function when the job is cancelled"""
+
+
+class Job:
+    """
+    One generation running on a JobManager's worker pool
+
+    The job's function publishes results (JSON-compatible values) as they
+    complete. Sessions pick up the ones not applied yet with
+    JobManager.take(), so results reach the library while the job is still
+    running and a rerun, page switch or reload does not lose them.
+
+    Attributes:
+        id: Short unique id
+        kind: What the job generates, e.g. "test_cases" or "automation"
+        label: Description shown in the UI
+        owner: Workspace that submitted the job (see db_utils.get_owner()), if any
+        status: One of queued, running, succeeded, failed, cancelled
+        done, total: Progress counters; total may be None when unknown
+        message: Current step, for display
+        items: Published results, in order
+        applied: Number of items already taken
+        messages: (level, text) pairs reported while running
+        result: Return value of the job's function
+        error: Error text of a failed job
+    """
+
+    def __init__(self, kind, label="", total=None, owner=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.label = label
+        self.owner = owner
+        self.status = QUEUED
+        self.done = 0
+        self.total = total
+        self.message = ""
+        self.items = []
+        self.applied = 0
+        self.messages = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.status not in FINISHED
+
+    @property
+    def progress(self):
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def pending(self):
+        """Items published but not taken yet"""
+        return len(self.items) - self.applied
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled once cancel() was called; job functions call this between steps"""
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def publish(self, item):
+        with self._lock:
+            self.items.append(item)
+
+    def set_progress(self, done, total=None, message=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+
+    def log(self, level, message):
+        self.messages.append((level, message))
+
+    def to_record(self):
+        keys = ["id", "kind", "label", "owner", "status", "done", "total", "message", "items", "applied",
+                "messages", "result", "error", "created", "started", "finished"]
+        return {key: getattr(self, key) for key in keys}
+
+    @classmethod
+    def from_record(cls, record):
+        job = cls(record["kind"])
+        for key, value in record.items():
+            setattr(job, key, value)
+        job.messages = [tuple(message) for message in job.messages]
+        return job
+
+
+class JobManager:
+    """
+    Process-local queue of background generation jobs
+
+    Jobs run on a small thread pool, outside any Streamlit script run, so
+    they keep going across reruns and page switches. Messages the utils
+    report while a job runs are collected on the job. Finished jobs are
+    saved to the LibraryDB, when there is one, and reloaded after a restart.
+
+    Args:
+        max_workers: Jobs running at once
+        db: Optional LibraryDB to persist finished jobs to
+        history: Finished jobs kept in memory
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, db=None, history=JOB_HISTORY):
+        self.db = db
+        self.history = history
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        if db is not None:
+            db.delete_jobs(time.time() - JOB_RETENTION_HOURS * 3600)
+            for record in reversed(db.load_jobs(history)):
+                job = Job.from_record(record)
+                self._jobs[job.id] = job
+
+    def submit(self, kind, fn, *args, label="", total=None, owner=None, **kwargs):
+        """
+        Queue fn(job, *args, **kwargs) to run in the background
+
+        fn publishes results with job.publish(), reports progress with
+        job.set_progress() and should call job.check_cancelled() between
+        steps. Its return value becomes job.result.
+
+        Returns:
+            The queued Job
+        """
+        job = Job(kind, label, total, owner)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job.started = time.time()
+        try:
+            job.check_cancelled()
+            job.status = RUNNING
+            with reporting_to(job.log):
+                job.result = fn(job, *args, **kwargs)
+            status = CANCELLED if job.cancelled else SUCCEEDED
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            status = FAILED
+        job.finished = time.time()
+        # Saved before the job shows as finished, so take() never records an
+        # applied count that this save would then overwrite
+        with job._lock:
+            if self.db is not None:
+                try:
+                    self.db.save_job(dict(job.to_record(), status=status))
+                except Exception as e:
+                    job.log("warning", f"⚠️ Job results could not be saved: {e}")
+            job.status = status
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if not job.running]
+            for job_id in finished[:max(0, len(finished) - self.history)]:
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self, limit=None, ids=(), owner=None):
+        """
+        Known jobs, newest first
+
+        Args:
+            limit: Most jobs returned
+            ids, owner: When given, only the jobs with one of these ids or
+                submitted by this workspace
+        """
+        with self._lock:
+            jobs = list(reversed(self._jobs.values()))
+        if ids or owner:
+            jobs = [job for job in jobs if job.id in ids or (owner and job.owner == owner)]
+        return jobs[:limit] if limit else jobs
+
+    def take(self, job):
+        """
+        Items job published since the last take(), each handed out once
+
+        Returns:
+            List of items, possibly empty
+        """
+        with job._lock:
+            items = job.items[job.applied:]
+            job.applied = len(job.items)
+            if items and not job.running and self.db is not None:
+                self.db.set_job_applied(job.id, job.applied)
+        return items
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+
+def submit_session_job(kind, fn, *args, **kwargs):
+    """
+    JobManager.submit() for this session: the job belongs to its workspace
+    and its id is kept in st.session_state.submitted_jobs
+
+    Returns:
+        The queued Job
+    """
+    job = get_job_manager().submit(kind, fn, *args, owner=db_utils.get_owner(), **kwargs)
+    st.session_state.setdefault("submitted_jobs", []).append(job.id)
+    return job
+
+
+def session_jobs(limit=None):
+    """The jobs this session submitted and, e.g. after a reload, the others of its workspace"""
+    return get_job_manager().jobs(limit, ids=set(st.session_state.get("submitted_jobs", ())),
+                                  owner=db_utils.get_owner())
+
+
+@st.cache_resource
+def get_job_manager():
+    """JobManager shared by every session of the server process"""
+    return JobManager(db=db_utils.get_library_db())
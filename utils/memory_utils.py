@@ -0,0 +1,403 @@
+import atexit
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from array import array
+from collections import deque, namedtuple
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils.report_utils import report
+
+# Memory one browser session may hold in session_state; 0 disables the limit
+SESSION_MEMORY_LIMIT_MB = float(os.getenv("SESSION_MEMORY_LIMIT_MB", "512"))
+# Generated code of one test case (or suite) bigger than this is kept on disk
+SPILL_THRESHOLD_KB = float(os.getenv("SPILL_THRESHOLD_KB", "16"))
+# Parent of the spill directories (default: the system temp directory); each
+# server process writes to its own subdirectory and removes it on exit
+SPILL_DIR = os.getenv("SPILL_DIR") or None
+# A session's memory is measured at most this often, except when it asks for more
+MEMORY_CHECK_SECONDS = float(os.getenv("MEMORY_CHECK_SECONDS", "10"))
+# Session caches rebuilt on demand, dropped first when a session is over its limit
+EVICTABLE_KEYS = ("tc_index",)
+
+# Values counted by sys.getsizeof alone
+ATOMIC_TYPES = {str, bytes, bytearray, array, int, float, bool, complex, type(None)}
+SEQUENCE_TYPES = (list, tuple, set, frozenset, deque)
+# Objects of these modules are followed into their attributes; anything else
+# (Streamlit, SQLite, FAISS, models) counts as its own sys.getsizeof
+APP_MODULES = ("utils.", "pages.")
+
+# keys maps each session_state key to its bytes, largest first; spilled is
+# the size of the session's generated code kept on disk
+SessionUsage = namedtuple("SessionUsage", ["session_id", "total", "keys", "spilled", "measured"])
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    Approximate bytes held by obj and everything it references
+
+    Builtin containers and the app's own objects are followed; third-party
+    objects count as sys.getsizeof, which includes e.g. an uploaded file's
+    buffer, and classes can report memory Python cannot see by overriding
+    __sizeof__. Every object is counted once per seen set.
+
+    Args:
+        obj: Object to measure
+        seen: Set of ids already counted; pass the same set when measuring
+            several values that share objects, or pre-fill it to exclude some
+
+    Returns:
+        Size in bytes
+    """
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj, 0)
+        if type(obj) in ATOMIC_TYPES:
+            continue
+        if isinstance(obj, dict):
+            items = list(obj.keys()) + list(obj.values())
+        elif isinstance(obj, SEQUENCE_TYPES):
+            items = obj
+        elif type(obj).__module__.startswith(APP_MODULES):
+            items = [getattr(obj, "__dict__", None)]
+            items.extend(getattr(obj, slot, None) for slot in getattr(type(obj), "__slots__", ()))
+        else:
+            continue
+        # Strings dominate the library and generated code: a collection of
+        # nothing else is counted with set and map operations instead of a loop
+        types = set(map(type, items))
+        if types <= ATOMIC_TYPES:
+            unique = dict(zip(map(id, items), items))
+            new = unique.keys() - seen
+            seen.update(new)
+            # str.__sizeof__ skips getsizeof's per-call overhead; strings have no GC header
+            sizeof = str.__sizeof__ if types == {str} else sys.getsizeof
+            size += sum(map(sizeof, unique.values() if len(new) == len(unique) else map(unique.__getitem__, new)))
+            continue
+        for item in items:
+            if type(item) in ATOMIC_TYPES:
+                if id(item) not in seen:
+                    seen.add(id(item))
+                    size += sys.getsizeof(item)
+            elif item is not None:
+                stack.append(item)
+    return size
+
+
+class SpillStore:
+    """
+    Disk store for large session values of one server process
+
+    Values are written once under their sha256 digest, so identical files
+    (e.g. the same page object generated for several test cases) are stored
+    a single time. Each digest is reference-counted and deleted when the
+    last value using it is garbage collected, e.g. when its session ends.
+
+    Args:
+        root: Parent directory of the process's spill directory
+    """
+
+    def __init__(self, root=SPILL_DIR):
+        if root:
+            Path(root).mkdir(parents=True, exist_ok=True)
+        self.root = Path(tempfile.mkdtemp(prefix="qe-spill-", dir=root))
+        atexit.register(shutil.rmtree, self.root, True)
+        self._counts = {}
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def put(self, text):
+        """Store text and return its digest; release() it when no longer needed"""
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest not in self._counts:
+                tmp = self.root / (digest + ".tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, self.root / digest)
+                self._counts[digest] = 0
+                self._sizes[digest] = len(data)
+            self._counts[digest] += 1
+        return digest
+
+    def read(self, digest):
+        return (self.root / digest).read_bytes().decode("utf-8")
+
+    def release(self, digests):
+        with self._lock:
+            for digest in digests:
+                self._counts[digest] -= 1
+                if not self._counts[digest]:
+                    del self._counts[digest], self._sizes[digest]
+                    (self.root / digest).unlink(missing_ok=True)
+
+    def stats(self):
+        with self._lock:
+            return {"files": len(self._sizes), "bytes": sum(self._sizes.values())}
+
+
+class SpilledFiles(Mapping):
+    """
+    Read-only {file name: content} map whose contents live in a SpillStore
+
+    Only names and digests stay in memory; every lookup reads the file back.
+    """
+
+    def __init__(self, files, store):
+        self._store = store
+        self._digests = {name: store.put(content) for name, content in files.items()}
+        # Characters of content kept on disk
+        self.size = sum(len(content) for content in files.values())
+        weakref.finalize(self, store.release, list(self._digests.values()))
+
+    def __getitem__(self, name):
+        return self._store.read(self._digests[name])
+
+    def __iter__(self):
+        return iter(self._digests)
+
+    def __len__(self):
+        return len(self._digests)
+
+    def __repr__(self):
+        return f"SpilledFiles({list(self._digests)})"
+
+
+def spill_files(files):
+    """files, or a SpilledFiles copy of them when they add up to more than SPILL_THRESHOLD_KB"""
+    if isinstance(files, SpilledFiles) or sum(len(c) for c in files.values()) <= SPILL_THRESHOLD_KB * 1024:
+        return files
+    return SpilledFiles(files, get_spill_store())
+
+
+class SpillingDict(dict):
+    """
+    Generated code or document text ({key: {file name: content}}) with its
+    large entries on disk
+
+    Every entry is stored through spill_files(), including those passed to
+    the constructor and update(), which dict would store as they are.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, key, files):
+        super().__setitem__(key, spill_files(files))
+
+    def update(self, *args, **kwargs):
+        for key, files in dict(*args, **kwargs).items():
+            SpillingDict.__setitem__(self, key, files)
+
+    def spilled_bytes(self):
+        return sum(files.size for files in self.values() if isinstance(files, SpilledFiles))
+
+
+def process_rss():
+    """Resident memory of the server process in bytes, or None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _shared_resources():
+    """Process-wide objects sessions refer to, which are not charged to any session"""
+    from utils import blob_utils, db_utils, job_utils, package_utils
+
+    return [get_spill_store(), get_memory_monitor(), db_utils.get_library_db(), blob_utils.get_attachment_store(),
+            job_utils.get_job_manager(), package_utils.get_packager()]
+
+
+def _measure(session_id, values):
+    """SessionUsage of a session's (key, value) pairs, counting shared objects under the first key"""
+    seen = {id(resource) for resource in _shared_resources()}
+    sizes, spilled = {}, 0
+    for key, value in values:
+        sizes[key] = deep_sizeof(value, seen)
+        if isinstance(value, SpillingDict):
+            spilled += value.spilled_bytes()
+    return SessionUsage(session_id, sum(sizes.values()), dict(sorted(sizes.items(), key=lambda kv: kv[1], reverse=True)),
+                        spilled, time.time())
+
+
+class MemoryMonitor:
+    """
+    Latest memory measurement of every session of the server process
+
+    Sessions measure their own session_state (measure_session) and record
+    it here, so any session can show the server-wide summary. Routine
+    measurements run on one background thread, off the script run; sessions
+    that ended are dropped.
+    """
+
+    def __init__(self):
+        self._usage = {}
+        self._summary = None
+        self._pending = set()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory")
+        self._lock = threading.Lock()
+
+    def record(self, usage):
+        with self._lock:
+            self._usage[usage.session_id] = usage
+
+    def get(self, session_id):
+        return self._usage.get(session_id)
+
+    def measure_later(self, session_id, values):
+        """Measure a session's (key, value) pairs in the background, unless that is already queued"""
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+        self._pool.submit(self._measure, session_id, values)
+
+    def _measure(self, session_id, values):
+        try:
+            self.record(_measure(session_id, values))
+        except RuntimeError:
+            # A container changed size under the walk; the next measurement catches up
+            pass
+        finally:
+            with self._lock:
+                self._pending.discard(session_id)
+
+    def sessions(self):
+        """Usage of the live sessions, largest first"""
+        with self._lock:
+            if st.runtime.exists():
+                runtime = st.runtime.get_instance()
+                for session_id in [s for s in self._usage if not runtime.is_active_session(s)]:
+                    del self._usage[session_id]
+            usage = list(self._usage.values())
+        return sorted(usage, key=lambda u: u.total, reverse=True)
+
+    def summary(self, top=3):
+        """
+        Server-wide memory summary, recomputed at most every MEMORY_CHECK_SECONDS
+
+        Returns:
+            Dict of sessions, total (session_state bytes of all sessions),
+            over_limit (sessions over the limit), largest ([SessionUsage]),
+            spill_files, spill_bytes, job_bytes (results held by background
+            jobs) and rss (process resident memory, or None)
+        """
+        if self._summary and time.time() - self._summary["measured"] < MEMORY_CHECK_SECONDS:
+            return self._summary
+        from utils.job_utils import get_job_manager
+
+        sessions = self.sessions()
+        limit = SESSION_MEMORY_LIMIT_MB * 1024 * 1024
+        spill = get_spill_store().stats()
+        self._summary = {
+            "sessions": len(sessions),
+            "total": sum(u.total for u in sessions),
+            "over_limit": sum(1 for u in sessions if limit and u.total > limit),
+            "largest": sessions[:top],
+            "spill_files": spill["files"],
+            "spill_bytes": spill["bytes"],
+            "job_bytes": deep_sizeof([job.items for job in get_job_manager().jobs()]),
+            "rss": process_rss(),
+            "measured": time.time(),
+        }
+        return self._summary
+
+
+@st.cache_resource
+def get_spill_store():
+    """SpillStore shared by every session of the server process"""
+    return SpillStore()
+
+
+@st.cache_resource
+def get_memory_monitor():
+    return MemoryMonitor()
+
+
+def _session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
+
+def measure_session(force=False):
+    """
+    Measure this session's session_state, key by key
+
+    Process-wide resources the session refers to are left out, and an
+    object shared by several keys is counted under the first one (the
+    library first, as other keys mostly hold copies of its cases). Walking
+    a large library takes a while, so unless forced the measurement runs in
+    the background and the previous one is returned.
+
+    Args:
+        force: Measure now, even if the last measurement is recent
+
+    Returns:
+        SessionUsage, also recorded in the MemoryMonitor; None before the
+        first background measurement finished
+    """
+    monitor = get_memory_monitor()
+    session_id = _session_id()
+    usage = monitor.get(session_id)
+    if usage and not force and time.time() - usage.measured < MEMORY_CHECK_SECONDS:
+        return usage
+    keys = sorted(st.session_state.keys(), key=lambda k: (k != "test_cases", str(k)))
+    values = [(str(key), st.session_state[key]) for key in keys]
+    if not force:
+        monitor.measure_later(session_id, values)
+        return usage
+    usage = _measure(session_id, values)
+    monitor.record(usage)
+    return usage
+
+
+def over_limit(usage):
+    return usage is not None and bool(SESSION_MEMORY_LIMIT_MB) and usage.total > SESSION_MEMORY_LIMIT_MB * 1024 * 1024
+
+
+def enforce_limit(usage):
+    """
+    Drop this session's rebuildable caches (EVICTABLE_KEYS) when it is over its limit
+
+    Returns:
+        The session's usage (possibly None), measured again if anything was dropped
+    """
+    if not over_limit(usage):
+        return usage
+    evicted = [key for key in EVICTABLE_KEYS if st.session_state.pop(key, None) is not None]
+    return measure_session(force=True) if evicted else usage
+
+
+def check_limit():
+    """
+    Whether this session may take on more data
+
+    Measured afresh, so deleting test cases or generated code lifts the
+    block straight away. Reports an error when the session is over its limit.
+    """
+    usage = enforce_limit(measure_session(force=True))
+    if not over_limit(usage):
+        return True
+    largest = ", ".join(f"{key} {size / 2 ** 20:.1f} MB" for key, size in list(usage.keys.items())[:3])
+    report("error", f"⚠️ This session holds {usage.total / 2 ** 20:.1f} MB, over its {SESSION_MEMORY_LIMIT_MB:.0f} MB "
+                    f"memory limit (largest: {largest}). Delete test cases or generated code to continue.")
+    return False
@@ -0,0 +1,342 @@
+import atexit
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from utils.report_utils import logger
+
+# What a model call generates; every call is counted under one of these
+CALL_TYPES = ("test_cases", "automation", "combined", "framework", "repair")
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+# USD per million tokens, for the estimated cost (defaults: gemini-2.0-flash)
+PRICE_INPUT_PER_M = float(os.getenv("AI_PRICE_INPUT_PER_M", "0.10"))
+PRICE_OUTPUT_PER_M = float(os.getenv("AI_PRICE_OUTPUT_PER_M", "0.40"))
+# Prometheus text format: a file rewritten every METRICS_INTERVAL seconds
+# (e.g. for node_exporter's textfile collector) and/or an HTTP endpoint
+# serving /metrics on METRICS_PORT. Neither is started when unset.
+METRICS_FILE = os.getenv("METRICS_FILE") or None
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "15"))
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram, plus the latest values for exact percentiles
+
+    Not thread-safe on its own; GenerationMetrics guards it with its lock.
+
+    Args:
+        buckets: Sorted upper bounds of the buckets; values above the last
+            one count in +Inf only
+        recent: Latest values kept (see GenerationMetrics.summary)
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, recent=500):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=recent)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def cumulative(self):
+        """(le label, count) pairs as Prometheus exposes them"""
+        total = 0
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            total += count
+            yield bound, total
+
+
+class GenerationMetrics:
+    """
+    Thread-safe counters and latency histograms of one process's model calls
+
+    Each call is recorded once, when it is done, under its call type (see
+    CALL_TYPES) and scheduler lane. A call's latency covers waiting for the
+    scheduler and any retries, which is what the user waits for. Token
+    counts are the model's own where the response reports them and
+    estimates otherwise; cached responses cost no tokens.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._calls = {}        # (type, lane, outcome) -> calls; outcome as in record_call
+        self._latency = {}      # (type, lane) -> Histogram of calls sent to the model
+        self._first_chunk = {}  # type -> Histogram of streamed calls' time to first text
+        self._tokens = {}       # (type, prompt|response) -> tokens
+        self._retries = {}      # type -> retried attempts
+        self._parses = {}       # (type, outcome) -> responses; outcome is ok, partial or failed
+        self._dropped = {}      # type -> malformed entries skipped while parsing
+        self._collectors = []
+
+    def record_call(self, call_type, lane, seconds, outcome, prompt_tokens=0, response_tokens=0,
+                    retries=0, first_chunk=None):
+        """
+        Record one finished model call
+
+        Args:
+            call_type: One of CALL_TYPES
+            lane: Scheduler lane the call was sent in
+            seconds: Time from the call to its response (or error)
+            outcome: "success", "error", "cached" or "cancelled" (a stream
+                the caller stopped reading)
+            prompt_tokens: Tokens sent (0 for a cached call)
+            response_tokens: Tokens received (0 for a cached call)
+            retries: Attempts made after the first
+            first_chunk: Seconds to the first streamed text, for streamed calls
+        """
+        with self._lock:
+            key = (call_type, lane, outcome)
+            self._calls[key] = self._calls.get(key, 0) + 1
+            if outcome != "cached":
+                self._latency.setdefault((call_type, lane), Histogram()).observe(seconds)
+            if first_chunk is not None:
+                self._first_chunk.setdefault(call_type, Histogram()).observe(first_chunk)
+            for direction, tokens in (("prompt", prompt_tokens), ("response", response_tokens)):
+                self._tokens[call_type, direction] = self._tokens.get((call_type, direction), 0) + tokens
+            self._retries[call_type] = self._retries.get(call_type, 0) + retries
+
+    def record_parse(self, call_type, cases, dropped=0):
+        """
+        Record how a response parsed
+
+        Args:
+            call_type: One of CALL_TYPES
+            cases: Test cases or files read from the response, or their count
+            dropped: Malformed or truncated entries skipped
+        """
+        outcome = "failed" if not cases else "partial" if dropped else "ok"
+        with self._lock:
+            self._parses[call_type, outcome] = self._parses.get((call_type, outcome), 0) + 1
+            self._dropped[call_type] = self._dropped.get(call_type, 0) + dropped
+
+    def add_collector(self, collect):
+        """
+        Export more metrics with every render
+
+        collect() returns (name, type, help, [(labels dict, value), ...])
+        tuples; ai_utils adds the response cache and scheduler this way.
+        """
+        self._collectors.append(collect)
+
+    def summary(self):
+        """
+        Totals per call type for display, plus "all"
+
+        Returns:
+            {call type: {calls, cached, errors, retries, prompt_tokens,
+            response_tokens, cost, parsed, parse_ok, p50, p95}}; p50 and p95
+            are None before the type's first model call
+        """
+        with self._lock:
+            rows = {}
+            for (call_type, _lane, outcome), count in self._calls.items():
+                row = rows.setdefault(call_type, _empty_row())
+                row["calls"] += count
+                row["cached"] += count if outcome == "cached" else 0
+                row["errors"] += count if outcome == "error" else 0
+            for (call_type, direction), tokens in self._tokens.items():
+                rows.setdefault(call_type, _empty_row())[direction + "_tokens"] += tokens
+            for call_type, retries in self._retries.items():
+                rows.setdefault(call_type, _empty_row())["retries"] += retries
+            for (call_type, outcome), count in self._parses.items():
+                row = rows.setdefault(call_type, _empty_row())
+                row["parsed"] += count
+                row["parse_ok"] += count if outcome == "ok" else 0
+            latencies = {}
+            for (call_type, _lane), histogram in self._latency.items():
+                latencies.setdefault(call_type, []).extend(histogram.recent)
+                latencies.setdefault("all", []).extend(histogram.recent)
+        total = _empty_row()
+        for row in rows.values():
+            for field in total:
+                total[field] += row[field]
+        rows["all"] = total
+        for call_type, row in rows.items():
+            row["cost"] = estimate_cost(row["prompt_tokens"], row["response_tokens"])
+            values = sorted(latencies.get(call_type, ()))
+            row["p50"] = values[len(values) // 2] if values else None
+            row["p95"] = values[min(len(values) - 1, int(0.95 * len(values)))] if values else None
+        return rows
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            calls = [({"type": t, "lane": lane, "outcome": o}, v) for (t, lane, o), v in sorted(self._calls.items())]
+            tokens = [({"type": t, "direction": d}, v) for (t, d), v in sorted(self._tokens.items())]
+            cost = {t: estimate_cost(self._tokens.get((t, "prompt"), 0), self._tokens.get((t, "response"), 0))
+                    for t, _direction in self._tokens}
+            retries = [({"type": t}, v) for t, v in sorted(self._retries.items())]
+            parses = [({"type": t, "outcome": o}, v) for (t, o), v in sorted(self._parses.items())]
+            dropped = [({"type": t}, v) for t, v in sorted(self._dropped.items())]
+            latency = [({"type": t, "lane": lane}, _copy(h)) for (t, lane), h in sorted(self._latency.items())]
+            first_chunk = [({"type": t}, _copy(h)) for t, h in sorted(self._first_chunk.items())]
+        families = [
+            ("qe_ai_calls_total", "counter", "Model calls by call type, lane and outcome", calls),
+            ("qe_ai_tokens_total", "counter", "Prompt and response tokens of model calls", tokens),
+            ("qe_ai_cost_usd_total", "counter", "Estimated cost of model calls in USD",
+             [({"type": t}, v) for t, v in sorted(cost.items())]),
+            ("qe_ai_retries_total", "counter", "Model call attempts retried after an error", retries),
+            ("qe_ai_parse_total", "counter", "Responses parsed, by outcome (ok, partial, failed)", parses),
+            ("qe_ai_parse_dropped_total", "counter", "Malformed or truncated entries skipped while parsing", dropped),
+        ]
+        for collect in self._collectors:
+            families.extend(collect())
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples]
+        for name, help_text, histograms in (
+            ("qe_ai_call_seconds", "Latency of model calls, including scheduling and retries", latency),
+            ("qe_ai_first_chunk_seconds", "Time to the first text of streamed model calls", first_chunk),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for labels, histogram in histograms:
+                for bound, count in histogram.cumulative():
+                    lines.append(f"{name}_bucket{_labels(dict(labels, le=bound))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(histogram.sum)}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        lines.append("# HELP qe_ai_metrics_start_time_seconds When this process started collecting metrics")
+        lines.append("# TYPE qe_ai_metrics_start_time_seconds gauge")
+        lines.append(f"qe_ai_metrics_start_time_seconds {_number(self.started)}")
+        return "\n".join(lines) + "\n"
+
+
+def _empty_row():
+    return {"calls": 0, "cached": 0, "errors": 0, "retries": 0, "prompt_tokens": 0, "response_tokens": 0,
+            "parsed": 0, "parse_ok": 0}
+
+
+def _copy(histogram):
+    copy = Histogram(histogram.buckets, recent=0)
+    copy.counts, copy.sum, copy.count = list(histogram.counts), histogram.sum, histogram.count
+    return copy
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escape = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def estimate_cost(prompt_tokens, response_tokens):
+    """USD the tokens cost at AI_PRICE_INPUT_PER_M / AI_PRICE_OUTPUT_PER_M"""
+    return (prompt_tokens * PRICE_INPUT_PER_M + response_tokens * PRICE_OUTPUT_PER_M) / 1e6
+
+
+# Every model call of the process is recorded here, in the app and in batch.py
+METRICS = GenerationMetrics()
+
+
+def write_metrics_file(path, metrics=METRICS):
+    """Write metrics.render() to path atomically, so a scraper never reads half a file"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    tmp.write_text(metrics.render(), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class MetricsExporter:
+    """
+    Publishes metrics in the Prometheus text format from background threads
+
+    Args:
+        metrics: GenerationMetrics to publish
+        path: File rewritten every interval seconds and at exit, or None
+        port: Port of an HTTP server answering GET /metrics, or 0 for none
+        interval: Seconds between file writes
+    """
+
+    def __init__(self, metrics=METRICS, path=None, port=0, interval=METRICS_INTERVAL):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.server = None
+        self._stop = threading.Event()
+        if port:
+            # Bound first, so a port in use raises before any thread starts
+            self.server = ThreadingHTTPServer(("", port), self._handler())
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        if path:
+            threading.Thread(target=self._write_loop, name="metrics-file", daemon=True).start()
+            atexit.register(self.write)
+
+    def write(self):
+        try:
+            write_metrics_file(self.path, self.metrics)
+        except OSError as e:
+            logger.warning("Could not write metrics to %s: %s", self.path, e)
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def _handler(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def start_exporter():
+    """
+    Start the METRICS_FILE / METRICS_PORT exporter once per process
+
+    Safe to call on every rerun. A port already taken (e.g. by a second
+    server process) is logged and the file, if any, is still written.
+
+    Returns:
+        The MetricsExporter, or None when neither is configured
+    """
+    global _exporter
+    if _exporter is None and (METRICS_FILE or METRICS_PORT):
+        with _exporter_lock:
+            if _exporter is None:
+                try:
+                    _exporter = MetricsExporter(path=METRICS_FILE, port=METRICS_PORT)
+                except OSError as e:
+                    logger.warning("Metrics endpoint on port %s not started: %s", METRICS_PORT, e)
+                    _exporter = MetricsExporter(path=METRICS_FILE)
+    return _exporter
@@ -0,0 +1,263 @@
+import hashlib
+import io
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import streamlit as st
+
+from utils.code_utils import PACKAGE_RE, merge_code_files
+
+# Memory kept for compressed entries and finished archives (each)
+PACKAGE_CACHE_MB = int(os.getenv("PACKAGE_CACHE_MB", "64"))
+COMPRESS_LEVEL = 6
+
+MAVEN_GROUP_ID = "com.qa"
+MAVEN_ARTIFACT_ID = "automation-tests"
+# Files the Maven layout writes itself
+MAVEN_GENERATED = {"pom.xml", "testng.xml"}
+RESOURCE_EXTENSIONS = (".properties", ".json", ".yml", ".yaml", ".csv", ".xml", ".txt")
+TEST_CLASS_RE = re.compile(r"(/tests?/|Tests?\.java$)")
+
+POM_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<project xmlns="http://maven.apache.org/POM/4.0.0"
+         xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+         xsi:schemaLocation="http://maven.apache.org/POM/4.0.0 http://maven.apache.org/xsd/maven-4.0.0.xsd">
+    <modelVersion>4.0.0</modelVersion>
+
+    <groupId>{group_id}</groupId>
+    <artifactId>{artifact_id}</artifactId>
+    <version>1.0.0-SNAPSHOT</version>
+
+    <properties>
+        <maven.compiler.source>11</maven.compiler.source>
+        <maven.compiler.target>11</maven.compiler.target>
+        <project.build.sourceEncoding>UTF-8</project.build.sourceEncoding>
+    </properties>
+
+    <dependencies>
+        <dependency>
+            <groupId>org.seleniumhq.selenium</groupId>
+            <artifactId>selenium-java</artifactId>
+            <version>4.21.0</version>
+        </dependency>
+        <dependency>
+            <groupId>org.testng</groupId>
+            <artifactId>testng</artifactId>
+            <version>7.10.2</version>
+        </dependency>
+        <dependency>
+            <groupId>io.github.bonigarcia</groupId>
+            <artifactId>webdrivermanager</artifactId>
+            <version>5.8.0</version>
+        </dependency>
+    </dependencies>
+
+    <build>
+        <plugins>
+            <plugin>
+                <groupId>org.apache.maven.plugins</groupId>
+                <artifactId>maven-surefire-plugin</artifactId>
+                <version>3.2.5</version>
+                <configuration>
+                    <suiteXmlFiles>
+                        <suiteXmlFile>testng.xml</suiteXmlFile>
+                    </suiteXmlFiles>
+                </configuration>
+            </plugin>
+        </plugins>
+    </build>
+</project>
+"""
+
+TESTNG_TEMPLATE = """<!DOCTYPE suite SYSTEM "https://testng.org/testng-1.0.dtd">
+<suite name="Generated Suite">
+    <test name="Generated Tests">
+        <classes>
+{classes}
+        </classes>
+    </test>
+</suite>
+"""
+
+
+class _LRUBytes:
+    """Thread-safe LRU mapping bounded by the total size of its values"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return value[0]
+
+    def put(self, key, value, size):
+        with self._lock:
+            if key in self._items or size > self.max_bytes:
+                return
+            self._items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _key, (_value, old_size) = self._items.popitem(last=False)
+                self.size -= old_size
+
+
+class ZipPackager:
+    """
+    Builds ZIP archives of generated code, reusing work across reruns
+
+    Each distinct file content is deflated once: entries are cached by the
+    sha256 of their content and written raw into later archives, whatever
+    the file's path. Whole archives are cached by the hash of their file
+    list, so an unchanged download costs one lookup.
+
+    Args:
+        max_bytes: Memory for cached entries and for cached archives (each)
+    """
+
+    def __init__(self, max_bytes=PACKAGE_CACHE_MB * 1024 * 1024):
+        self._entries = _LRUBytes(max_bytes)
+        self._archives = _LRUBytes(max_bytes)
+
+    def _entry(self, data):
+        """(crc32, size, deflated bytes) of a file's content"""
+        key = hashlib.sha256(data).digest()
+        entry = self._entries.get(key)
+        if entry is None:
+            compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+            entry = (zlib.crc32(data), len(data), compressor.compress(data) + compressor.flush())
+            self._entries.put(key, entry, len(entry[2]) + 64)
+        return entry
+
+    def write_zip(self, files, fileobj):
+        """
+        Stream a ZIP of files into a binary file object, entry by entry
+
+        Args:
+            files: {path: content} (str or bytes)
+            fileobj: Writable binary file object
+        """
+        # DOS date/time of the entries
+        t = time.localtime()
+        dos_time = t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+        dos_date = (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+        central, offset = [], 0
+        for path, content in files.items():
+            name = path.encode("utf-8")
+            data = content.encode("utf-8") if isinstance(content, str) else content
+            crc, size, deflated = self._entry(data)
+            if offset > 0xFFFFFFFF or size > 0xFFFFFFFF:
+                raise ValueError("Archive too large for a non-ZIP64 file")
+            # Version 20, flag 0x800 (UTF-8 names), method 8 (deflate)
+            fields = (20, 0x800, 8, dos_time, dos_date, crc, len(deflated), size, len(name))
+            header = struct.pack("<4s5H3L2H", b"PK\x03\x04", *fields, 0) + name
+            fileobj.write(header)
+            fileobj.write(deflated)
+            # Made by version 20 on Unix (3), so the rw-r--r-- mode is honoured
+            central.append(struct.pack("<4s6H3L5H2L", b"PK\x01\x02", 3 << 8 | 20, *fields,
+                                       0, 0, 0, 0, 0o100644 << 16, offset) + name)
+            offset += len(header) + len(deflated)
+        if len(central) > 0xFFFF:
+            raise ValueError("Too many files for a non-ZIP64 archive")
+        directory = b"".join(central)
+        fileobj.write(directory)
+        fileobj.write(struct.pack("<4s4H2LH", b"PK\x05\x06", 0, 0, len(central), len(central),
+                                  len(directory), offset, 0))
+
+    def zip_bytes(self, files):
+        """Bytes of a ZIP of files, served from the archive cache when unchanged"""
+        digest = hashlib.sha256()
+        for path, content in files.items():
+            data = content.encode("utf-8") if isinstance(content, str) else content
+            digest.update(path.encode("utf-8") + b"\0" + hashlib.sha256(data).digest())
+        key = digest.digest()
+        archive = self._archives.get(key)
+        if archive is None:
+            buffer = io.BytesIO()
+            self.write_zip(files, buffer)
+            archive = buffer.getvalue()
+            self._archives.put(key, archive, len(archive))
+        return archive
+
+    def stats(self):
+        return {
+            "entries": len(self._entries._items), "entry_bytes": self._entries.size,
+            "entry_hits": self._entries.hits, "entry_misses": self._entries.misses,
+            "archives": len(self._archives._items), "archive_bytes": self._archives.size,
+            "archive_hits": self._archives.hits, "archive_misses": self._archives.misses,
+        }
+
+
+@st.cache_resource
+def get_packager():
+    """ZipPackager shared by every session of the app"""
+    return ZipPackager()
+
+
+def _maven_path(path, content):
+    """Where a generated file belongs in a standard Maven project"""
+    name = path.rsplit("/", 1)[-1]
+    if path.startswith(("src/main/", "src/test/")):
+        return path
+    if name.endswith(".java"):
+        package = PACKAGE_RE.search(content)
+        package_dir = package.group(0).split()[1].rstrip(";").replace(".", "/") + "/" if package else ""
+        root = "src/test/java/" if TEST_CLASS_RE.search(path) else "src/main/java/"
+        return root + package_dir + name
+    if name.endswith(RESOURCE_EXTENSIONS):
+        return "src/test/resources/" + name
+    return path
+
+
+def _test_classes(files):
+    classes = []
+    for path in files:
+        if path.startswith("src/test/java/") and path.endswith(".java"):
+            classes.append(path[len("src/test/java/"):-len(".java")].replace("/", "."))
+    return classes
+
+
+def maven_project(file_maps, group_id=MAVEN_GROUP_ID, artifact_id=MAVEN_ARTIFACT_ID):
+    """
+    Lay generated files out as a Maven project
+
+    Files are merged with code_utils.merge_code_files (shared page objects
+    once, clashing test classes renamed), moved under src/main/java,
+    src/test/java or src/test/resources by package, and completed with a
+    pom.xml and a testng.xml listing every test class.
+
+    Args:
+        file_maps: {path: content} dicts, e.g. the shared framework and each case's files
+
+    Returns:
+        {path: content} of the project
+    """
+    project = {}
+    for path, content in merge_code_files(file_maps).items():
+        if path.rsplit("/", 1)[-1] in MAVEN_GENERATED:
+            continue
+        project.setdefault(_maven_path(path, content), content)
+    classes = "\n".join(f'            <class name="{name}"/>' for name in _test_classes(project))
+    project["pom.xml"] = POM_TEMPLATE.format(group_id=group_id, artifact_id=artifact_id)
+    project["testng.xml"] = TESTNG_TEMPLATE.format(classes=classes)
+    return project
+
+
+def maven_zip(file_maps):
+    """ZIP bytes of maven_project(file_maps), through the shared packager's caches"""
+    return get_packager().zip_bytes(maven_project(file_maps))
@@ -0,0 +1,191 @@
+import json
+import re
+from collections import namedtuple
+
+# Characters that can change scanner state outside and inside JSON strings
+STRUCTURAL_RE = re.compile(r'[{}\[\]"`]')
+STRING_SPECIAL_RE = re.compile(r'["\\]')
+TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+
+# recovered: test cases parsed; dropped: objects that were malformed or cut
+# off; truncated: whether the response ended inside an unfinished object
+ParseStats = namedtuple("ParseStats", ["recovered", "dropped", "truncated"])
+
+
+def _is_test_case(obj):
+    return isinstance(obj, dict) and ("title" in obj or "test_steps" in obj)
+
+
+def _load_object(text):
+    """Parse one JSON object, tolerating raw newlines and trailing commas"""
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        pass
+    try:
+        return json.loads(TRAILING_COMMA_RE.sub(r"\1", text), strict=False)
+    except ValueError:
+        return None
+
+
+class TestCaseStreamParser:
+    """
+    Incrementally pull test case objects out of a model response
+
+    A single pass over the text tracks JSON strings, escapes, nesting depth
+    and Markdown code fences. Every object that is an array element (e.g.
+    each entry of ``"test_cases": [...]``) or a bare top-level test case is
+    returned as soon as its closing brace has been seen. Prose around the
+    JSON is ignored, and a fence closing while an object is still open
+    abandons that object so a second code block starts cleanly.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        # Open candidate objects as [start offset, depth, failed children]
+        self._candidates = []
+        self.recovered = 0
+        self.dropped = 0
+        self.truncated = False
+
+    @property
+    def stats(self):
+        return ParseStats(self.recovered, self.dropped, self.truncated)
+
+    def feed(self, text):
+        """Add text and return the test cases completed by it"""
+        self._buf += text
+        found = []
+        buf = self._buf
+        pos = self._pos
+        while pos < len(buf):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                m = STRING_SPECIAL_RE.search(buf, pos)
+                if m is None:
+                    pos = len(buf)
+                    break
+                pos = m.end()
+                if m.group() == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                continue
+
+            m = STRUCTURAL_RE.search(buf, pos)
+            if m is None:
+                pos = len(buf)
+                break
+            ch = m.group()
+            if ch == "`":
+                if len(buf) - m.start() < 3:
+                    # Wait for more text to tell a fence from a lone backtick
+                    pos = m.start()
+                    break
+                pos = m.start() + 3 if buf.startswith("```", m.start()) else m.end()
+                if pos == m.start() + 3 and self._stack:
+                    # A fence can't occur inside JSON, so the open object is broken
+                    self._abandon()
+                continue
+            pos = m.end()
+            if ch == '"':
+                # Strings only matter inside JSON; quotes in prose are skipped
+                self._in_string = bool(self._stack)
+            elif ch in "{[":
+                if ch == "{" and (not self._stack or self._stack[-1] == "["):
+                    self._candidates.append([m.start(), len(self._stack), 0])
+                self._stack.append(ch)
+            elif self._stack:
+                self._stack.pop()
+                candidates = self._candidates
+                if ch == "}" and candidates and candidates[-1][1] == len(self._stack):
+                    start, _depth, failed = candidates.pop()
+                    obj = _load_object(buf[start:pos])
+                    if _is_test_case(obj):
+                        self.recovered += 1
+                        found.append(obj)
+                        # Enclosing objects are just containers (e.g. the
+                        # "test_cases" wrapper); their broken children are lost
+                        self.dropped += sum(c[2] for c in candidates)
+                        candidates.clear()
+                    else:
+                        failed += obj is None
+                        if candidates:
+                            candidates[-1][2] += failed
+                        else:
+                            self.dropped += failed
+        self._pos = pos
+        self._compact()
+        return found
+
+    def finish(self):
+        """Mark the end of the response, counting an unfinished object as dropped"""
+        self.truncated = bool(self._candidates)
+        self._abandon()
+        return self.stats
+
+    def _abandon(self):
+        if self._candidates:
+            self.dropped += 1 + sum(c[2] for c in self._candidates)
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._candidates = []
+
+    def _compact(self):
+        # Drop text that can no longer be part of a pending object
+        keep = self._candidates[0][0] if self._candidates else self._pos
+        if keep > 4096:
+            self._buf = self._buf[keep:]
+            self._pos -= keep
+            for candidate in self._candidates:
+                candidate[0] -= keep
+
+
+def _collect_test_cases(value, candidate, found):
+    """Gather test cases from parsed JSON the way TestCaseStreamParser finds them"""
+    if isinstance(value, dict):
+        if candidate and _is_test_case(value):
+            found.append(value)
+            return
+        for child in value.values():
+            _collect_test_cases(child, False, found)
+    elif isinstance(value, list):
+        for child in value:
+            _collect_test_cases(child, True, found)
+
+
+def parse_test_cases(text):
+    """
+    Extract every well-formed test case from a complete model response
+
+    When the text from the first opening to the last closing bracket is
+    valid JSON (a complete response, with or without a code fence and prose
+    around it) it is read with json.loads, several times faster than the
+    incremental scan. Anything else, such as truncated output, a second
+    code block or trailing commas, goes through TestCaseStreamParser.
+
+    Returns:
+        (test_cases, ParseStats)
+    """
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    end = max(text.rfind("}"), text.rfind("]")) + 1
+    if 0 <= start < end:
+        try:
+            data = json.loads(text[start:end], strict=False)
+        except ValueError:
+            pass
+        else:
+            cases = []
+            _collect_test_cases(data, True, cases)
+            return cases, ParseStats(len(cases), 0, False)
+    parser = TestCaseStreamParser()
+    cases = parser.feed(text)
+    return cases, parser.finish()
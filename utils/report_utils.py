@@ -0,0 +1,76 @@
+import logging
+import sys
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger("qe_suite")
+
+LOG_LEVELS = {"error": logging.ERROR, "warning": logging.WARNING, "info": logging.INFO}
+
+# Where this thread's messages go when it redirected them, e.g. a background job
+_local = threading.local()
+
+
+def streamlit_handler(level, message):
+    """Show a message with st.error, st.warning or st.info"""
+    # Imported here so headless callers never load Streamlit
+    import streamlit as st
+    getattr(st, level)(message)
+
+
+def logging_handler(level, message):
+    """Write a message to the qe_suite logger"""
+    logger.log(LOG_LEVELS[level], message)
+
+
+def default_handler(level, message):
+    """Streamlit inside a running app, else logging; Streamlit is never imported for this"""
+    st = sys.modules.get("streamlit")
+    if st is not None and st.runtime.exists():
+        streamlit_handler(level, message)
+    else:
+        logging_handler(level, message)
+
+
+_handler = default_handler
+
+
+def set_handler(handler):
+    """
+    Send messages reported in every thread without its own handler to handler(level, message)
+
+    The default, default_handler, suits both the app and headless callers.
+
+    Returns:
+        The previous handler
+    """
+    global _handler
+    previous, _handler = _handler, handler
+    return previous
+
+
+@contextmanager
+def reporting_to(handler):
+    """
+    Send the messages reported in the current thread to handler(level, message)
+
+    Background jobs run outside the Streamlit script, where st.error and
+    friends would be dropped, so they collect the messages instead.
+    """
+    previous = getattr(_local, "handler", None)
+    _local.handler = handler
+    try:
+        yield
+    finally:
+        _local.handler = previous
+
+
+def report(level, message):
+    """
+    Report an error, warning or note to the user
+
+    Args:
+        level: "error", "warning" or "info"
+        message: Text to show
+    """
+    (getattr(_local, "handler", None) or _handler)(level, message)
@@ -0,0 +1,202 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+# Lanes in the order they are served; interactive requests jump the queue
+LANES = {"interactive": 0, "bulk": 1}
+# HTTP statuses worth retrying: rate limited, server errors, timeouts
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+    "InternalServerError", "DeadlineExceeded", "GatewayTimeout",
+}
+
+
+def estimate_tokens(text):
+    """Rough token count of a prompt (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def _status_code(error):
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return _status_code(error) in RETRYABLE_CODES or type(error).__name__ in RETRYABLE_ERRORS
+
+
+def is_rate_limited(error):
+    return _status_code(error) == 429 or type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at per_minute / 60 tokens a second
+
+    Not thread-safe on its own; RequestScheduler guards it with its lock.
+
+    Args:
+        per_minute: Refill rate
+        capacity: Largest burst (default one minute's worth)
+    """
+
+    def __init__(self, per_minute, capacity=None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount tokens are available (amount is capped at the capacity)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount):
+        """Charge (or refund, if negative) tokens after the fact; the level may go below zero"""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+class RequestScheduler:
+    """
+    Process-wide gate for model requests
+
+    Every request waits for a slot in a requests-per-minute and a
+    tokens-per-minute bucket. Waiting requests are served by lane
+    (interactive before bulk), first come first served within a lane.
+    Retryable errors are retried with jittered exponential backoff, and a
+    rate-limit error pauses all lanes for the backoff delay, since every
+    session in the process shares the same quota.
+
+    Args:
+        rpm: Requests per minute (0 for no limit)
+        tpm: Tokens per minute (0 for no limit)
+        max_retries: Retries per request after the first attempt
+        base_delay: Backoff before the first retry, in seconds
+        max_delay: Cap on a single backoff
+        burst: Requests that may be sent back to back (default rpm)
+    """
+
+    def __init__(self, rpm=0, tpm=0, max_retries=5, base_delay=1.0, max_delay=60.0,
+                 burst=None, clock=time.monotonic, rng=None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._requests = TokenBucket(rpm, burst, clock=clock) if rpm else None
+        self._tokens = TokenBucket(tpm, clock=clock) if tpm else None
+        self._cond = threading.Condition()
+        self._queue = []
+        self._tickets = itertools.count()
+        self._paused_until = 0.0
+        self._stats = {lane: {"requests": 0, "succeeded": 0, "failed": 0, "retries": 0, "wait_seconds": 0.0}
+                       for lane in LANES}
+
+    def _wait_time(self, tokens):
+        wait = self._paused_until - self._clock()
+        if self._requests is not None:
+            wait = max(wait, self._requests.wait_time(1))
+        if self._tokens is not None and tokens:
+            wait = max(wait, self._tokens.wait_time(tokens))
+        return wait
+
+    def acquire(self, lane="interactive", tokens=0):
+        """Block until the request may be sent and charge it to the buckets"""
+        ticket = (LANES[lane], next(self._tickets))
+        started = self._clock()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            # A new arrival may outrank the current head of the queue
+            self._cond.notify_all()
+            try:
+                while True:
+                    wait = None
+                    if self._queue[0] == ticket:
+                        wait = self._wait_time(tokens)
+                        if wait <= 0:
+                            break
+                    self._cond.wait(timeout=wait)
+            except BaseException:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._queue)
+            if self._requests is not None:
+                self._requests.take(1)
+            if self._tokens is not None and tokens:
+                self._tokens.take(tokens)
+            self._stats[lane]["requests"] += 1
+            self._stats[lane]["wait_seconds"] += self._clock() - started
+            self._cond.notify_all()
+
+    def record_usage(self, estimated, actual):
+        """Correct the token bucket once a response reports its real token usage"""
+        if self._tokens is not None and isinstance(actual, int) and actual:
+            with self._cond:
+                self._tokens.adjust(actual - estimated)
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff delay for a retry attempt (0-based)"""
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def run(self, fn, lane="interactive", tokens=0):
+        """
+        Call fn once a slot is free, retrying retryable errors
+
+        Args:
+            fn: Callable making one model request
+            lane: "interactive" or "bulk"
+            tokens: Estimated tokens the request uses
+
+        Returns:
+            fn's result; the last error is raised once retries run out
+        """
+        for attempt in itertools.count():
+            self.acquire(lane, tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._count(lane, "failed")
+                    raise
+                delay = self.backoff(attempt)
+                with self._cond:
+                    self._stats[lane]["retries"] += 1
+                    if is_rate_limited(e):
+                        # Everyone shares the quota, so everyone backs off
+                        self._paused_until = max(self._paused_until, self._clock() + delay)
+                        self._cond.notify_all()
+                if not is_rate_limited(e):
+                    time.sleep(delay)
+                continue
+            self._count(lane, "succeeded")
+            usage = getattr(result, "usage_metadata", None)
+            self.record_usage(tokens, getattr(usage, "total_token_count", 0))
+            return result
+
+    def _count(self, lane, outcome):
+        with self._cond:
+            self._stats[lane][outcome] += 1
+
+    def stats(self):
+        with self._cond:
+            return {lane: dict(values) for lane, values in self._stats.items()}
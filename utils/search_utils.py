@@ -0,0 +1,243 @@
+import hashlib
+import os
+import re
+import zlib
+
+import streamlit as st
+
+# Switch from exact search to an IVF index once the library is this large
+IVF_THRESHOLD = 20000
+TOKEN_RE = re.compile(r"\w+")
+
+
+def test_case_text(test_case):
+    """Text used to embed a test case: title plus steps and expected results"""
+    parts = [test_case.get("title", "")]
+    parts.extend(test_case.get("test_steps", []))
+    parts.extend(test_case.get("expected_results", []))
+    return "\n".join(p for p in parts if p)
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-words embedder
+
+    Needs no model download, so it works offline and gives stable vectors in
+    tests. Tokens and token bigrams are hashed into a fixed number of buckets.
+    """
+
+    # Reworded copies of a case share most bigrams but not all of them
+    duplicate_threshold = 0.85
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def _buckets(self, text):
+        tokens = TOKEN_RE.findall(text.lower())
+        grams = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+        return [zlib.crc32(g.encode("utf-8")) % self.dim for g in grams]
+
+    def encode(self, texts):
+        # faiss and numpy are imported on first use to keep them off the app's startup path
+        import faiss
+        import numpy as np
+
+        rows, cols = [], []
+        for row, text in enumerate(texts):
+            buckets = self._buckets(text)
+            rows.extend([row] * len(buckets))
+            cols.extend(buckets)
+        counts = np.bincount(np.array(rows, dtype="int64") * self.dim + np.array(cols, dtype="int64"),
+                             minlength=len(texts) * self.dim)
+        vectors = counts.reshape(len(texts), self.dim).astype("float32")
+        faiss.normalize_L2(vectors)
+        return vectors
+
+
+class SentenceTransformerEmbedder:
+    """
+    Embedder backed by a local sentence-transformers model
+
+    Args:
+        model_name: Model name or path to a model directory on disk
+        batch_size: Number of texts encoded per forward pass
+    """
+
+    duplicate_threshold = 0.9
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=64):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.batch_size = batch_size
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        import numpy as np
+
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.ascontiguousarray(vectors, dtype="float32")
+
+
+@st.cache_resource(show_spinner="Loading embedding model...")
+def load_embedder():
+    """
+    Create the embedder configured by EMBEDDING_MODEL
+
+    EMBEDDING_MODEL=hashing selects the HashingEmbedder. Any other value is
+    loaded with sentence-transformers, falling back to hashing when the
+    package or the model files are not available.
+    """
+    model_name = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    if model_name == "hashing":
+        return HashingEmbedder()
+    try:
+        return SentenceTransformerEmbedder(model_name)
+    except (ImportError, OSError):
+        return HashingEmbedder()
+
+
+class TestCaseIndex:
+    """
+    Similarity index over the test case library
+
+    Vectors live in a FAISS inner-product index keyed by test case id. Cases
+    are only re-encoded when their text changes, and new cases are encoded
+    in batches. Small libraries use exact search; past IVF_THRESHOLD the
+    index is rebuilt as an IVF index so queries stay fast.
+
+    Args:
+        embedder: Object with a ``dim`` attribute and an ``encode(texts)`` method
+    """
+
+    def __init__(self, embedder):
+        import faiss
+
+        self.embedder = embedder
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(embedder.dim))
+        self._next_id = 0
+        self._int_ids = {}
+        self._str_ids = {}
+        self._fingerprints = {}
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def __sizeof__(self):
+        # The vectors live in FAISS, out of sight of sys.getsizeof: float32
+        # components plus an int64 id each
+        return super().__sizeof__() + self.index.ntotal * (self.embedder.dim * 4 + 8)
+
+    def __contains__(self, tc_id):
+        return tc_id in self._int_ids
+
+    def upsert(self, test_cases):
+        """Add new cases and re-encode cases whose text changed"""
+        changed_ids, texts = [], []
+        for tc in test_cases:
+            text = test_case_text(tc)
+            fingerprint = hashlib.sha1(text.encode("utf-8")).digest()
+            if self._fingerprints.get(tc["id"]) != fingerprint:
+                self._fingerprints[tc["id"]] = fingerprint
+                changed_ids.append(tc["id"])
+                texts.append(text)
+        if not changed_ids:
+            return 0
+
+        import numpy as np
+
+        self._remove_vectors(changed_ids)
+        int_ids = np.empty(len(changed_ids), dtype="int64")
+        for pos, tc_id in enumerate(changed_ids):
+            int_ids[pos] = self._next_id
+            self._int_ids[tc_id] = self._next_id
+            self._str_ids[self._next_id] = tc_id
+            self._next_id += 1
+        self.index.add_with_ids(self.embedder.encode(texts), int_ids)
+        self._maybe_upgrade()
+        return len(changed_ids)
+
+    def remove(self, tc_ids):
+        tc_ids = [tc_id for tc_id in tc_ids if tc_id in self._int_ids]
+        self._remove_vectors(tc_ids)
+        for tc_id in tc_ids:
+            self._fingerprints.pop(tc_id, None)
+        return len(tc_ids)
+
+    def sync(self, test_cases):
+        """Bring the index in line with a full list of test cases"""
+        live = {tc["id"] for tc in test_cases}
+        self.remove([tc_id for tc_id in self._int_ids if tc_id not in live])
+        return self.upsert(test_cases)
+
+    def search(self, query, k=10):
+        """Return up to k (test case id, score) pairs most similar to query"""
+        if not len(self):
+            return []
+        return self._search_vectors(self.embedder.encode([query]), k)[0]
+
+    def search_many(self, queries, k=10):
+        """Batched search: one list of (test case id, score) pairs per query"""
+        if not len(self) or not queries:
+            return [[] for _ in queries]
+        return self._search_vectors(self.embedder.encode(list(queries)), k)
+
+    def find_duplicates(self, test_case, threshold=0.9, k=5):
+        """Return (id, score) pairs of library cases that look like test_case"""
+        matches = self.search(test_case_text(test_case), k=k + 1)
+        return [(tc_id, score) for tc_id, score in matches
+                if tc_id != test_case.get("id") and score >= threshold]
+
+    def _search_vectors(self, vectors, k):
+        scores, ids = self.index.search(vectors, min(k, len(self)))
+        results = []
+        for row_scores, row_ids in zip(scores, ids):
+            results.append([
+                (self._str_ids[int(i)], float(s))
+                for s, i in zip(row_scores, row_ids) if i != -1
+            ])
+        return results
+
+    def _remove_vectors(self, tc_ids):
+        int_ids = [self._int_ids.pop(tc_id) for tc_id in tc_ids if tc_id in self._int_ids]
+        if int_ids:
+            import numpy as np
+
+            for i in int_ids:
+                del self._str_ids[i]
+            self.index.remove_ids(np.array(int_ids, dtype="int64"))
+
+    def _maybe_upgrade(self):
+        import faiss
+        import numpy as np
+
+        if not isinstance(self.index, faiss.IndexIDMap2) or self.index.ntotal < IVF_THRESHOLD:
+            return
+        ntotal = self.index.ntotal
+        vectors = self.index.index.reconstruct_n(0, ntotal)
+        int_ids = faiss.vector_to_array(self.index.id_map).astype("int64")
+        nlist = int(np.sqrt(ntotal))
+        # The IVF index does not own its quantizer, so keep a reference to it
+        self._quantizer = faiss.IndexFlatIP(self.embedder.dim)
+        ivf = faiss.IndexIVFFlat(self._quantizer, self.embedder.dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        # k-means only needs a sample of a few dozen points per list
+        sample = np.random.default_rng(0).choice(ntotal, min(ntotal, 64 * nlist), replace=False)
+        ivf.train(vectors[sample])
+        ivf.add_with_ids(vectors, int_ids)
+        ivf.nprobe = 8
+        self.index = ivf
+
+
+def get_test_case_index(test_cases):
+    """Return the session's test case index, building it on first use"""
+    if "tc_index" not in st.session_state:
+        index = TestCaseIndex(load_embedder())
+        index.upsert(test_cases)
+        st.session_state.tc_index = index
+    return st.session_state.tc_index
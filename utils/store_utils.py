@@ -0,0 +1,342 @@
+import re
+import sys
+from array import array
+from collections import Counter
+
+PRIORITIES = ("High", "Medium", "Low")
+PRIORITY_CODES = {p.lower(): code for code, p in enumerate(PRIORITIES)}
+DEFAULT_PRIORITY = "Medium"
+
+# Plain string columns; categorical ones are interned so repeats share memory
+TEXT_FIELDS = ("id", "area", "module", "submodule", "title")
+CATEGORY_FIELDS = ("area", "module", "submodule")
+# List columns are stored as one string joined with a separator that never
+# appears in user text
+LIST_FIELDS = ("preconditions", "test_data", "test_steps", "expected_results")
+LIST_SEP = "\x1f"
+ID_RE = re.compile(r"TC_(\d+)$")
+
+
+def _join(items):
+    return LIST_SEP.join(str(item) for item in items or [])
+
+
+def _split(value):
+    return value.split(LIST_SEP) if value else []
+
+
+def priority_code(priority):
+    """Code of a priority name; unknown values fall back to the default priority"""
+    return PRIORITY_CODES.get(str(priority or "").strip().lower(), PRIORITY_CODES[DEFAULT_PRIORITY.lower()])
+
+
+class TestCaseStore:
+    """
+    Columnar store for the test case library
+
+    Each field is one column (a list of strings, list fields joined into a
+    single string), priorities are small integer codes and selection is a
+    bitmap. An id -> row index, per-priority counts and the selected count
+    are maintained on every change, so lookups and counts are O(1). Rows are
+    materialized as test case dictionaries only when read.
+    """
+
+    def __init__(self, test_cases=()):
+        self._cols = {field: [] for field in TEXT_FIELDS + LIST_FIELDS}
+        self._priority = array("b")
+        self._selected = bytearray()
+        self._attachments = {}
+        self._index = {}
+        self._priority_counts = [0] * len(PRIORITIES)
+        self._category_counts = {field: Counter() for field in CATEGORY_FIELDS}
+        self._selected_count = 0
+        self._max_number = 0
+        self.extend(test_cases)
+
+    # -- reading --------------------------------------------------------
+
+    def __len__(self):
+        return len(self._priority)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def __getitem__(self, row):
+        cols = self._cols
+        tc_id = cols["id"][row]
+        tc = {field: cols[field][row] for field in TEXT_FIELDS}
+        for field in LIST_FIELDS:
+            tc[field] = _split(cols[field][row])
+        tc["priority"] = PRIORITIES[self._priority[row]]
+        tc["attachments"] = list(self._attachments.get(tc_id, []))
+        tc["selected"] = bool(self._selected[row])
+        return tc
+
+    def __contains__(self, tc_id):
+        return tc_id in self._index
+
+    def row_of(self, tc_id):
+        return self._index.get(tc_id)
+
+    def get(self, tc_id):
+        row = self._index.get(tc_id)
+        return None if row is None else self[row]
+
+    def column(self, field):
+        """Raw column values; list fields come back joined with LIST_SEP"""
+        if field == "priority":
+            return [PRIORITIES[code] for code in self._priority]
+        return self._cols[field]
+
+    def snapshot(self):
+        """
+        Independent copy of the store for readers on another thread
+
+        Only the containers are copied; the strings themselves are shared.
+        """
+        copy = TestCaseStore.__new__(TestCaseStore)
+        copy.__dict__.update(self.__dict__)
+        copy._cols = {field: list(col) for field, col in self._cols.items()}
+        copy._priority = array("b", self._priority)
+        copy._selected = bytearray(self._selected)
+        copy._attachments = dict(self._attachments)
+        copy._index = dict(self._index)
+        copy._priority_counts = list(self._priority_counts)
+        copy._category_counts = {field: Counter(c) for field, c in self._category_counts.items()}
+        return copy
+
+    def iter_columns(self, fields, batch=5000):
+        """Yield the given columns (see column()) batch rows at a time, as lists of slices"""
+        columns = [self.column(field) for field in fields]
+        for start in range(0, len(self), batch):
+            yield [column[start:start + batch] for column in columns]
+
+    def rows(self, rows):
+        return [self[row] for row in rows]
+
+    def attachments(self, rows):
+        """Attachment references of the given rows, flattened"""
+        ids = self._cols["id"]
+        return [a for row in rows for a in self._attachments.get(ids[row], [])]
+
+    def all_attachments(self):
+        return [a for refs in self._attachments.values() for a in refs]
+
+    def priority_counts(self):
+        return dict(zip(PRIORITIES, self._priority_counts))
+
+    def distinct(self, field):
+        """Sorted non-empty values of a categorical field"""
+        return sorted(value for value, count in self._category_counts[field].items() if value and count)
+
+    def next_number(self):
+        return self._max_number + 1
+
+    def next_id(self):
+        return f"TC_{self.next_number():03d}"
+
+    def filter(self, priorities=None, area=None, module=None, text="", ids=None):
+        """
+        Rows matching every given filter, in library order
+
+        Args:
+            priorities: Priorities to keep (all when empty)
+            area: Exact area to keep (all when None)
+            module: Exact module to keep (all when None)
+            text: Case-insensitive text to find in title, steps or expected results
+            ids: Test case ids to keep (all when None)
+        """
+        rows = range(len(self))
+        if ids is not None:
+            rows = sorted(row for row in map(self.row_of, ids) if row is not None)
+        if priorities:
+            codes = {priority_code(p) for p in priorities}
+            rows = [r for r in rows if self._priority[r] in codes]
+        if area is not None:
+            col = self._cols["area"]
+            rows = [r for r in rows if col[r] == area]
+        if module is not None:
+            col = self._cols["module"]
+            rows = [r for r in rows if col[r] == module]
+        needle = text.strip().casefold()
+        if needle:
+            titles, steps, expected = (self._cols[f] for f in ("title", "test_steps", "expected_results"))
+            rows = [r for r in rows if needle in titles[r].casefold()
+                    or needle in steps[r].casefold() or needle in expected[r].casefold()]
+        return list(rows)
+
+    def count(self, **filters):
+        """Number of rows matching filter(**filters)"""
+        return len(self.filter(**filters))
+
+    def page(self, offset, limit, **filters):
+        """
+        One page of the rows matching filter(**filters)
+
+        Returns:
+            List of (row, test case dict)
+        """
+        return [(row, self[row]) for row in self.filter(**filters)[offset:offset + limit]]
+
+    # -- selection ------------------------------------------------------
+
+    @property
+    def selected_count(self):
+        return self._selected_count
+
+    def all_selected(self):
+        return len(self) > 0 and self._selected_count == len(self)
+
+    def is_selected(self, row):
+        return bool(self._selected[row])
+
+    def set_selected(self, row, selected=True):
+        selected = int(bool(selected))
+        if self._selected[row] != selected:
+            self._selected[row] = selected
+            self._selected_count += 1 if selected else -1
+
+    def set_selected_ids(self, states):
+        """Apply {test case id: selected}; ids no longer in the library are skipped"""
+        for tc_id, selected in states.items():
+            row = self.row_of(tc_id)
+            if row is not None:
+                self.set_selected(row, selected)
+
+    def select_all(self, selected=True):
+        self._selected = bytearray([int(bool(selected))]) * len(self)
+        self._selected_count = len(self) if selected else 0
+
+    def selected_rows(self):
+        return [row for row, flag in enumerate(self._selected) if flag]
+
+    def selected_cases(self):
+        return self.rows(self.selected_rows())
+
+    # -- writing --------------------------------------------------------
+
+    def add(self, test_case):
+        """Append a test case; a missing or already used id is replaced with the next free one"""
+        tc_id = test_case.get("id")
+        if not tc_id or tc_id in self._index:
+            tc_id = self.next_id()
+        row = len(self)
+        self._index[tc_id] = row
+        self._track_id(tc_id)
+        for field in TEXT_FIELDS + LIST_FIELDS:
+            self._cols[field].append("")
+        for field in CATEGORY_FIELDS:
+            self._category_counts[field][""] += 1
+        self._priority.append(0)
+        self._selected.append(0)
+        self._priority_counts[0] += 1
+        self._write(row, dict(test_case, id=tc_id))
+        return tc_id
+
+    def extend(self, test_cases):
+        return [self.add(tc) for tc in test_cases]
+
+    def extend_columns(self, columns, priorities, selected=None, attachments=None):
+        """
+        Bulk-append rows given column-wise, without building a dict per row
+
+        Args:
+            columns: Field -> list of strings for TEXT_FIELDS and LIST_FIELDS;
+                list fields already joined with LIST_SEP. Missing ids are
+                assigned, and ids already in use are replaced with free ones.
+            priorities: Priority code of each row
+            selected: Optional 0/1 selection flag of each row
+            attachments: Optional id -> attachment list for rows that have any
+
+        Returns:
+            The ids of the appended rows
+        """
+        base = len(self)
+        ids = []
+        for offset, tc_id in enumerate(columns["id"]):
+            if not tc_id or tc_id in self._index:
+                tc_id = self.next_id()
+            tc_id = sys.intern(tc_id)
+            self._index[tc_id] = base + offset
+            self._track_id(tc_id)
+            ids.append(tc_id)
+        self._cols["id"].extend(ids)
+        for field in CATEGORY_FIELDS:
+            values = [sys.intern(v) for v in columns[field]]
+            self._cols[field].extend(values)
+            self._category_counts[field].update(values)
+        for field in ("title",) + LIST_FIELDS:
+            self._cols[field].extend(columns[field])
+        self._priority.extend(priorities)
+        for code in range(len(PRIORITIES)):
+            self._priority_counts[code] += priorities.count(code)
+        if selected is None:
+            self._selected.extend(bytes(len(ids)))
+        else:
+            self._selected.extend(selected)
+            self._selected_count += sum(selected)
+        for tc_id, refs in (attachments or {}).items():
+            if tc_id in self._index:
+                self._attachments[tc_id] = list(refs)
+        return ids
+
+    def update(self, row, test_case):
+        """Replace the fields of a row, keeping its id"""
+        self._write(row, dict(test_case, id=self._cols["id"][row]))
+
+    def delete_rows(self, rows):
+        """Delete rows and return the ids that were removed"""
+        doomed = set(rows)
+        if not doomed:
+            return []
+        removed = [self._cols["id"][row] for row in sorted(doomed)]
+        keep = [row for row in range(len(self)) if row not in doomed]
+        for field, col in self._cols.items():
+            self._cols[field] = [col[row] for row in keep]
+        self._priority = array("b", (self._priority[row] for row in keep))
+        self._selected = bytearray(self._selected[row] for row in keep)
+        for tc_id in removed:
+            self._attachments.pop(tc_id, None)
+        self._reindex()
+        return removed
+
+    def delete_selected(self):
+        return self.delete_rows(self.selected_rows())
+
+    def _write(self, row, test_case):
+        cols = self._cols
+        for field in CATEGORY_FIELDS:
+            old = cols[field][row]
+            new = sys.intern(str(test_case.get(field) or ""))
+            self._category_counts[field][old] -= 1
+            self._category_counts[field][new] += 1
+            cols[field][row] = new
+        cols["id"][row] = sys.intern(test_case["id"])
+        cols["title"][row] = str(test_case.get("title") or "")
+        for field in LIST_FIELDS:
+            cols[field][row] = _join(test_case.get(field))
+
+        code = priority_code(test_case.get("priority"))
+        self._priority_counts[self._priority[row]] -= 1
+        self._priority_counts[code] += 1
+        self._priority[row] = code
+
+        self.set_selected(row, test_case.get("selected", False))
+        if test_case.get("attachments"):
+            self._attachments[test_case["id"]] = list(test_case["attachments"])
+        else:
+            self._attachments.pop(test_case["id"], None)
+
+    def _track_id(self, tc_id):
+        m = ID_RE.match(tc_id)
+        if m:
+            self._max_number = max(self._max_number, int(m.group(1)))
+
+    def _reindex(self):
+        self._index = {tc_id: row for row, tc_id in enumerate(self._cols["id"])}
+        self._priority_counts = [0] * len(PRIORITIES)
+        for code in self._priority:
+            self._priority_counts[code] += 1
+        self._category_counts = {field: Counter(self._cols[field]) for field in CATEGORY_FIELDS}
+        self._selected_count = sum(self._selected)
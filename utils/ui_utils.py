@@ -1,7 +1,18 @@
 # utils/ui_utils.py
+import os
 import streamlit as st
 from pathlib import Path
 import time
+from utils.blob_utils import get_attachment_store
+from utils.job_utils import session_jobs
+from utils import memory_utils, metrics_utils
+
+# Library page sizes and the per-rerun render time the library view aims for
+PAGE_SIZES = [10, 25, 50, 100]
+LIBRARY_RENDER_BUDGET_MS = float(os.getenv("LIBRARY_RENDER_BUDGET_MS", "250"))
+JOB_ICONS = {"queued": "🕒", "running": "⏳", "succeeded": "✅", "failed": "❌", "cancelled": "⛔"}
+CALL_LABELS = {"test_cases": "Test cases", "automation": "Single automation", "combined": "Combined suite",
+               "framework": "Shared framework", "repair": "Java repairs"}
 
 def load_css():
     """Load custom CSS from assets folder"""
@@ -44,6 +55,140 @@ def safe_rerun():
     except Exception:
         st.stop()
 
+def display_jobs_panel(appliers, limit=5):
+    """
+    This session's recent background generation jobs, polled while any is running
+
+    Only the jobs this session or its workspace submitted are listed, so
+    nobody sees, cancels or applies another user's.
+
+    Args:
+        appliers: {job kind: function(job)} adding a job's results to this session,
+            offered for finished jobs of the workspace nobody applied (e.g. before a reload)
+        limit: Jobs listed
+    """
+    running = {job.id for job in session_jobs(limit) if job.running}
+
+    @st.fragment(run_every=2.0 if running else None)
+    def _jobs_panel():
+        jobs = session_jobs(limit)
+        if any(job.id in running and not job.running for job in jobs):
+            # Let the pages apply the results
+            st.rerun()
+        if not jobs:
+            st.caption("No generation jobs yet")
+        for job in jobs:
+            text = f"{JOB_ICONS[job.status]} {job.label}"
+            if job.running:
+                st.progress(job.progress, text=text)
+                if st.button("Cancel", key=f"job_cancel_{job.id}", disabled=job.cancelled):
+                    job.cancel()
+            else:
+                st.caption(f"{text} · {job.status}" + (f": {job.error}" if job.error else ""))
+                if job.pending and job.kind in appliers:
+                    if st.button(f"Apply {job.pending} result(s)", key=f"job_apply_{job.id}"):
+                        appliers[job.kind](job)
+                        st.rerun()
+            for _level, message in job.messages[-3:]:
+                st.caption(message)
+    _jobs_panel()
+
+def display_memory_panel(usage, keys=6):
+    """
+    This session's memory against its limit, its largest keys and the server-wide summary
+
+    Args:
+        usage: The session's memory_utils.SessionUsage, None before its first measurement
+        keys: session_state keys listed
+    """
+    if usage is None:
+        st.caption("Measuring...")
+        return
+    limit = memory_utils.SESSION_MEMORY_LIMIT_MB * 1024 * 1024
+    if limit:
+        st.progress(min(usage.total / limit, 1.0), text=f"Session: {format_size(usage.total)} of {format_size(limit)}")
+    else:
+        st.caption(f"Session: {format_size(usage.total)}")
+    with st.expander("Details"):
+        for key, size in list(usage.keys.items())[:keys]:
+            st.caption(f"`{key}`: {format_size(size)}")
+        if usage.spilled:
+            st.caption(f"Generated code on disk: {format_size(usage.spilled)}")
+        summary = memory_utils.get_memory_monitor().summary()
+        text = (f"Server: {summary['sessions']} session(s), {format_size(summary['total'])} in session state, "
+                f"{format_size(summary['job_bytes'])} in job results, {format_size(summary['spill_bytes'])} spilled to disk")
+        if summary["rss"] is not None:
+            text += f", {format_size(summary['rss'])} resident"
+        if summary["over_limit"]:
+            text += f" · {summary['over_limit']} over the limit"
+        st.caption(text)
+
+def display_diagnostics_panel():
+    """Latency, tokens, estimated cost, parse success, cache hits and retries of the server's model calls"""
+    rows = metrics_utils.METRICS.summary()
+    total = rows.pop("all")
+    if not total["calls"]:
+        st.caption("No AI calls yet")
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("AI calls", total["calls"])
+    with col2:
+        st.metric("p95 latency", format_seconds(total["p95"]))
+    st.caption(_diagnostics_text(total))
+    with st.expander("By call type"):
+        for call_type, label in CALL_LABELS.items():
+            if call_type in rows:
+                row = rows[call_type]
+                st.caption(f"**{label}**: {row['calls']} calls, p50 {format_seconds(row['p50'])}, "
+                           f"p95 {format_seconds(row['p95'])} · {_diagnostics_text(row)}")
+
+def _diagnostics_text(row):
+    parts = [f"{row['prompt_tokens'] + row['response_tokens']:,} tokens (~${row['cost']:.4f})",
+             f"{row['cached'] / row['calls']:.0%} cached" if row["calls"] else "0% cached"]
+    if row["parsed"]:
+        parts.append(f"{row['parse_ok'] / row['parsed']:.0%} parsed cleanly")
+    if row["retries"]:
+        parts.append(f"{row['retries']} retries")
+    if row["errors"]:
+        parts.append(f"{row['errors']} failed")
+    return " · ".join(parts)
+
+def format_seconds(seconds):
+    """Human readable duration, "–" for None"""
+    if seconds is None:
+        return "–"
+    return f"{seconds * 1000:.0f} ms" if seconds < 1 else f"{seconds:.1f} s"
+
+def format_size(num_bytes):
+    """Human readable file size"""
+    for unit in ("B", "KB", "MB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
+
+def display_attachment_downloads(attachments, key):
+    """
+    Show a download button per attachment, reading each file from the blob store
+    
+    Args:
+        attachments: Attachment references of a test case
+        key: Prefix for the widget keys
+    """
+    blob_store = get_attachment_store()
+    for i, attachment in enumerate(attachments):
+        if "ref" not in attachment or not blob_store.exists(attachment):
+            st.caption(f"📎 {attachment.get('name', 'attachment')} (file missing)")
+            continue
+        st.download_button(
+            f"📎 {attachment['name']} ({format_size(attachment.get('size', 0))})",
+            data=blob_store.read(attachment),
+            file_name=attachment["name"],
+            mime=attachment.get("type") or "application/octet-stream",
+            key=f"{key}_attachment_{i}",
+        )
+
 def display_test_case_card(test_case, index):
     """
     Display a test case in a card format
@@ -51,6 +196,9 @@ def display_test_case_card(test_case, index):
     Args:
         test_case: Test case dictionary
         index: Index in the list
+    
+    Returns:
+        Whether the card's checkbox is selected
     """
     priority_colors = {
         "High": "🔴",
@@ -65,7 +213,7 @@ def display_test_case_card(test_case, index):
         
         with col1:
             selected = st.checkbox(
-                "",
+                "Select",
                 value=test_case.get("selected", False),
                 key=f"select_{test_case['id']}_{index}",
                 label_visibility="collapsed"
@@ -78,44 +226,47 @@ def display_test_case_card(test_case, index):
                 expanded=False
             ):
                 # Display metadata
-                if test_case.get("area") or test_case.get("module") or test_case.get("submodule"):
-                    info_parts = [
-                        p for p in [
-                            test_case.get("area"),
-                            test_case.get("module"),
-                            test_case.get("submodule")
-                        ] if p
-                    ]
-                    if info_parts:
-                        st.caption(" > ".join(info_parts))
+                info_parts = [
+                    p for p in [
+                        test_case.get("area"),
+                        test_case.get("module"),
+                        test_case.get("submodule")
+                    ] if p
+                ]
+                if info_parts:
+                    st.caption(" > ".join(info_parts))
                 
-                # Display content in columns
+                # One markdown element per section keeps the widget count per card small
                 if test_case.get("preconditions") or test_case.get("test_data"):
                     col_a, col_b = st.columns(2)
                     
                     with col_a:
                         if test_case.get("preconditions"):
-                            st.markdown("**Preconditions:**")
-                            for pre in test_case["preconditions"]:
-                                st.markdown(f"• {pre}")
+                            st.markdown("**Preconditions:**\n" + "\n".join(
+                                f"- {pre}" for pre in test_case["preconditions"]
+                            ))
                     
                     with col_b:
                         if test_case.get("test_data"):
-                            st.markdown("**Test Data:**")
-                            for data in test_case["test_data"]:
-                                st.markdown(f"• {data}")
+                            st.markdown("**Test Data:**\n" + "\n".join(
+                                f"- {data}" for data in test_case["test_data"]
+                            ))
                 
-                # Test steps
+                # Test steps and expected results
+                body = []
                 if test_case.get("test_steps"):
-                    st.markdown("**Test Steps:**")
-                    for i, step in enumerate(test_case["test_steps"], 1):
-                        st.markdown(f"{i}. {step}")
-                
-                # Expected results
+                    body.append("**Test Steps:**")
+                    body.extend(f"{i}. {step}" for i, step in enumerate(test_case["test_steps"], 1))
                 if test_case.get("expected_results"):
-                    st.markdown("**Expected Results:**")
-                    for result in test_case["expected_results"]:
-                        st.markdown(f"✓ {result}")
+                    body.append("\n**Expected Results:**\n")
+                    body.extend(f"- ✓ {result}" for result in test_case["expected_results"])
+                if body:
+                    st.markdown("\n".join(body))
+                
+                if test_case.get("attachments"):
+                    st.caption("📎 " + ", ".join(
+                        f"{a['name']} ({format_size(a.get('size', 0))})" for a in test_case["attachments"]
+                    ))
                 
                 # Action buttons
                 col1, col2 = st.columns(2)
@@ -137,6 +288,56 @@ def display_test_case_card(test_case, index):
                     ):
                         st.session_state.selected_test_cases = [test_case]
                         # Navigation will be handled by the calling function
+    
+    return selected
+
+def apply_card_selection(store):
+    """
+    Copy card checkbox states into the store before the bulk actions render,
+    so their counts reflect the click that triggered this rerun
+    """
+    store.set_selected_ids({str(key)[len("select_"):].rsplit("_", 1)[0]: st.session_state[key]
+                            for key in st.session_state if str(key).startswith("select_")})
+
+def reset_card_selection():
+    """Forget card checkbox states so they pick up a bulk selection change"""
+    for key in [k for k in st.session_state if str(k).startswith("select_")]:
+        del st.session_state[key]
+
+def paginate(items, key="page"):
+    """
+    Render page size and page number controls and return the visible slice
+    
+    Args:
+        items: Full list of items
+        key: Widget key prefix for the controls
+    """
+    start, page_size = page_bounds(len(items), key)
+    return items[start:start + page_size]
+
+def page_bounds(total, key="page"):
+    """
+    Render page size and page number controls for total items
+
+    Args:
+        total: Number of items
+        key: Widget key prefix for the controls
+
+    Returns:
+        (offset of the visible page, page size)
+    """
+    col1, col2, col3 = st.columns([1, 1, 3])
+    with col1:
+        page_size = st.selectbox("Per page", PAGE_SIZES, index=1, key=f"{key}_size")
+    pages = max(1, -(-total // page_size))
+    # Keep the page in range when filters shrink the result set
+    if st.session_state.get(f"{key}_number", 1) > pages:
+        st.session_state[f"{key}_number"] = pages
+    with col2:
+        page = st.number_input("Page", 1, pages, key=f"{key}_number")
+    with col3:
+        st.caption(f"Page {page} of {pages}")
+    return (page - 1) * page_size, page_size
 
 def format_code_file(file_name, content, language="java"):
     """
@@ -175,16 +376,19 @@ def display_stats(test_cases, selected_test_cases):
     Display statistics about test cases
     
     Args:
-        test_cases: List of all test cases
+        test_cases: Test case store (TestCaseStore or db_utils.LibraryStore) or list of all test cases
         selected_test_cases: List of selected test cases
     """
     col1, col2, col3, col4 = st.columns(4)
     
-    priority_counts = {"High": 0, "Medium": 0, "Low": 0}
-    for tc in test_cases:
-        priority = tc.get("priority", "Medium")
-        if priority in priority_counts:
-            priority_counts[priority] += 1
+    if hasattr(test_cases, "priority_counts"):
+        priority_counts = test_cases.priority_counts()
+    else:
+        priority_counts = {"High": 0, "Medium": 0, "Low": 0}
+        for tc in test_cases:
+            priority = tc.get("priority", "Medium")
+            if priority in priority_counts:
+                priority_counts[priority] += 1
     
     with col1:
         st.metric("Total Cases", len(test_cases))